@@ -0,0 +1,217 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Set
+import hashlib
+import os
+import threading
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import User
+from invalidation_bus import invalidation_bus
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1000"))
+
+
+class CachedUser(NamedTuple):
+    """Snapshot korisnika za rute (bez relacija i password hash-a)"""
+    id: int
+    username: str
+    email: str
+    created_at: Optional[datetime]
+
+
+class _VerifiedToken(NamedTuple):
+    user_id: int
+    expires_at: float
+
+
+class TokenCache:
+    """
+    LRU keš verifikovanih JWT tokena po SHA-256 digest-u tokena.
+
+    Unos važi do `exp` iz tokena, ali najduže AUTH_TOKEN_CACHE_TTL sekundi.
+    Keširaju se samo tokeni koji su prošli verifikaciju - neispravan token
+    svaki put ide kroz `jwt.decode`.
+    """
+
+    def __init__(self, max_size: int = AUTH_TOKEN_CACHE_SIZE, ttl: float = AUTH_TOKEN_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, _VerifiedToken]" = OrderedDict()
+        self._by_user: Dict[int, Set[bytes]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[int]:
+        """user_id za već verifikovan token koji nije istekao, inače None"""
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(key, entry)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.user_id
+
+    def put(self, token: str, user_id: int, exp: Optional[float]) -> None:
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+
+        key = self.digest(token)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._by_user.get(old.user_id, set()).discard(key)
+            self._entries[key] = _VerifiedToken(user_id, expires_at)
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._discard_user_key(evicted.user_id, evicted_key)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Izbacivanje svih tokena korisnika"""
+        with self._lock:
+            for key in self._by_user.pop(user_id, ()):
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: bytes, entry: _VerifiedToken) -> None:
+        del self._entries[key]
+        self._discard_user_key(entry.user_id, key)
+
+    def _discard_user_key(self, user_id: int, key: bytes) -> None:
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+
+class UserCache:
+    """
+    LRU keš korisnika po id-u, sa istom zaštitom verzijom kao ChatbotCache:
+    rezultat učitavanja se upisuje samo ako korisnik nije izmenjen u
+    međuvremenu. Nepostojeći korisnici se ne keširaju.
+    """
+
+    def __init__(self, max_size: int = AUTH_USER_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, CachedUser]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, user_id: int, db: AsyncSession) -> Optional[CachedUser]:
+        """Korisnik iz keša, ili učitavanje iz baze na miss"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            version = self._versions.get(user_id, 0)
+
+        user = await db.scalar(select(User).filter(User.id == user_id))
+        if user is None:
+            return None
+
+        entry = CachedUser(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            created_at=user.created_at,
+        )
+        with self._lock:
+            if self._versions.get(user_id, 0) == version:
+                self._entries[user_id] = entry
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return entry
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for user_id in self._entries:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+token_cache = TokenCache()
+user_cache = UserCache()
+
+
+def invalidate_user(user_id: int) -> None:
+    """Izbacivanje korisnika i svih njegovih tokena posle izmene ili brisanja"""
+    user_cache.invalidate(user_id)
+    token_cache.invalidate_user(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _on_user_change(mapper, connection, target: User) -> None:
+    # Pokriva svaku izmenu preko ORM-a, ne samo postojeće rute; stiže i do ostalih procesa
+    invalidation_bus.publish("user", target.id)
+
+
+invalidation_bus.subscribe("user", invalidate_user)
+invalidation_bus.on_reset(token_cache.clear)
+invalidation_bus.on_reset(user_cache.clear)
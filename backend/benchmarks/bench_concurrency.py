@@ -0,0 +1,60 @@
+"""
+Benchmark: req/s webhook-a pri 100+ istovremenih isporuka (uvicorn + async
+DB sloj). "cold" varijanta gasi keš chatbotova (CHATBOT_CACHE_SIZE=0), pa
+svaki request radi lookup u bazi preko AsyncSession.
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_concurrency --requests 2000 --concurrency 100 200 500
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_concurrency
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.stub_graph import StubGraphServer
+
+
+def run_child(env: dict, requests: int, concurrency: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.load_webhook", "--child",
+         "--requests", str(requests), "--concurrency", str(concurrency)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 200, 500])
+    parser.add_argument("--graph-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub = StubGraphServer(delay=args.graph_delay).start()
+    print(f"{args.requests} webhook-a po merenju, OUTBOUND_SEND_MODE=outbox, Graph API delay {args.graph_delay * 1000:.0f} ms")
+
+    for cache in ("warm", "cold"):
+        for concurrency in args.concurrency:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(
+                    os.environ,
+                    GRAPH_API_BASE_URL=stub.base_url,
+                    OUTBOUND_SEND_MODE="outbox",
+                    DB_POOL_SIZE=os.getenv("DB_POOL_SIZE", str(min(concurrency, 50))),
+                )
+                env.setdefault("DATABASE_URL", f"sqlite:///{tmp}/bench.db")
+                if cache == "cold":
+                    env["CHATBOT_CACHE_SIZE"] = "0"
+
+                result = run_child(env, args.requests, concurrency)
+                print(
+                    f"  {cache:<5} concurrency {concurrency:>4}   {result['rps']:8.1f} req/s"
+                    f"   p50 {result['p50_ms']:8.1f} ms   p99 {result['p99_ms']:8.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
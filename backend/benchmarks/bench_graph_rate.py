@@ -0,0 +1,129 @@
+"""
+Benchmark slanja na nalog sa limitom (graph_rate_limiter.py).
+
+Stub Graph API dozvoljava --rate-limit poziva/s po tokenu i vraća 429 preko
+toga. Za svaki režim OutboundSender šalje --messages poruka na jedan token
+(--concurrency istovremeno, kao outbox batch-evi):
+  - bez limiter-a: staro ponašanje, burst do 429 pa backoff
+  - sa limiter-om: bucket po tokenu + usage header-i
+Meri trajanje, uspešne poruke/s, 429 odgovore stub-a i odložene poruke.
+
+Drugi deo meri prioritet: --retries ponovnih pokušaja i --messages novih
+poruka istovremeno - p50 vremena do slanja za nove i za ponovne.
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_graph_rate
+    python -m benchmarks.bench_graph_rate --rate-limit 50 --messages 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from graph_rate_limiter import GraphRateLimiter
+from outbound_sender import OutboundSender
+from benchmarks.stub_graph import StubGraphServer
+
+TOKEN = "bench-token"
+
+
+class Unlimited:
+    """Limiter koji ništa ne ograničava - ponašanje pre graph_rate_limiter-a"""
+
+    # Retry-After se odspavljuje ceo, kao ranije
+    max_wait = float("inf")
+
+    async def acquire(self, key, retry=False, max_wait=None):
+        return 0.0
+
+    def try_acquire(self, key):
+        return True
+
+    def observe(self, key, status_code, headers, retry_after=None):
+        pass
+
+
+async def send_all(sender: OutboundSender, count: int, concurrency: int, retry: bool = False) -> tuple:
+    """(latencije uspešnih u s, broj odloženih, broj neuspelih)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, deferred, failed = [], 0, 0
+
+    async def one(index: int):
+        nonlocal deferred, failed
+        async with semaphore:
+            start = time.perf_counter()
+            result = await sender.send(TOKEN, f"recipient-{index}", "Hvala na poruci!", retry=retry)
+        if "error" not in result:
+            latencies.append(time.perf_counter() - start)
+        elif "defer" in result:
+            deferred += 1
+        else:
+            failed += 1
+
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return latencies, deferred, failed
+
+
+async def run_mode(label: str, limiter, stub: StubGraphServer, args) -> None:
+    sender = OutboundSender(base_url=stub.base_url, concurrency_per_token=args.concurrency, rate_limiter=limiter)
+    await sender.start()
+    throttled_before = stub.throttled
+    try:
+        start = time.perf_counter()
+        latencies, deferred, failed = await send_all(sender, args.messages, args.concurrency)
+        elapsed = time.perf_counter() - start
+    finally:
+        await sender.stop()
+
+    print(f"  {label:16s} {elapsed:6.2f} s   {len(latencies) / elapsed:7.1f} poruka/s   "
+          f"429: {stub.throttled - throttled_before:5d}   odloženo: {deferred:4d}   neuspelo: {failed:4d}   "
+          f"retry-a: {sender.retried}")
+
+
+async def run_priority(stub: StubGraphServer, args) -> None:
+    limiter = GraphRateLimiter(rate=args.rate_limit, burst=args.rate_limit, max_wait=60)
+    sender = OutboundSender(base_url=stub.base_url, concurrency_per_token=args.concurrency, rate_limiter=limiter)
+    await sender.start()
+    try:
+        (retries, _, _), (fresh, _, _) = await asyncio.gather(
+            send_all(sender, args.retries, args.concurrency, retry=True),
+            send_all(sender, args.messages, args.concurrency),
+        )
+    finally:
+        await sender.stop()
+
+    print(f"\n{args.retries} ponovnih + {args.messages} novih istovremeno (sa limiter-om)")
+    print(f"  nove     p50 {statistics.median(fresh):6.2f} s   max {max(fresh):6.2f} s")
+    print(f"  ponovne  p50 {statistics.median(retries):6.2f} s   max {max(retries):6.2f} s")
+
+
+async def run(args) -> None:
+    stub = StubGraphServer(delay=args.graph_delay, rate_limit=args.rate_limit).start()
+    try:
+        print(f"{args.messages} poruka na jedan token, limit {args.rate_limit:g}/s, concurrency {args.concurrency}")
+        await run_mode("bez limiter-a", Unlimited(), stub, args)
+        # Bucket podešen malo ispod limita naloga, kao GRAPH_API_RATE_PER_TOKEN u produkciji
+        limiter = GraphRateLimiter(rate=args.rate_limit * 0.9, burst=args.rate_limit * 0.9, max_wait=60)
+        await run_mode("sa limiter-om", limiter, stub, args)
+        print(f"  limiter: {limiter.stats()}")
+
+        if args.retries:
+            await asyncio.sleep(1)
+            await run_priority(stub, args)
+    finally:
+        stub.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--retries", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rate-limit", type=float, default=50, help="Limit stub Graph API-ja (poziva/s po tokenu)")
+    parser.add_argument("--graph-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
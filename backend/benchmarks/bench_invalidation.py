@@ -0,0 +1,77 @@
+"""
+Benchmark: kašnjenje invalidacije keša od worker-a koji je izmenio chatbot do
+ostalih worker-a, za db (polling) i redis (lokalni stub) backend.
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_invalidation --workers 4 --edits 200
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from database import engine
+from models import Base
+from invalidation_bus import DatabaseBus, RedisBus
+from benchmarks.load_webhook import percentile
+from benchmarks.stub_redis import StubRedisServer
+
+
+async def measure(buses, edits: int) -> list:
+    """Vreme dok izmena sa prvog bus-a ne stigne do svih ostalih"""
+    pending = {}
+    delays = []
+
+    def on_invalidate(key):
+        entry = pending.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            delays.append(time.perf_counter() - entry[0])
+            entry[2].set()
+
+    for bus in buses[1:]:
+        bus.subscribe("chatbot", on_invalidate)
+    for bus in buses:
+        await bus.start()
+
+    for i in range(edits):
+        key = f"account-{i}"
+        done = asyncio.Event()
+        pending[key] = [time.perf_counter(), len(buses) - 1, done]
+        buses[0].publish("chatbot", key)
+        await asyncio.wait_for(done.wait(), 10)
+
+    for bus in buses:
+        await bus.stop()
+    return delays
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--edits", type=int, default=200)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    stub = StubRedisServer().start()
+
+    print(f"{args.workers} worker-a, {args.edits} izmena (sekvencijalno)")
+    for name, factory in (
+        ("db", lambda: DatabaseBus()),
+        ("redis", lambda: RedisBus(stub.url)),
+    ):
+        delays = asyncio.run(measure([factory() for _ in range(args.workers)], args.edits))
+        print(
+            f"  {name:<6} p50 {percentile(delays, 50) * 1000:7.1f} ms   p99 {percentile(delays, 99) * 1000:7.1f} ms"
+            f"   max {max(delays) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
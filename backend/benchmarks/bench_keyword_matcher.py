@@ -0,0 +1,107 @@
+"""
+Benchmark: KeywordMatcher (Aho-Corasick) vs. stara linearna petlja, plus
+mešavina substring/word/fuzzy trigger-a (cena ne sme da raste sa brojem trigger-a).
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_keyword_matcher
+"""
+import argparse
+import random
+import string
+import time
+from types import SimpleNamespace
+
+from keyword_matcher import KeywordMatcher
+
+
+def make_keywords(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    keywords = []
+    for i in range(count):
+        length = rng.randint(4, 12)
+        trigger = "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+        keywords.append(SimpleNamespace(id=i + 1, trigger=trigger, response=f"odgovor {i}"))
+    return keywords
+
+
+def make_messages(keywords, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = ["zdravo", "koliko", "kosta", "dostava", "hvala", "pozdrav", "molim", "info"]
+    messages = []
+    for i in range(count):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(5, 30)))
+        # Otprilike polovina poruka sadrži neki trigger
+        if i % 2 == 0:
+            text += " " + rng.choice(keywords).trigger.upper()
+        messages.append(text)
+    return messages
+
+
+def linear_match(keywords, message_text):
+    """Stara logika iz process_incoming_message"""
+    message_lower = message_text.lower()
+    for keyword in keywords:
+        if keyword.trigger.lower() in message_lower:
+            return keyword
+    return None
+
+
+def reference_match(keywords, message_text):
+    """Isti izbor kao KeywordMatcher za substring trigger-e: najduži, pa prvi"""
+    message_lower = message_text.lower()
+    found = [
+        (-len(keyword.trigger), i)
+        for i, keyword in enumerate(keywords)
+        if keyword.trigger.lower() in message_lower
+    ]
+    return keywords[min(found)[1]] if found else None
+
+
+def bench(label, fn, messages):
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    elapsed = time.perf_counter() - start
+    per_message_us = elapsed / len(messages) * 1_000_000
+    print(f"  {label:<12} {per_message_us:>12.1f} µs/poruka")
+    return per_message_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000,50000")
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        keywords = make_keywords(size)
+        messages = make_messages(keywords, args.messages)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # Provera da su rezultati identični
+        for message in messages:
+            expected = reference_match(keywords, message)
+            got = matcher.match(message)
+            assert (expected.id if expected else None) == (got.id if got else None)
+
+        print(f"{size} trigger-a (build: {build_ms:.1f} ms)")
+        linear = bench("linear", lambda m: linear_match(keywords, m), messages)
+        compiled = bench("compiled", matcher.match, messages)
+        print(f"  speedup      {linear / compiled:>12.1f}x")
+
+        mixed = [
+            SimpleNamespace(**vars(keyword), match_type=("substring", "word", "fuzzy")[i % 3])
+            for i, keyword in enumerate(keywords)
+        ]
+        start = time.perf_counter()
+        mixed_matcher = KeywordMatcher(mixed)
+        build_ms = (time.perf_counter() - start) * 1000
+        bench("mixed", mixed_matcher.match, messages)
+        print(f"  {'':<12} (build: {build_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
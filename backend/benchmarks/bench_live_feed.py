@@ -0,0 +1,124 @@
+"""
+Benchmark live feed-a (live_feed.py): hiljade besposlenih SSE pretplatnika
+po worker-u.
+
+Svaki pretplatnik je task koji čita isti `live_feed.stream()` generator kao
+/api/live (bez HTTP sloja). Meri:
+  - memoriju po besposlenom pretplatniku (tracemalloc, red + task + generator)
+  - publish za vlasnika bez pretplatnika, sa nekoliko i sa --fanout pretplatnika
+  - vreme dok svi pretplatnici ne dobiju poruku
+  - spor klijent: memorija ostaje ograničena na LIVE_FEED_QUEUE_SIZE frame-ova
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_live_feed
+    python -m benchmarks.bench_live_feed --subscribers 10000 --owners 2000 --fanout 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from live_feed import LiveFeed
+
+MESSAGE = {
+    "sender_id": "1784140000000000",
+    "sender_username": "bench_user",
+    "message_text": "Koliko košta dostava?",
+    "bot_response": "Dostava je besplatna preko 5000 RSD.",
+    "matched_keyword": "dostava",
+    "chatbot_id": 1,
+    "timestamp": "2024-01-01T12:00:00",
+}
+
+
+async def consume(feed: LiveFeed, subscriber, received: list) -> None:
+    async for chunk in feed.stream(subscriber):
+        received[0] += chunk.count(b"event: message")
+
+
+async def timed_publish(feed: LiveFeed, owner_id: int, rounds: int) -> list:
+    """Latencije samog publish poziva (µs) - fan-out u redove, bez čitanja"""
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        feed.publish(owner_id, 1, [MESSAGE])
+        latencies.append((time.perf_counter() - start) * 1e6)
+        await asyncio.sleep(0)
+    return latencies
+
+
+async def run(args) -> None:
+    feed = LiveFeed(queue_size=args.queue_size, max_subscribers=args.subscribers + args.fanout + 1,
+                    keepalive=args.keepalive, relay=False)
+    received = [0]
+    tasks = []
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for index in range(args.subscribers):
+        subscriber = feed.subscribe(1000 + index % args.owners)
+        tasks.append(asyncio.create_task(consume(feed, subscriber, received)))
+    # Svi task-ovi do prvog čekanja na poruku
+    await asyncio.sleep(0.1)
+    idle = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{args.subscribers} besposlenih pretplatnika ({args.owners} vlasnika, red {args.queue_size})")
+    print(f"  memorija: {idle / 1024 / 1024:.1f} MiB ukupno, {idle / args.subscribers:.0f} B po pretplatniku")
+
+    # Vlasnici 1000.. imaju po subscribers/owners pretplatnika, -1 nijednog
+    cases = [("vlasnik bez pretplatnika", -1), (f"{args.subscribers // args.owners} pretplatnika", 1000)]
+    fanout_owner = 1
+    for _ in range(args.fanout):
+        tasks.append(asyncio.create_task(consume(feed, feed.subscribe(fanout_owner), received)))
+    await asyncio.sleep(0.1)
+    cases.append((f"{args.fanout} pretplatnika", fanout_owner))
+
+    print(f"\npublish jedne poruke ({args.rounds} puta)")
+    for label, owner_id in cases:
+        latencies = await timed_publish(feed, owner_id, args.rounds)
+        print(f"  {label:26s} p50 {statistics.median(latencies):8.1f} µs   max {max(latencies):8.1f} µs")
+
+    # Do isporuke: publish -> svi fan-out task-ovi pročitali frame
+    delivered = []
+    for _ in range(args.rounds):
+        target = received[0] + args.fanout
+        start = time.perf_counter()
+        feed.publish(fanout_owner, 1, [MESSAGE])
+        while received[0] < target:
+            await asyncio.sleep(0)
+        delivered.append((time.perf_counter() - start) * 1000)
+    print(f"  isporuka svim {args.fanout:<13d} p50 {statistics.median(delivered):8.2f} ms   "
+          f"max {max(delivered):8.2f} ms")
+
+    # Spor klijent: niko ne čita, red ostaje ograničen
+    slow = feed.subscribe(2)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(args.rounds * 10):
+        feed.publish(2, 1, [MESSAGE])
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"\nspor klijent posle {args.rounds * 10} poruka: u redu {len(slow.queue)}, "
+          f"izbačeno {slow.dropped}, memorija {grown / 1024:.1f} KiB")
+    feed.unsubscribe(slow)
+
+    feed.close()
+    await asyncio.gather(*tasks)
+    print(f"\n{feed.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--owners", type=int, default=1000)
+    parser.add_argument("--fanout", type=int, default=200, help="Pretplatnika jednog vlasnika")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--keepalive", type=float, default=15)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: trošak logovanja po webhook request-u sa LOG_LEVEL=INFO vs DEBUG.
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_logging --requests 2000
+"""
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("GRAPH_API_BASE_URL", "http://127.0.0.1:9/v18.0")
+os.environ.setdefault("MESSAGE_LOG_DURABILITY", "async")
+
+import httpx
+
+import main
+from logging_config import setup_logging, stop_logging
+from benchmarks.load_webhook import seed_database, webhook_payload
+
+
+class CountingSink(io.TextIOBase):
+    def __init__(self):
+        self.lines = 0
+
+    def write(self, text):
+        self.lines += text.count("\n")
+        return len(text)
+
+
+async def run(level: str, requests: int) -> tuple:
+    sink = CountingSink()
+    # httpx klijent benchmark-a loguje svaki request na INFO - nije deo app-a
+    setup_logging(level=level, levels="httpx=WARNING,httpcore=WARNING", stream=sink)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        payloads = [webhook_payload(i) for i in range(requests)]
+        for payload in payloads[:50]:
+            await client.post("/api/webhook", json=payload)
+
+        start = time.perf_counter()
+        for payload in payloads:
+            await client.post("/api/webhook", json=payload)
+        elapsed = time.perf_counter() - start
+
+    stop_logging()
+    return elapsed / requests * 1_000_000, sink.lines
+
+
+async def bench(args):
+    # Pozadinski servisi bez lifespan-a (ASGITransport ga ne pokreće)
+    await main.message_log.start()
+    results = {}
+    for level in ("WARNING", "INFO", "DEBUG"):
+        results[level] = await run(level, args.requests)
+    await main.message_log.stop()
+    return results
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed_database()
+    results = asyncio.run(bench(args))
+
+    baseline = results["WARNING"][0]
+    print(f"{args.requests} webhook request-a (OUTBOUND_SEND_MODE=outbox, bez slanja)")
+    for level, (per_request_us, lines) in results.items():
+        print(f"  {level:<8} {per_request_us:>9.1f} µs/request  (+{per_request_us - baseline:6.1f} µs)  {lines / (args.requests + 50):5.2f} log linija/request")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,149 @@
+"""
+Benchmark logina: login/s i latencija webhook-a dok logini traju.
+
+Za svaki režim hash-ovanja (PASSWORD_HASH_WORKERS: 0 = thread, N = pool
+procesa) u zasebnom procesu nad novom bazom meri:
+  - throughput i latenciju samih logina (--logins, --login-concurrency)
+  - p50/p99 webhook-a bez logina i dok u pozadini stalno teku logini
+
+Limit pokušaja je isključen da bi svi logini došli do verifikacije.
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --workers 0 2 4 --logins 100 --rounds 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_webhook import drive, make_payloads, seed_database
+from benchmarks.load_webhook import percentile
+from benchmarks.stub_graph import StubGraphServer
+
+PASSWORD = "bench-password-123"
+
+
+async def login_loop(client, count: int, concurrency: int, stop: asyncio.Event = None) -> tuple:
+    """`count` logina (ili do `stop`), vraća latencije i trajanje"""
+    latencies = []
+    body = json.dumps({"username": "bench-login", "password": PASSWORD}).encode()
+    headers = {"Content-Type": "application/json"}
+    remaining = iter(range(count)) if stop is None else None
+
+    async def worker():
+        while True:
+            if stop is not None:
+                if stop.is_set():
+                    return
+            elif next(remaining, None) is None:
+                return
+            start = time.perf_counter()
+            response = await client.post("/api/auth/login", content=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_scenario(args) -> dict:
+    import httpx
+
+    import main
+
+    triggers = seed_database(1, 100, args.seed)
+    payloads = make_payloads(args.webhooks, triggers, 16, args.seed)
+    loaded_payloads = make_payloads(args.webhooks, triggers, 16, args.seed + 1)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/api/auth/register", json={
+                "username": "bench-login", "email": "bench-login@example.com", "password": PASSWORD,
+            })
+            response.raise_for_status()
+            # Zagrevanje (pokretanje pool procesa, keš chatbota)
+            await login_loop(client, args.workers or 1, args.workers or 1)
+            await drive(client, payloads[:50], 10)
+
+            login_latencies, login_elapsed = await login_loop(client, args.logins, args.login_concurrency)
+
+            idle, _ = await drive(client, payloads, args.concurrency)
+
+            stop = asyncio.Event()
+            background = asyncio.create_task(login_loop(client, 0, args.login_concurrency, stop))
+            loaded, _ = await drive(client, loaded_payloads, args.concurrency)
+            stop.set()
+            background_latencies, _ = await background
+
+    return {
+        "logins_per_s": args.logins / login_elapsed,
+        "login_p50_ms": percentile(login_latencies, 50) * 1000,
+        "login_p99_ms": percentile(login_latencies, 99) * 1000,
+        "webhook_p50_ms": percentile(idle, 50) * 1000,
+        "webhook_p99_ms": percentile(idle, 99) * 1000,
+        "webhook_under_login_p50_ms": percentile(loaded, 50) * 1000,
+        "webhook_under_login_p99_ms": percentile(loaded, 99) * 1000,
+        "background_logins": len(background_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--rounds", help="PASSWORD_HASH_ROUNDS (default cena šeme)")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--login-concurrency", type=int, default=8)
+    parser.add_argument("--webhooks", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        args.workers = args.workers[0]
+        print(json.dumps(asyncio.run(run_scenario(args))))
+        return
+
+    stub = StubGraphServer().start()
+    print(f"{args.logins} logina (concurrency {args.login_concurrency}), {args.webhooks} webhook-a po merenju")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                GRAPH_API_BASE_URL=stub.base_url,
+                LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+                PASSWORD_HASH_WORKERS=str(workers),
+                LOGIN_MAX_ATTEMPTS_PER_USER="0",
+                LOGIN_MAX_ATTEMPTS_PER_IP="0",
+                REPLY_RATE_LIMIT="0",
+                REPLY_REPEAT_WINDOW="0",
+            )
+            env.setdefault("DATABASE_URL", f"sqlite:///{tmp}/bench.db")
+            if args.rounds:
+                env["PASSWORD_HASH_ROUNDS"] = args.rounds
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_login", "--child", "--workers", str(workers),
+                 "--logins", str(args.logins), "--login-concurrency", str(args.login_concurrency),
+                 "--webhooks", str(args.webhooks), "--concurrency", str(args.concurrency),
+                 "--seed", str(args.seed)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+
+        mode = "thread" if workers == 0 else f"{workers} procesa"
+        print(
+            f"  {mode:<10} {result['logins_per_s']:7.1f} login/s (p99 {result['login_p99_ms']:7.1f} ms)"
+            f"   webhook p99 {result['webhook_p99_ms']:7.1f} ms"
+            f" -> {result['webhook_under_login_p99_ms']:7.1f} ms uz login-e"
+        )
+
+
+if __name__ == "__main__":
+    main()
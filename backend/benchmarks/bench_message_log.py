@@ -0,0 +1,103 @@
+"""
+Benchmark: redova u sekundi za Message log pod konkurentnim webhook
+opterećenjem - stari commit po poruci vs. MessageLogWriter (sync/group/async).
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_message_log --producers 200 --messages 20
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_message_log
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from database import SessionLocal, engine
+from models import Base, Chatbot, Message, OutboundMessage, User
+from message_log import MessageLogWriter
+
+
+def make_row(chatbot_id: int, producer: int, i: int):
+    message = {
+        "sender_id": f"sender-{producer}",
+        "message_text": f"poruka {i} - koja je cena?",
+        "bot_response": "Cena je 1000 RSD",
+        "matched_keyword": "cena",
+        "chatbot_id": chatbot_id,
+        "timestamp": datetime.utcnow(),
+    }
+    outbound = {"recipient_id": f"sender-{producer}", "message_text": "Cena je 1000 RSD", "chatbot_id": chatbot_id}
+    return message, outbound
+
+
+def setup() -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(username=f"bench-{time.time()}", email=f"{time.time()}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    chatbot = Chatbot(name="Bench", instagram_account_id=f"bench-{time.time()}", access_token="t", owner_id=user.id)
+    db.add(chatbot)
+    db.commit()
+    chatbot_id = chatbot.id
+    db.close()
+    return chatbot_id
+
+
+async def run_baseline(chatbot_id: int, producers: int, messages: int) -> float:
+    """Stari put: db.add + db.commit po poruci, blokirajuće u event loop-u"""
+    db = SessionLocal()
+
+    async def producer(p):
+        for i in range(messages):
+            message, outbound = make_row(chatbot_id, p, i)
+            db.add(Message(**message))
+            db.add(OutboundMessage(**outbound))
+            db.commit()
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(producer(p) for p in range(producers)))
+    elapsed = time.perf_counter() - start
+    db.close()
+    return producers * messages / elapsed
+
+
+async def run_writer(chatbot_id: int, durability: str, producers: int, messages: int) -> float:
+    writer = MessageLogWriter(durability=durability)
+    await writer.start()
+
+    async def producer(p):
+        for i in range(messages):
+            await writer.write([make_row(chatbot_id, p, i)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(producer(p) for p in range(producers)))
+    await writer.stop()
+    elapsed = time.perf_counter() - start
+    return producers * messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--producers", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+
+    chatbot_id = setup()
+    total = args.producers * args.messages
+    print(f"{engine.dialect.name}: {args.producers} konkurentnih producer-a x {args.messages} poruka = {total} redova")
+
+    rps = asyncio.run(run_baseline(chatbot_id, args.producers, args.messages))
+    print(f"  {'commit/poruka':<14} {rps:>10.0f} redova/s")
+    for durability in ("sync", "group", "async"):
+        rps = asyncio.run(run_writer(chatbot_id, durability, args.producers, args.messages))
+        print(f"  {durability:<14} {rps:>10.0f} redova/s")
+
+
+if __name__ == "__main__":
+    main()
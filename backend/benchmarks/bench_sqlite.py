@@ -0,0 +1,122 @@
+"""
+Benchmark: mešoviti read/write throughput na SQLite-u, default podešavanja
+(rollback journal, više writer thread-ova) vs SQLITE_PRODUCTION=1 (WAL,
+pragme, jedan writer thread, read-only pool za čitanja).
+
+Writer-i upisuju po jedan red (commit po upisu - najgori slučaj za lock-ove),
+route writer-i isto to preko async sesije kao rute koje pišu (write_session),
+reader-i čitaju stranu istorije poruka kao /api/chatbots/{id}/messages.
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_sqlite --writers 20 --route-writers 5 --readers 50 --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+async def run_mixed(writers: int, route_writers: int, readers: int, seconds: float) -> dict:
+    from sqlalchemy import select
+    from sqlalchemy.exc import OperationalError
+
+    from benchmarks.bench_message_log import make_row, setup
+    from database import AsyncReadSessionLocal, write_session
+    from db_writer import db_writer
+    from message_log import insert_rows
+    from models import Message
+
+    chatbot_id = setup()
+    counts = {"writes": 0, "route_writes": 0, "reads": 0, "errors": 0}
+    deadline = time.perf_counter() + seconds
+
+    async def writer(w):
+        i = 0
+        while time.perf_counter() < deadline:
+            try:
+                await db_writer.run(insert_rows, [make_row(chatbot_id, w, i)])
+                counts["writes"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+            i += 1
+
+    async def route_writer(w):
+        i = 0
+        while time.perf_counter() < deadline:
+            try:
+                async with write_session() as db:
+                    db.add(Message(**make_row(chatbot_id, writers + w, i)[0]))
+                    await db.commit()
+                counts["route_writes"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+            i += 1
+
+    async def reader():
+        query = select(Message).filter(Message.chatbot_id == chatbot_id).order_by(
+            Message.timestamp.desc(), Message.id.desc()
+        ).limit(50)
+        while time.perf_counter() < deadline:
+            try:
+                async with AsyncReadSessionLocal() as db:
+                    (await db.scalars(query)).all()
+                counts["reads"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(writer(w) for w in range(writers)),
+        *(route_writer(w) for w in range(route_writers)),
+        *(reader() for _ in range(readers)),
+    )
+    elapsed = time.perf_counter() - start
+    db_writer.shutdown()
+
+    return {
+        "writes_per_s": counts["writes"] / elapsed,
+        "route_writes_per_s": counts["route_writes"] / elapsed,
+        "reads_per_s": counts["reads"] / elapsed,
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--route-writers", type=int, default=5)
+    parser.add_argument("--readers", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_mixed(args.writers, args.route_writers, args.readers, args.seconds))))
+        return
+
+    print(f"SQLite: {args.writers} writer-a + {args.route_writers} route writer-a + {args.readers} reader-a, "
+          f"{args.seconds:g} s")
+    for mode, production in (("default", "0"), ("production", "1")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", SQLITE_PRODUCTION=production)
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_sqlite", "--child",
+                 "--writers", str(args.writers), "--route-writers", str(args.route_writers),
+                 "--readers", str(args.readers),
+                 "--seconds", str(args.seconds)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"  {mode:<11} {result['writes_per_s']:8.0f} upisa/s   {result['route_writes_per_s']:8.0f} upisa ruta/s"
+                f"   {result['reads_per_s']:8.0f} čitanja/s"
+                f"   {result['errors']:5d} grešaka (database is locked)"
+            )
+
+
+if __name__ == "__main__":
+    main()
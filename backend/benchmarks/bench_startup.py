@@ -0,0 +1,102 @@
+"""
+Benchmark hladnog starta worker-a: svaki run je nov Python proces koji meri
+  - import main.py
+  - create_app() + lifespan start (baza je već na head reviziji) + prvi GET /
+i proverava koji teški moduli su učitani posle importa (trebalo bi da nisu).
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 20 --importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+LAZY_MODULES = ("jose", "passlib", "requests", "alembic")
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+loaded = [name for name in %r if name in sys.modules]
+
+async def ready():
+    import httpx
+    app = main.create_app()
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            (await client.get("/")).raise_for_status()
+            return time.perf_counter()
+
+first_response = asyncio.run(ready())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "ready_ms": (first_response - start) * 1000,
+    "loaded": loaded,
+}))
+""" % (LAZY_MODULES,)
+
+
+def import_profile(env: dict, top: int) -> list:
+    """Najskuplji moduli iz `python -X importtime` (kumulativno, µs)"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        # main i njegovi direktni import-i (uvlačenje = dubina) - vreme uključuje zavisnosti
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true", help="Najskuplji import-i (python -X importtime)")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+            OUTBOX_WORKERS="0",
+            PASSWORD_HASH_WORKERS="0",
+        )
+        env.setdefault("DATABASE_URL", f"sqlite:///{tmp}/bench.db")
+        subprocess.run([sys.executable, "migrate.py"], env=env, check=True, capture_output=True)
+
+        results = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+        imports = [result["import_ms"] for result in results]
+        ready = [result["ready_ms"] for result in results]
+        print(f"{args.runs} hladnih startova")
+        print(f"  import main          median {statistics.median(imports):7.1f} ms   min {min(imports):7.1f} ms")
+        print(f"  do prvog odgovora    median {statistics.median(ready):7.1f} ms   min {min(ready):7.1f} ms")
+        loaded = sorted({name for result in results for name in result["loaded"]})
+        print(f"  lenji moduli učitani pri importu: {', '.join(loaded) or 'nijedan'}")
+
+        if args.importtime:
+            print("\nNajskuplji import-i (kumulativno):")
+            for us, name in import_profile(env, args.top):
+                print(f"  {us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Benchmark suite za webhook pipeline: webhook_handler se poziva kroz ASGI
+interfejs (httpx.ASGITransport, bez mreže i uvicorn-a) sa sintetičkim
+Instagram payload-ima, a odgovori idu na lokalni stub Graph API server.
+
+Matrica scenarija: broj chatbotova x keyword-a po chatbotu x reči po poruci
+x concurrency. Svaki scenario radi u zasebnom procesu nad novom bazom i
+meri throughput, p50/p95/p99 latenciju i alokacije po poruci (tracemalloc
+peak/retained bajtovi i gen0 GC kolekcije - mera broja alokacija objekata).
+
+Rezultati se upisuju u benchmarks/results/<vreme>.json i porede sa
+poslednjim prethodnim fajlom (ili --baseline); pad throughput-a ili rast
+p99 veći od --threshold se prijavljuje kao regresija.
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.bench_webhook
+    python -m benchmarks.bench_webhook --chatbots 1 100 --keywords 10 1000 --words 8 64 --concurrency 1 50
+    python -m benchmarks.bench_webhook --baseline benchmarks/results/2026-01-01T120000.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import gc
+import glob
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.load_webhook import percentile
+from benchmarks.stub_graph import StubGraphServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+WORDS = [
+    "zdravo", "koliko", "kosta", "dostava", "hvala", "pozdrav", "molim", "info",
+    "da", "li", "imate", "na", "stanju", "velicina", "boja", "šta", "kada", "gde",
+]
+
+# Poruke koje se mere sa tracemalloc-om (sekvencijalno, posle merenja brzine)
+ALLOC_SAMPLE = 200
+
+
+def account_id(i: int) -> str:
+    return f"1784{i:011d}"
+
+
+def trigger(rng: random.Random) -> str:
+    return "".join(rng.choice("abcdefghijklmnoprstuvz") for _ in range(rng.randint(4, 10)))
+
+
+def seed_database(chatbots: int, keywords: int, seed: int) -> list:
+    """Chatbotovi i keyword-i jednim bulk upisom; vraća trigger-e po chatbotu"""
+    from sqlalchemy import insert, select
+
+    from database import SessionLocal
+    from migrate import upgrade_database
+    from models import Chatbot, Keyword, User
+
+    upgrade_database()
+    rng = random.Random(seed)
+    db = SessionLocal()
+    user = User(username="bench", email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+
+    db.execute(insert(Chatbot), [
+        {"name": f"Bench {i}", "instagram_account_id": account_id(i), "access_token": f"token-{i}",
+         "owner_id": user.id, "is_active": True}
+        for i in range(chatbots)
+    ])
+    ids = db.scalars(select(Chatbot.id).order_by(Chatbot.id)).all()
+
+    triggers = []
+    rows = []
+    for chatbot_id in ids:
+        chatbot_triggers = [trigger(rng) for _ in range(keywords)]
+        triggers.append(chatbot_triggers)
+        rows.extend(
+            {"trigger": t, "response": f"Odgovor za {t}", "chatbot_id": chatbot_id, "is_active": True}
+            for t in chatbot_triggers
+        )
+    for i in range(0, len(rows), 5000):
+        db.execute(insert(Keyword), rows[i:i + 5000])
+    db.commit()
+    db.close()
+    return triggers
+
+
+def make_payloads(count: int, triggers: list, words: int, seed: int) -> list:
+    """Unapred serijalizovani payload-i - generisanje ne ulazi u merenje"""
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        chatbot = rng.randrange(len(triggers))
+        text = " ".join(rng.choice(WORDS) for _ in range(words))
+        # Otprilike polovina poruka pogađa neki keyword
+        if i % 2 == 0:
+            text += " " + rng.choice(triggers[chatbot])
+        payloads.append(json.dumps({
+            "object": "instagram",
+            "entry": [{
+                "id": account_id(chatbot),
+                "time": int(time.time()),
+                "messaging": [{
+                    "sender": {"id": f"sender-{rng.randrange(10000)}"},
+                    "recipient": {"id": account_id(chatbot)},
+                    "timestamp": int(time.time() * 1000),
+                    "message": {"mid": f"mid-{seed}-{i}", "text": text},
+                }],
+            }],
+        }).encode())
+    return payloads
+
+
+async def drive(client, payloads: list, concurrency: int) -> tuple:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"Content-Type": "application/json"}
+
+    async def one(payload):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/webhook", content=payload, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(payload) for payload in payloads))
+    return latencies, time.perf_counter() - start
+
+
+async def run_scenario(args) -> dict:
+    import httpx
+
+    import main
+
+    triggers = seed_database(args.chatbots, args.keywords, args.seed)
+    warmup = make_payloads(50, triggers, args.words, args.seed + 1)
+    payloads = make_payloads(args.requests, triggers, args.words, args.seed)
+    alloc_payloads = make_payloads(ALLOC_SAMPLE, triggers, args.words, args.seed + 2)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Zagrevanje keša chatbotova i konekcija
+            await drive(client, warmup, min(args.concurrency, 10))
+
+            latencies, elapsed = await drive(client, payloads, args.concurrency)
+
+            gc.collect()
+            gen0_before = gc.get_stats()[0]["collections"]
+            tracemalloc.start()
+            baseline, _ = tracemalloc.get_traced_memory()
+            await drive(client, alloc_payloads, 1)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            gen0 = gc.get_stats()[0]["collections"] - gen0_before
+
+    return {
+        "rps": args.requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "message_bytes": sum(len(p) for p in payloads) / len(payloads),
+        "peak_bytes_per_message": (peak - baseline) / ALLOC_SAMPLE,
+        "retained_bytes_per_message": (current - baseline) / ALLOC_SAMPLE,
+        "gc_gen0_per_1k_messages": gen0 * 1000 / ALLOC_SAMPLE,
+    }
+
+
+def scenario_name(chatbots: int, keywords: int, words: int, concurrency: int) -> str:
+    return f"bots={chatbots} kw={keywords} words={words} conc={concurrency}"
+
+
+def run_child(env: dict, args, chatbots: int, keywords: int, words: int, concurrency: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_webhook", "--child",
+         "--chatbots", str(chatbots), "--keywords", str(keywords), "--words", str(words),
+         "--concurrency", str(concurrency), "--requests", str(args.requests), "--seed", str(args.seed)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def latest_result(exclude: str = None) -> str:
+    files = sorted(f for f in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if f != exclude)
+    return files[-1] if files else None
+
+
+def compare(results: dict, baseline_path: str, threshold: float) -> list:
+    """Poređenje sa prethodnim rezultatima; vraća listu regresija"""
+    with open(baseline_path) as f:
+        baseline = {s["name"]: s for s in json.load(f)["scenarios"]}
+
+    print(f"\nPoređenje sa {os.path.basename(baseline_path)} (prag {threshold:.0%}):")
+    regressions = []
+    for scenario in results["scenarios"]:
+        before = baseline.get(scenario["name"])
+        if before is None:
+            continue
+        rps_change = scenario["rps"] / before["rps"] - 1
+        p99_change = scenario["p99_ms"] / before["p99_ms"] - 1
+        regressed = rps_change < -threshold or p99_change > threshold
+        if regressed:
+            regressions.append(scenario["name"])
+        print(
+            f"  {scenario['name']:<40} req/s {rps_change:+7.1%}   p99 {p99_change:+7.1%}"
+            f"{'   REGRESIJA' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chatbots", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--keywords", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--words", type=int, nargs="+", default=[8, 64])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--graph-delay", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON fajl za rezultate (default benchmarks/results/<vreme>.json)")
+    parser.add_argument("--baseline", help="Prethodni rezultati za poređenje (default poslednji u results/)")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        args.chatbots, args.keywords, args.words, args.concurrency = (
+            args.chatbots[0], args.keywords[0], args.words[0], args.concurrency[0]
+        )
+        print(json.dumps(asyncio.run(run_scenario(args))))
+        return
+
+    stub = StubGraphServer(delay=args.graph_delay).start()
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y-%m-%dT%H%M%S") + ".json")
+    baseline = args.baseline or latest_result(exclude=output)
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "graph_delay": args.graph_delay,
+        "scenarios": [],
+    }
+
+    print(f"{args.requests} webhook-a po scenariju, Graph API delay {args.graph_delay * 1000:.0f} ms")
+    for chatbots, keywords, words, concurrency in itertools.product(
+        args.chatbots, args.keywords, args.words, args.concurrency
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                GRAPH_API_BASE_URL=stub.base_url,
+                LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+                # Svaka poruka prolazi ceo pipeline (bez limita po pošiljaocu)
+                REPLY_RATE_LIMIT="0",
+                REPLY_REPEAT_WINDOW="0",
+            )
+            env.setdefault("DATABASE_URL", f"sqlite:///{tmp}/bench.db")
+            result = run_child(env, args, chatbots, keywords, words, concurrency)
+
+        name = scenario_name(chatbots, keywords, words, concurrency)
+        results["scenarios"].append({
+            "name": name, "chatbots": chatbots, "keywords": keywords,
+            "words": words, "concurrency": concurrency, **result,
+        })
+        print(
+            f"  {name:<40} {result['rps']:8.1f} req/s   p50 {result['p50_ms']:7.1f} ms"
+            f"   p99 {result['p99_ms']:7.1f} ms   {result['peak_bytes_per_message'] / 1024:7.1f} KiB/msg"
+            f"   {result['gc_gen0_per_1k_messages']:6.1f} gc0/1k"
+        )
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nRezultati: {output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Load test webhook-a: p50/p99 latencija sa inline slanjem (staro) i sa
+outbox-om i pozadinskim worker-ima (novo), protiv lokalnog stub Graph servera.
+
+Pokretanje iz backend/ foldera:
+    python -m benchmarks.load_webhook --requests 500 --concurrency 50 --graph-delay 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.stub_graph import StubGraphServer
+
+ACCOUNT_ID = "17841400000000000"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def webhook_payload(i: int) -> dict:
+    return {
+        "object": "instagram",
+        "entry": [{
+            "id": ACCOUNT_ID,
+            "time": int(time.time()),
+            "messaging": [{
+                "sender": {"id": f"sender-{i % 200}"},
+                "recipient": {"id": ACCOUNT_ID},
+                "timestamp": int(time.time() * 1000),
+                "message": {"mid": f"mid-{i}", "text": "koja je cena dostave?" if i % 2 else "zdravo"},
+            }],
+        }],
+    }
+
+
+def seed_database():
+    from database import SessionLocal
+    from migrate import upgrade_database
+    from models import User, Chatbot, Keyword
+
+    upgrade_database()
+    db = SessionLocal()
+    user = User(username="bench", email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    chatbot = Chatbot(name="Bench", instagram_account_id=ACCOUNT_ID, access_token="token", owner_id=user.id)
+    db.add(chatbot)
+    db.commit()
+    for trigger in ("cena", "dostava", "radno vreme", "adresa"):
+        db.add(Keyword(trigger=trigger, response=f"Odgovor za {trigger}", chatbot_id=chatbot.id))
+    db.commit()
+    db.close()
+
+
+async def drive(port: int, total: int, concurrency: int):
+    import httpx
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    url = f"http://127.0.0.1:{port}/api/webhook"
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(url, json=webhook_payload(i))
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, elapsed
+
+
+def run_child(args):
+    """Jedan mod - pokreće se u zasebnom procesu zbog env konfiguracije"""
+    import uvicorn
+
+    import main
+    seed_database()
+
+    port = free_port()
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="error")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    # Zagrevanje keša i konekcija
+    asyncio.run(drive(port, 20, 5))
+    latencies, elapsed = asyncio.run(drive(port, args.requests, args.concurrency))
+
+    server.should_exit = True
+    thread.join()
+
+    print(json.dumps({
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": args.requests / elapsed,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--graph-delay", type=float, default=0.05)
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    stub = StubGraphServer(delay=args.graph_delay).start()
+    print(f"{args.requests} webhook-a, concurrency {args.concurrency}, Graph API delay {args.graph_delay * 1000:.0f} ms")
+
+    for mode in ("inline", "outbox"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                GRAPH_API_BASE_URL=stub.base_url,
+                OUTBOUND_SEND_MODE=mode,
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.load_webhook", "--child",
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"  {mode:<7} p50 {result['p50_ms']:8.1f} ms   p99 {result['p99_ms']:8.1f} ms   {result['rps']:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Lokalni stub za graph.instagram.com - za benchmark i load testove.
+
+    python -m benchmarks.stub_graph --port 9100 --delay 0.05
+    python -m benchmarks.stub_graph --rate-limit 20
+
+Sa --rate-limit svaki access token sme toliko poziva u sekundi; odgovori
+nose X-App-Usage (procenat iskorišćenog limita), a višak dobija 429.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import json
+import threading
+import time
+
+
+class StubGraphServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay: float = 0.0, rate_limit: float = 0.0):
+        super().__init__(("127.0.0.1", port), StubGraphHandler)
+        self.delay = delay
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.throttled = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v18.0"
+
+    def start(self) -> "StubGraphServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def usage(self, token: str) -> float:
+        """Procenat limita u tekućoj sekundi (posle ovog poziva); 0 bez limita"""
+        if not self.rate_limit:
+            return 0.0
+        window = int(time.time())
+        with self._lock:
+            start, count = self._windows.get(token, (window, 0))
+            if start != window:
+                count = 0
+            count += 1
+            self._windows[token] = (window, count)
+            if count > self.rate_limit:
+                self.throttled += 1
+        return count / self.rate_limit * 100
+
+
+class StubGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        usage = self.server.usage(self._token())
+        if usage > 100:
+            self._send_json(429, {"error": {"code": 4, "message": "Application request limit reached"}}, usage)
+            return
+
+        with self.server._lock:
+            self.server.requests += 1
+            message_id = self.server.requests
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        recipient_id = body.get("recipient", {}).get("id")
+        self._send_json(200, {"recipient_id": recipient_id, "message_id": f"mid.{message_id}"}, usage)
+
+    def do_GET(self):
+        # Profil pošiljaoca: /v18.0/{user_id}?fields=username,name
+        user_id = self.path.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+
+        with self.server._lock:
+            self.server.requests += 1
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        self._send_json(200, {"id": user_id, "username": f"user_{user_id}", "name": f"User {user_id}"})
+
+    def _token(self) -> str:
+        return parse_qs(urlsplit(self.path).query).get("access_token", [""])[0]
+
+    def _send_json(self, status: int, data: dict, usage: float = 0.0):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if self.server.rate_limit:
+            self.send_header("X-App-Usage", json.dumps({"call_count": min(round(usage), 100)}))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Poziva/s po tokenu (0 = bez limita)")
+    args = parser.parse_args()
+
+    server = StubGraphServer(args.port, args.delay, args.rate_limit)
+    print(f"Stub Graph API: {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
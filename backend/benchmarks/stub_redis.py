@@ -0,0 +1,94 @@
+"""
+Lokalni Redis stub (PING, AUTH, SELECT, SUBSCRIBE, PUBLISH) - dovoljan za
+INVALIDATION_BUS=redis u testovima i benchmark-u, bez pravog Redis servera.
+
+    python -m benchmarks.stub_redis --port 6390
+"""
+from collections import defaultdict
+from typing import Dict, Set
+import argparse
+import asyncio
+import threading
+
+from invalidation_bus import _encode_command, _read_reply
+
+
+class StubRedisServer:
+    def __init__(self, port: int = 0):
+        self.port = port
+        self.published = 0
+        self._subscribers: Dict[bytes, Set[asyncio.StreamWriter]] = defaultdict(set)
+        self._loop = None
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def start(self) -> "StubRedisServer":
+        """Pokretanje u zasebnom thread-u sa sopstvenim event loop-om"""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, "127.0.0.1", self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        return self
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        channels = set()
+        try:
+            while True:
+                command = await _read_reply(reader)
+                name = command[0].upper()
+                if name == b"SUBSCRIBE":
+                    for channel in command[1:]:
+                        channels.add(channel)
+                        self._subscribers[channel].add(writer)
+                        writer.write(b"*3\r\n$9\r\nsubscribe\r\n" + _bulk(channel) + b":%d\r\n" % len(channels))
+                elif name == b"PUBLISH":
+                    channel, payload = command[1], command[2]
+                    receivers = list(self._subscribers.get(channel, ()))
+                    message = _encode_command("message", channel, payload)
+                    for receiver in receivers:
+                        receiver.write(message)
+                    self.published += 1
+                    writer.write(b":%d\r\n" % len(receivers))
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name in (b"AUTH", b"SELECT"):
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(b"-ERR unknown command\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in channels:
+                self._subscribers[channel].discard(writer)
+            writer.close()
+
+
+def _bulk(data: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    server = StubRedisServer(args.port).start()
+    print(f"Stub Redis: {server.url}")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import os
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Chatbot, Keyword
+from keyword_matcher import KeywordMatcher
+from templates import DEFAULT_RESPONSE, Template, compile_or_literal
+from invalidation_bus import invalidation_bus
+
+CHATBOT_CACHE_SIZE = int(os.getenv("CHATBOT_CACHE_SIZE", "10000"))
+
+
+class CachedChatbot(NamedTuple):
+    """Snapshot chatbota i njegovih aktivnih keyword-a za webhook"""
+    id: int
+    owner_id: int
+    name: str
+    instagram_account_id: str
+    access_token: str
+    is_active: bool
+    matcher: KeywordMatcher
+    # Kompajlirani šabloni odgovora po keyword ID-u i za odgovor bez match-a
+    templates: Dict[int, Template]
+    default_template: Template
+    # Neki šablon koristi profil pošiljaoca (vidi profiles.py)
+    needs_profile: bool
+    version: int
+
+
+class ChatbotCache:
+    """
+    In-memory LRU keš chatbotova po `instagram_account_id`.
+
+    Svaki ključ ima verziju koju `invalidate()` povećava; rezultat učitavanja
+    iz baze se upisuje samo ako se verzija nije promenila tokom učitavanja,
+    pa CRUD izmena koja se desi u međuvremenu ne može biti pregažena.
+    Keširaju se i nepostojeći nalozi (None) da nepoznat recipient_id ne bi
+    svaki put išao u bazu.
+    """
+
+    def __init__(self, max_size: int = CHATBOT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Optional[CachedChatbot]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, instagram_account_id: str, db: AsyncSession) -> Optional[CachedChatbot]:
+        """Chatbot iz keša, ili učitavanje iz baze na miss"""
+        return (await self.get_many([instagram_account_id], db))[instagram_account_id]
+
+    async def get_many(
+        self, instagram_account_ids: Iterable[str], db: AsyncSession
+    ) -> Dict[str, Optional[CachedChatbot]]:
+        """Više chatbotova odjednom - svi miss-evi se učitavaju jednim upitom"""
+        found: Dict[str, Optional[CachedChatbot]] = {}
+        versions: Dict[str, int] = {}
+
+        with self._lock:
+            for instagram_account_id in instagram_account_ids:
+                if instagram_account_id in found or instagram_account_id in versions:
+                    continue
+                if instagram_account_id in self._entries:
+                    self._entries.move_to_end(instagram_account_id)
+                    self.hits += 1
+                    found[instagram_account_id] = self._entries[instagram_account_id]
+                else:
+                    self.misses += 1
+                    versions[instagram_account_id] = self._versions.get(instagram_account_id, 0)
+
+        if not versions:
+            return found
+
+        loaded = await self._load(versions, db)
+
+        with self._lock:
+            for instagram_account_id, version in versions.items():
+                entry = loaded.get(instagram_account_id)
+                found[instagram_account_id] = entry
+                if self._versions.get(instagram_account_id, 0) != version:
+                    continue
+                self._entries[instagram_account_id] = entry
+                self._entries.move_to_end(instagram_account_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return found
+
+    def invalidate(self, instagram_account_id: str) -> None:
+        """Izbacivanje unosa posle izmene chatbota ili njegovih keyword-a"""
+        with self._lock:
+            self._versions[instagram_account_id] = self._versions.get(instagram_account_id, 0) + 1
+            if self._entries.pop(instagram_account_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for instagram_account_id in self._entries:
+                self._versions[instagram_account_id] = self._versions.get(instagram_account_id, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    @staticmethod
+    async def _load(versions: Dict[str, int], db: AsyncSession) -> Dict[str, CachedChatbot]:
+        chatbots = (await db.scalars(select(Chatbot).filter(
+            Chatbot.instagram_account_id.in_(list(versions))
+        ))).all()
+
+        if not chatbots:
+            return {}
+
+        keywords: Dict[int, List[Keyword]] = defaultdict(list)
+        for keyword in await db.scalars(select(Keyword).filter(
+            Keyword.chatbot_id.in_([chatbot.id for chatbot in chatbots]),
+            Keyword.is_active == True
+        ).order_by(Keyword.id)):
+            keywords[keyword.chatbot_id].append(keyword)
+
+        return {
+            chatbot.instagram_account_id: ChatbotCache._build(
+                chatbot, keywords[chatbot.id], versions[chatbot.instagram_account_id]
+            )
+            for chatbot in chatbots
+        }
+
+    @staticmethod
+    def _build(chatbot: Chatbot, keywords: List[Keyword], version: int) -> CachedChatbot:
+        templates = {keyword.id: compile_or_literal(keyword.response) for keyword in keywords if keyword.response}
+        default_template = compile_or_literal(chatbot.default_response or DEFAULT_RESPONSE)
+        return CachedChatbot(
+            id=chatbot.id,
+            owner_id=chatbot.owner_id,
+            name=chatbot.name,
+            instagram_account_id=chatbot.instagram_account_id,
+            access_token=chatbot.access_token,
+            is_active=bool(chatbot.is_active),
+            matcher=KeywordMatcher(keywords),
+            templates=templates,
+            default_template=default_template,
+            needs_profile=default_template.needs_profile or any(
+                template.needs_profile for template in templates.values()
+            ),
+            version=version,
+        )
+
+
+chatbot_cache = ChatbotCache()
+
+# Izmene iz drugih worker procesa (vidi invalidation_bus.py)
+invalidation_bus.subscribe("chatbot", chatbot_cache.invalidate)
+invalidation_bus.on_reset(chatbot_cache.clear)
@@ -0,0 +1,181 @@
+"""
+Stanje razgovora po (chatbot_id, sender_id) za webhook.
+
+- ponovljene isporuke iste poruke (isti `message.mid`) se preskaču - bez
+  log reda i bez odgovora
+- ista poruka poslata ponovo u roku od REPLY_REPEAT_WINDOW sekundi od
+  poslednjeg odgovora se loguje, ali se na nju ne odgovara
+- automatski odgovori su ograničeni po pošiljaocu (token bucket:
+  REPLY_RATE_LIMIT odgovora na REPLY_RATE_WINDOW sekundi)
+- poslednjih CONVERSATION_CONTEXT_SIZE odgovorenih poruka ostaje u `recent`
+
+Ako upis poruke ne uspe, `forget()` poništava mid i odgovor, pa se ponovna
+isporuka platforme obrađuje kao nova poruka.
+
+Stanje je u memoriji procesa (LRU + TTL neaktivnosti), O(1) po poruci. Sa
+više worker-a ponovljena isporuka može da stigne na drugi proces, pa je
+deduplikacija best-effort.
+"""
+from collections import OrderedDict, deque
+from typing import Deque, NamedTuple, Optional, Set, Tuple
+import os
+import time
+
+CONVERSATION_STATE_SIZE = int(os.getenv("CONVERSATION_STATE_SIZE", "50000"))
+CONVERSATION_STATE_TTL = float(os.getenv("CONVERSATION_STATE_TTL", "3600"))
+CONVERSATION_CONTEXT_SIZE = int(os.getenv("CONVERSATION_CONTEXT_SIZE", "5"))
+CONVERSATION_SEEN_MIDS = int(os.getenv("CONVERSATION_SEEN_MIDS", "20"))
+REPLY_RATE_LIMIT = int(os.getenv("REPLY_RATE_LIMIT", "5"))  # 0 = bez limita
+REPLY_RATE_WINDOW = float(os.getenv("REPLY_RATE_WINDOW", "60"))
+REPLY_REPEAT_WINDOW = float(os.getenv("REPLY_REPEAT_WINDOW", "30"))  # 0 = isključeno
+
+# Ishodi `ConversationStore.admit`
+REPLY = "reply"
+DUPLICATE = "duplicate"
+REPEAT = "repeat"
+RATE_LIMITED = "rate_limited"
+
+
+class ConversationTurn(NamedTuple):
+    at: float
+    text: str
+    reply: Optional[str]
+
+
+class ConversationState:
+    """Poslednje poruke, viđeni mid-ovi i token bucket jednog pošiljaoca"""
+
+    __slots__ = ("recent", "last_seen", "tokens", "refilled_at", "_mids", "_mid_order")
+
+    def __init__(self, now: float):
+        self.recent: Deque[ConversationTurn] = deque(maxlen=CONVERSATION_CONTEXT_SIZE)
+        self.last_seen = now
+        self.tokens = float(REPLY_RATE_LIMIT)
+        self.refilled_at = now
+        self._mids: Set[str] = set()
+        self._mid_order: Deque[str] = deque()
+
+    def seen(self, mid: Optional[str]) -> bool:
+        """True ako je mid već obrađen; inače ga pamti"""
+        if not mid:
+            return False
+        if mid in self._mids:
+            return True
+        if len(self._mid_order) >= CONVERSATION_SEEN_MIDS:
+            self._mids.discard(self._mid_order.popleft())
+        self._mid_order.append(mid)
+        self._mids.add(mid)
+        return False
+
+    def take_token(self, now: float) -> bool:
+        if REPLY_RATE_LIMIT <= 0:
+            return True
+        refill = (now - self.refilled_at) * REPLY_RATE_LIMIT / REPLY_RATE_WINDOW
+        self.tokens = min(float(REPLY_RATE_LIMIT), self.tokens + refill)
+        self.refilled_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def remember(self, text: str, reply: str, now: float) -> ConversationTurn:
+        """Samo za poruke na koje je poslat odgovor - od njih se računa REPEAT"""
+        turn = ConversationTurn(now, text, reply)
+        self.recent.append(turn)
+        return turn
+
+    def forget(self, mid: Optional[str], turn: Optional[ConversationTurn] = None) -> None:
+        """Poništavanje seen()/remember() za poruku čiji upis nije uspeo"""
+        if mid and mid in self._mids:
+            self._mids.discard(mid)
+            self._mid_order.remove(mid)
+        if turn is not None:
+            try:
+                self.recent.remove(turn)
+            except ValueError:
+                pass
+            if REPLY_RATE_LIMIT > 0:
+                self.tokens = min(float(REPLY_RATE_LIMIT), self.tokens + 1)
+
+
+class ConversationStore:
+    """
+    LRU po poslednjoj aktivnosti: najstariji unos je uvek na početku, pa se
+    istekli unosi skidaju sa početka pri svakom pristupu (amortizovano O(1)).
+    Koristi se samo iz event loop-a, bez lock-a.
+    """
+
+    def __init__(self, max_size: int = CONVERSATION_STATE_SIZE, ttl: float = CONVERSATION_STATE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, str], ConversationState]" = OrderedDict()
+
+        self.duplicates = 0
+        self.repeats = 0
+        self.rate_limited = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, chatbot_id: int, sender_id: str, now: Optional[float] = None) -> ConversationState:
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        key = (chatbot_id, sender_id)
+        state = self._entries.get(key)
+        if state is None:
+            state = self._entries[key] = ConversationState(now)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._entries.move_to_end(key)
+            state.last_seen = now
+        return state
+
+    def admit(
+        self, chatbot_id: int, sender_id: str, mid: Optional[str], text: str, now: Optional[float] = None
+    ) -> Tuple[str, ConversationState]:
+        """Odluka za dolaznu poruku: REPLY, DUPLICATE, REPEAT ili RATE_LIMITED"""
+        now = time.monotonic() if now is None else now
+        state = self.get(chatbot_id, sender_id, now)
+
+        if state.seen(mid):
+            self.duplicates += 1
+            verdict = DUPLICATE
+        elif (
+            REPLY_REPEAT_WINDOW > 0 and state.recent
+            and state.recent[-1].text == text and now - state.recent[-1].at < REPLY_REPEAT_WINDOW
+        ):
+            self.repeats += 1
+            verdict = REPEAT
+        elif not state.take_token(now):
+            self.rate_limited += 1
+            verdict = RATE_LIMITED
+        else:
+            verdict = REPLY
+        return verdict, state
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "duplicates": self.duplicates,
+            "repeats": self.repeats,
+            "rate_limited": self.rate_limited,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            state = next(iter(self._entries.values()))
+            if now - state.last_seen < self.ttl:
+                return
+            self._entries.popitem(last=False)
+            self.expired += 1
+
+
+conversation_store = ConversationStore()
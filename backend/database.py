@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Generator
 import os
 from dotenv import load_dotenv
 
@@ -11,19 +14,120 @@ DATABASE_URL = os.getenv(
     "sqlite:///./instagram_chatbot.db"
 )
 
+# Connection pool (po engine-u, po procesu)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def async_database_url(url: str) -> str:
+    """Isti URL sa async drajverom (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql://", "postgres://", "postgresql+psycopg2://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+# SQLite produkcioni mod: WAL, pragme, jedan writer thread i read-only pool za čitanja
+SQLITE_PRODUCTION = os.getenv("SQLITE_PRODUCTION", "1") == "1"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+SQLITE_TUNED = IS_SQLITE and SQLITE_PRODUCTION and ":memory:" not in DATABASE_URL
+
+
+def sqlite_readonly_url(url: str) -> str:
+    """sqlite+aiosqlite:///./x.db -> read-only URI konekcija na isti fajl"""
+    prefix, path = url.split(":///", 1)
+    return f"{prefix}:///file:{path}?mode=ro&uri=true"
+
+
+def _set_sqlite_pragmas(readonly: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not readonly:
+            # journal_mode je trajno svojstvo fajla - postavlja ga writer
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.close()
+    return on_connect
+
+
 # SQLite specific configuration
 connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
+if IS_SQLITE:
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+pool_args = {}
+if ":memory:" not in DATABASE_URL:
+    pool_args = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
+# Sinhroni engine - pozadinski worker-i (u thread-ovima) i CLI komande.
+# U SQLite modu koristi ga samo writer thread (db_writer.py) - jedna konekcija.
+writer_pool_args = {**pool_args, "pool_size": 1, "max_overflow": 0} if SQLITE_TUNED else pool_args
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **writer_pool_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# aiosqlite fajl engine do SQLAlchemy 2.0.37 podrazumeva NullPool koji odbija
+# pool_size/max_overflow - queue pool se zadaje eksplicitno
+async_pool_args = {"poolclass": AsyncAdaptedQueuePool} if pool_args else {}
+
+# Async engine - rute koje pišu (u SQLite modu takođe jedna konekcija, a
+# transakcija drži writer thread, vidi db_writer.exclusive)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **async_pool_args, **writer_pool_args)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Rute koje samo čitaju; u SQLite modu pool read-only konekcija (WAL - ne čekaju writer-a)
+async_read_engine = async_engine
+if SQLITE_TUNED:
+    async_read_engine = create_async_engine(
+        sqlite_readonly_url(ASYNC_DATABASE_URL), **async_pool_args, **pool_args
+    )
+    event.listen(engine, "connect", _set_sqlite_pragmas(readonly=False))
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas(readonly=False))
+    event.listen(async_read_engine.sync_engine, "connect", _set_sqlite_pragmas(readonly=True))
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db() -> Generator[Session, None, None]:
-    """Dependency za FastAPI"""
+    """Sinhrona sesija (van event loop-a)"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+@asynccontextmanager
+async def write_session() -> AsyncIterator[AsyncSession]:
+    """Async sesija za upis - u SQLite modu jedini writer u procesu dok je otvorena"""
+    from db_writer import db_writer  # db_writer uvozi database
+
+    async with db_writer.exclusive(), AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency za rute koje pišu (vidi write_session)"""
+    async with write_session() as db:
+        yield db
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency za rute bez upisa"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,84 @@
+"""
+Pozadinski upisi (message log, outbox, rollup-ovi).
+
+U SQLite produkcionom modu svi idu kroz jedan writer thread sa jednom
+konekcijom, redom kojim su stigli - nema "database is locked" između
+writer-a iz istog procesa. Na Postgres-u svaki upis dobija svoj thread
+iz default executor-a kao i pre.
+
+Rute koje pišu (async sesija, database.get_async_db) zauzimaju isti
+thread preko `exclusive()` dok im transakcija traje, pa je u procesu uvek
+najviše jedan upis - rute i pozadinski upisi čekaju u istom FIFO redu.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional, TypeVar
+import asyncio
+import threading
+
+from database import SQLITE_TUNED
+
+T = TypeVar("T")
+
+
+class DatabaseWriter:
+    def __init__(self, single_writer: bool = SQLITE_TUNED):
+        self.single_writer = single_writer
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.jobs = 0
+        self.exclusive_jobs = 0
+
+    def _submit(self, fn: Callable[..., T], *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        return self._executor.submit(fn, *args)
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Izvršavanje sinhrone funkcije za upis van event loop-a"""
+        self.jobs += 1
+        if not self.single_writer:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    @asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[None]:
+        """
+        Writer thread je zauzet (čeka) dok traje blok - za upise iz event
+        loop-a preko async konekcije. U bloku se ne sme čekati db_writer.run.
+        """
+        if not self.single_writer:
+            yield
+            return
+
+        self.exclusive_jobs += 1
+        loop = asyncio.get_running_loop()
+        acquired = loop.create_future()
+        release = threading.Event()
+
+        def hold() -> None:
+            loop.call_soon_threadsafe(lambda: acquired.done() or acquired.set_result(None))
+            release.wait()
+
+        self._submit(hold)
+        try:
+            await acquired
+            yield
+        finally:
+            release.set()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "single_writer": self.single_writer,
+            "jobs": self.jobs,
+            "exclusive_jobs": self.exclusive_jobs,
+            "queued": self._executor._work_queue.qsize() if self._executor else 0,
+        }
+
+
+db_writer = DatabaseWriter()
@@ -0,0 +1,233 @@
+"""
+Raspoređivanje poziva Graph API-ja po access tokenu (Instagram nalogu).
+
+Svaki token ima token bucket (GRAPH_API_RATE_PER_TOKEN poziva/s, burst
+GRAPH_API_BURST_PER_TOKEN, po procesu). Brzina se prilagođava onome što
+Graph API javlja:
+  - X-App-Usage / X-Business-Use-Case-Usage (procenat iskorišćenog limita):
+    preko GRAPH_API_USAGE_THRESHOLD brzina linearno pada ka
+    GRAPH_API_MIN_RATE_FACTOR, a estimated_time_to_regain_access blokira token
+  - 429: token se pauzira (Retry-After) i brzina se prepolovi; svaki uspešan
+    poziv je postepeno vraća (AIMD)
+Brojači upotrebe su na strani Meta-e pa se i više procesa sa zasebnim
+bucket-ima usporava zajedno.
+
+Ponovni pokušaji (retry=True) ne troše rezervu bucket-a
+(GRAPH_API_RETRY_RESERVE) - nove konverzacije prolaze i dok se red retry-a
+prazni. Kad bi čekanje bilo duže od GRAPH_API_MAX_WAIT, acquire ne čeka
+već vraća vreme pa outbox odlaže red bez trošenja pokušaja.
+
+Koristi se samo iz event loop-a (kao conversation_state), bez lock-a.
+"""
+from collections import OrderedDict
+from typing import Any, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+from metrics import graph_throttle_total
+
+logger = logging.getLogger(__name__)
+
+GRAPH_API_RATE_PER_TOKEN = float(os.getenv("GRAPH_API_RATE_PER_TOKEN", "50"))
+GRAPH_API_BURST_PER_TOKEN = float(os.getenv("GRAPH_API_BURST_PER_TOKEN", "50"))
+GRAPH_API_RETRY_RESERVE = float(os.getenv("GRAPH_API_RETRY_RESERVE", "0.25"))
+GRAPH_API_USAGE_THRESHOLD = float(os.getenv("GRAPH_API_USAGE_THRESHOLD", "75"))
+GRAPH_API_MIN_RATE_FACTOR = float(os.getenv("GRAPH_API_MIN_RATE_FACTOR", "0.05"))
+GRAPH_API_THROTTLE_PAUSE = float(os.getenv("GRAPH_API_THROTTLE_PAUSE", "5"))
+GRAPH_API_MAX_WAIT = float(os.getenv("GRAPH_API_MAX_WAIT", "5"))
+GRAPH_RATE_LIMITER_SIZE = int(os.getenv("GRAPH_RATE_LIMITER_SIZE", "10000"))
+
+# Deo brzine koji se vraća po uspešnom pozivu posle 429
+RECOVERY_STEP = 0.02
+
+USAGE_HEADERS = ("x-app-usage", "x-business-use-case-usage")
+USAGE_FIELDS = ("call_count", "total_cputime", "total_time")
+
+
+def parse_usage(headers: Any) -> tuple:
+    """(najveći procenat upotrebe, sekunde do ponovnog pristupa) iz usage header-a"""
+    usage = 0.0
+    regain = 0.0
+    for name in USAGE_HEADERS:
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+
+        # X-App-Usage je jedan objekat, BUC je {business_id: [objekat po tipu]}
+        entries = [data] if name == "x-app-usage" else [
+            entry for values in data.values() if isinstance(values, list) for entry in values
+        ]
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            for field in USAGE_FIELDS:
+                try:
+                    usage = max(usage, float(entry.get(field) or 0))
+                except (TypeError, ValueError):
+                    pass
+            try:
+                regain = max(regain, float(entry.get("estimated_time_to_regain_access") or 0) * 60)
+            except (TypeError, ValueError):
+                pass
+    return usage, regain
+
+
+class Bucket:
+    __slots__ = ("tokens", "updated", "usage", "penalty", "blocked_until")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+        self.usage = 0.0
+        self.penalty = 1.0
+        self.blocked_until = 0.0
+
+
+class GraphRateLimiter:
+    def __init__(
+        self,
+        rate: float = GRAPH_API_RATE_PER_TOKEN,
+        burst: float = GRAPH_API_BURST_PER_TOKEN,
+        retry_reserve: float = GRAPH_API_RETRY_RESERVE,
+        usage_threshold: float = GRAPH_API_USAGE_THRESHOLD,
+        min_rate_factor: float = GRAPH_API_MIN_RATE_FACTOR,
+        max_wait: float = GRAPH_API_MAX_WAIT,
+        max_size: int = GRAPH_RATE_LIMITER_SIZE,
+    ):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.retry_reserve = retry_reserve
+        self.usage_threshold = usage_threshold
+        self.min_rate_factor = min_rate_factor
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self._buckets: "OrderedDict[str, Bucket]" = OrderedDict()
+
+        self.acquired = 0
+        self.delayed = 0
+        self.deferred = 0
+        self.throttled = 0
+
+    def _bucket(self, key: str, now: float) -> Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket(self.burst, now)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def current_rate(self, bucket: Bucket) -> float:
+        factor = bucket.penalty
+        if bucket.usage > self.usage_threshold:
+            headroom = (100.0 - bucket.usage) / max(100.0 - self.usage_threshold, 1.0)
+            factor = min(factor, headroom)
+        return self.rate * max(factor, self.min_rate_factor)
+
+    def _refill(self, bucket: Bucket, now: float) -> None:
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.current_rate(bucket))
+        bucket.updated = now
+
+    def _wait(self, bucket: Bucket, now: float, retry: bool) -> float:
+        """Sekunde do slota; bucket mora biti dopunjen"""
+        if bucket.blocked_until > now:
+            return bucket.blocked_until - now
+        need = 1.0 + (self.burst * self.retry_reserve if retry else 0.0)
+        if bucket.tokens >= need:
+            return 0.0
+        return (need - bucket.tokens) / self.current_rate(bucket)
+
+    async def acquire(self, key: str, retry: bool = False, max_wait: Optional[float] = None) -> float:
+        """
+        Čeka slot za jedan poziv i vraća 0. Ako bi čekanje bilo duže od
+        `max_wait`, ne uzima slot i vraća koliko bi trebalo čekati.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        while True:
+            now = time.monotonic()
+            bucket = self._bucket(key, now)
+            self._refill(bucket, now)
+            wait = self._wait(bucket, now, retry)
+            if wait > max_wait:
+                self.deferred += 1
+                graph_throttle_total.inc(kind="deferred")
+                return wait
+
+            if bucket.blocked_until > now:
+                await asyncio.sleep(wait)
+                continue
+
+            # Slot se rezerviše pre spavanja (tokens može u minus) - kasniji
+            # pozivi čekaju iza ovog, umesto da se svi probude istovremeno
+            bucket.tokens -= 1
+            if wait > 0:
+                self.delayed += 1
+                graph_throttle_total.inc(kind="delayed")
+                await asyncio.sleep(wait)
+                if bucket.blocked_until > time.monotonic():
+                    # Token je pauziran (429) dok se čekalo
+                    bucket.tokens += 1
+                    continue
+            self.acquired += 1
+            return 0.0
+
+    def try_acquire(self, key: str) -> bool:
+        """Bez čekanja, za pozive koji nisu neophodni (profili) - ne diraju rezervu"""
+        now = time.monotonic()
+        bucket = self._bucket(key, now)
+        self._refill(bucket, now)
+        if self._wait(bucket, now, retry=True) > 0:
+            return False
+        bucket.tokens -= 1
+        self.acquired += 1
+        return True
+
+    def blocked_for(self, key: str) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        return max(bucket.blocked_until - time.monotonic(), 0.0)
+
+    def observe(self, key: str, status_code: int, headers: Any, retry_after: Optional[float] = None) -> None:
+        """Ažuriranje bucket-a iz odgovora (status + usage header-i)"""
+        now = time.monotonic()
+        bucket = self._bucket(key, now)
+        self._refill(bucket, now)
+
+        usage, regain = parse_usage(headers)
+        bucket.usage = usage
+        if status_code == 429 or regain > 0:
+            pause = max(regain, retry_after or 0.0) or GRAPH_API_THROTTLE_PAUSE
+            bucket.blocked_until = max(bucket.blocked_until, now + pause)
+            bucket.penalty = max(bucket.penalty / 2, self.min_rate_factor)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            self.throttled += 1
+            graph_throttle_total.inc(kind="throttled")
+            logger.warning(
+                "Graph API rate limit, pausing token for %.1fs", pause,
+                extra={"status_code": status_code, "usage": usage}
+            )
+        elif status_code < 400:
+            bucket.penalty = min(bucket.penalty + RECOVERY_STEP, 1.0)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "tokens": len(self._buckets),
+            "blocked": sum(1 for bucket in self._buckets.values() if bucket.blocked_until > now),
+            "acquired": self.acquired,
+            "delayed": self.delayed,
+            "deferred": self.deferred,
+            "throttled": self.throttled,
+        }
+
+
+graph_rate_limiter = GraphRateLimiter()
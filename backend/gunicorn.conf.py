@@ -0,0 +1,44 @@
+"""
+Više worker procesa na jednom host-u:
+    gunicorn main:app -c gunicorn.conf.py
+
+Sa više od jednog worker-a keš chatbotova i tokena se invalidira preko
+invalidation_bus-a; ako INVALIDATION_BUS nije zadat, koristi se "db".
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# X-Forwarded-For se prihvata samo od ovih adresa (login limit po IP-u koristi
+# pravu adresu klijenta); default je proxy na istom host-u (nginx), a iza
+# PaaS router-a (Render/Heroku) FORWARDED_ALLOW_IPS="*"
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+if workers > 1:
+    os.environ.setdefault("INVALIDATION_BUS", "db")
+
+# Migracije radi master jednom (on_starting), worker-i ih preskaču u lifespan-u
+os.environ["DB_AUTO_MIGRATE"] = "0"
+
+# Import aplikacije jednom u master-u - worker-i ga nasleđuju fork-om
+preload_app = True
+
+
+def on_starting(server):
+    from migrate import upgrade_database
+
+    upgrade_database()
+
+
+def post_fork(server, worker):
+    # Konekcije otvorene u master-u (migracije) ne smeju da se dele između procesa
+    from database import engine, async_engine, async_read_engine
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    async_read_engine.sync_engine.dispose(close=False)
@@ -1,13 +1,36 @@
-from typing import Optional
-import requests
-from sqlalchemy.orm import Session
-from models import Chatbot, Keyword, Message
+from datetime import datetime
+from typing import List, Optional, Tuple
+import logging
+import time
+from chatbot_cache import CachedChatbot
+from conversation_state import DUPLICATE, REPLY, conversation_store
+from outbound_sender import GRAPH_API_BASE_URL, GRAPH_API_TIMEOUT, OUTBOUND_SEND_MODE
+from graph_rate_limiter import graph_rate_limiter
+from message_log import message_log
+from live_feed import live_feed
+from profiles import profile_cache
+from metrics import match_latency, replies_total, send_latency
+from rollups import rollup_aggregator
+
+logger = logging.getLogger(__name__)
+
+# Deljena sesija - keep-alive konekcije i za sinhrono slanje; requests se
+# učitava tek u inline režimu (outbox režim ga ne koristi)
+_http_session = None
+
+
+def _session():
+    global _http_session
+    if _http_session is None:
+        import requests
+        _http_session = requests.Session()
+    return _http_session
 
 
 class InstagramService:
     def __init__(self, access_token: str):
         self.access_token = access_token
-        self.base_url = "https://graph.instagram.com/v18.0"
+        self.base_url = GRAPH_API_BASE_URL
     
     def send_message(self, recipient_id: str, message_text: str) -> dict:
         """Slanje poruke preko Instagram API"""
@@ -20,74 +43,176 @@ class InstagramService:
         
         params = {"access_token": self.access_token}
         
+        # Deljeni limiter pamti 429/usage header-e i između instanci
+        blocked = graph_rate_limiter.blocked_for(self.access_token)
+        if blocked:
+            logger.warning("Skipping send to %s, token rate limited for %.1fs", recipient_id, blocked)
+            return {"error": "Rate limited", "retryable": True}
+        
         try:
-            response = requests.post(url, json=payload, params=params)
+            with send_latency.time(mode="inline"):
+                response = _session().post(
+                    url, json=payload, params=params, timeout=GRAPH_API_TIMEOUT
+                )
+            try:
+                retry_after = float(response.headers["Retry-After"])
+            except (KeyError, ValueError):
+                retry_after = None
+            graph_rate_limiter.observe(self.access_token, response.status_code, response.headers, retry_after)
             return response.json()
         except Exception as e:
-            print(f"❌ Error sending message: {e}")
+            logger.error("Error sending message to %s: %s", recipient_id, e)
             return {"error": str(e)}
 
 
-def process_incoming_message(
+async def process_incoming_message(
     sender_id: str,
     message_text: str,
-    chatbot: Chatbot,
-    db: Session
+    chatbot: CachedChatbot,
+    mid: Optional[str] = None
 ) -> Optional[str]:
     """
     Procesiranje dolazne poruke i pronalaženje odgovora
     """
+    responses = await process_incoming_batch(chatbot, [(sender_id, message_text, mid)])
+    return responses[0]
+
+
+async def process_incoming_batch(
+    chatbot: CachedChatbot,
+    events: List[Tuple[str, str, Optional[str]]]
+) -> List[Optional[str]]:
+    """
+    Procesiranje svih poruka za jedan chatbot iz jedne webhook isporuke.
+    `events` su (sender_id, message_text, mid) trojke; svi log i outbox
+    redovi se upisuju jednim pozivom message_log-a.
+
+    Ponovljene isporuke (isti mid) se preskaču, a na ponovljene poruke i
+    pošiljaoce preko limita se ne odgovara (vidi conversation_state.py);
+    za njih je odgovor None.
+
+    Odgovori su šabloni kompajlirani u kešu chatbota (vidi templates.py);
+    profili pošiljalaca se traže jednim lookup-om za celu isporuku.
+
+    Ako obrada ne uspe pre upisa loga, stanje razgovora se vraća (mid-ovi
+    i odgovori), pa ponovna isporuka istih poruka nije DUPLICATE.
+    """
+    # (stanje, mid, odgovor) za poništavanje dok log nije upisan
+    admitted = []
     try:
-        # Pretraživanje keyword-a (case-insensitive)
-        message_lower = message_text.lower()
+        # Pretraživanje keyword-a (case-insensitive, matcher je keširan po chatbotu)
+        logger.debug(
+            "Matching %d messages against %d keywords", len(events), len(chatbot.matcher),
+            extra={"chatbot_id": chatbot.id}
+        )
+        
+        inline = OUTBOUND_SEND_MODE == "inline"
+        timestamp = datetime.utcnow()
+        responses = []
+        rows = []
+        matched = 0
+        defaults = 0
         
-        keywords = db.query(Keyword).filter(
-            Keyword.chatbot_id == chatbot.id,
-            Keyword.is_active == True
-        ).all()
+        now = time.monotonic()
         
-        print(f"🔍 Found {len(keywords)} keywords for chatbot")
+        # Profil se traži i čeka samo ako ga neki šablon koristi - inače samo keš (vidi profiles.py)
+        profiles = await profile_cache.lookup(
+            chatbot.id, chatbot.access_token, (sender_id for sender_id, _, _ in events),
+            wait=chatbot.needs_profile
+        )
         
-        response_text = None
-        matched_keyword = None
+        for sender_id, message_text, mid in events:
+            verdict, state = conversation_store.admit(chatbot.id, sender_id, mid, message_text, now)
+            if verdict == DUPLICATE:
+                responses.append(None)
+                continue
+            
+            profile = profiles.get(sender_id)
+            if verdict == REPLY:
+                # Traženje najboljeg match-a (priority, pa tačan pre fuzzy, pa duži trigger - vidi keyword_matcher.py)
+                start = time.perf_counter()
+                keyword = chatbot.matcher.match(message_text)
+                match_latency.observe(time.perf_counter() - start)
+                template = chatbot.templates.get(keyword.id) if keyword else None
+                if template is not None:
+                    matched_keyword = keyword.trigger
+                    matched += 1
+                else:
+                    # Default odgovor ako nema match-a
+                    template = chatbot.default_template
+                    matched_keyword = "default"
+                    defaults += 1
+                response_text = template.render({
+                    "username": profile.username if profile else None,
+                    "name": profile.name if profile else None,
+                    "chatbot": chatbot.name,
+                    "message": message_text,
+                    "keyword": keyword.trigger if keyword else None,
+                })
+            else:
+                # Ponovljena poruka ili limit - loguje se, bez odgovora
+                response_text = None
+                matched_keyword = None
+            
+            turn = state.remember(message_text, response_text, now) if response_text is not None else None
+            admitted.append((state, mid, turn))
+            
+            # Logovanje poruke (baferisano, vidi message_log.py)
+            new_message = {
+                "sender_id": sender_id,
+                "sender_username": profile.username if profile else None,
+                "message_text": message_text,
+                "bot_response": response_text,
+                "matched_keyword": matched_keyword,
+                "chatbot_id": chatbot.id,
+                "timestamp": timestamp,
+            }
+            
+            # Odgovor ide u outbox zajedno sa log redom - šalju ga outbox worker-i
+            outbound_message = None if inline or response_text is None else {
+                "recipient_id": sender_id,
+                "message_text": response_text,
+                "chatbot_id": chatbot.id,
+            }
+            
+            rows.append((new_message, outbound_message))
+            responses.append(response_text)
         
-        # Traženje najboljeg match-a
-        for keyword in keywords:
-            if keyword.trigger.lower() in message_lower:
-                response_text = keyword.response
-                matched_keyword = keyword.trigger
-                print(f"✅ Matched keyword: {matched_keyword}")
-                break
+        if matched:
+            replies_total.inc(matched, chatbot_id=chatbot.id, kind="keyword")
+        if defaults:
+            replies_total.inc(defaults, chatbot_id=chatbot.id, kind="default")
         
-        # Default odgovor ako nema match-a
-        if not response_text:
-            response_text = "Hvala na poruci! Odgovorićemo Vam uskoro."
-            matched_keyword = "default"
-            print(f"⚠️ No keyword match, using default response")
+        if not rows:
+            return responses
         
-        # Logovanje poruke
-        new_message = Message(
-            sender_id=sender_id,
-            message_text=message_text,
-            bot_response=response_text,
-            matched_keyword=matched_keyword,
-            chatbot_id=chatbot.id
+        await message_log.write(rows)
+        admitted = []
+        await rollup_aggregator.record(
+            chatbot.id, timestamp,
+            [(message["sender_id"], message["matched_keyword"]) for message, _ in rows]
         )
+        # Otvoreni dashboard-i vlasnika dobijaju poruke odmah (vidi live_feed.py)
+        if live_feed.listening(chatbot.owner_id):
+            live_feed.publish(chatbot.owner_id, chatbot.id, [
+                dict(message, timestamp=timestamp.isoformat()) for message, _ in rows
+            ])
         
-        db.add(new_message)
-        db.commit()
-        
-        # Slanje odgovora preko Instagram API
-        print(f"📤 Sending response to {sender_id}: {response_text[:50]}...")
-        instagram_service = InstagramService(chatbot.access_token)
-        result = instagram_service.send_message(sender_id, response_text)
-        print(f"📨 Instagram API response: {result}")
+        if inline:
+            instagram_service = InstagramService(chatbot.access_token)
+            for (sender_id, _, _), response_text in zip(events, responses):
+                if response_text is None:
+                    continue
+                result = instagram_service.send_message(sender_id, response_text)
+                logger.debug("Instagram API response for %s: %s", sender_id, result)
         
-        return response_text
+        return responses
         
-    except Exception as e:
-        print(f"❌ Error in process_incoming_message: {e}")
-        return None
+    except Exception:
+        logger.exception("Error in process_incoming_batch", extra={"chatbot_id": chatbot.id})
+        for state, mid, turn in admitted:
+            state.forget(mid, turn)
+        return [None] * len(events)
 
 
 def verify_webhook(mode: str, token: str, challenge: str, verify_token: str) -> Optional[str]:
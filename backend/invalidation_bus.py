@@ -0,0 +1,361 @@
+"""
+Kanal za invalidaciju keša između worker procesa.
+
+`publish(kind, key)` odmah invalidira lokalni keš, a ostalim procesima poruku
+šalje pozadinski task. Backend bira INVALIDATION_BUS:
+
+    memory  jedan proces (default) - samo lokalna invalidacija
+    db      jedan host ili više node-ova nad istom bazom - tabela
+            cache_invalidations, polling na INVALIDATION_POLL_INTERVAL sekundi
+    redis   Redis PUBLISH/SUBSCRIBE (RESP) na INVALIDATION_BUS_URL
+
+Maksimalno kašnjenje je interval polling-a (db) odnosno mrežni RTT (redis).
+Ako se redis konekcija prekine, posle ponovnog povezivanja keš se briše ceo
+jer su poruke iz prekida izgubljene.
+"""
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+from sqlalchemy import delete, func, insert, select
+
+from database import AsyncReadSessionLocal, SessionLocal
+from db_writer import db_writer
+from models import CacheInvalidation
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "memory")
+INVALIDATION_BUS_URL = os.getenv("INVALIDATION_BUS_URL", "redis://127.0.0.1:6379/0")
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "cache-invalidation")
+INVALIDATION_POLL_INTERVAL = float(os.getenv("INVALIDATION_POLL_INTERVAL", "0.5"))
+INVALIDATION_RETENTION = int(os.getenv("INVALIDATION_RETENTION", "3600"))
+
+# Redovi sa nižim id-jem mogu da postanu vidljivi kasnije (transakcije u toku),
+# pa db backend ponovo čita poslednjih N id-jeva i preskače već primenjene
+DB_BUS_LOOKBACK = 100
+
+
+class InvalidationBus:
+    """Memory backend; podklase dodaju slanje i prijem između procesa"""
+
+    remote = False
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Callable[[Any], None]]] = defaultdict(list)
+        self._reset_handlers: List[Callable[[], None]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outgoing: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.published = 0
+        self.received = 0
+        self.resets = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def subscribe(self, kind: str, handler: Callable[[Any], None]) -> None:
+        self._handlers[kind].append(handler)
+
+    def on_reset(self, handler: Callable[[], None]) -> None:
+        """Handler za slučaj kad su poruke možda propuštene (brisanje celog keša)"""
+        self._reset_handlers.append(handler)
+
+    def publish(self, kind: str, key: Any) -> None:
+        """Lokalna invalidacija odmah, ostalim procesima asinhrono; bezbedno iz bilo kog thread-a"""
+        self._dispatch(kind, key)
+        self.published += 1
+        if self._loop is not None:
+            payload = json.dumps({"origin": self.origin, "kind": kind, "key": key})
+            self._loop.call_soon_threadsafe(self._outgoing.put_nowait, payload)
+
+    async def start(self) -> None:
+        if self.running or not self.remote:
+            return
+
+        # Po procesu - sa gunicorn preload_app objekat nastaje pre fork-a
+        self.origin = uuid.uuid4().hex
+        await self._connect()
+        self._loop = asyncio.get_running_loop()
+        self._outgoing = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._sender()), asyncio.create_task(self._listen())]
+
+    async def stop(self) -> None:
+        """Slanje poruka iz reda pa gašenje"""
+        if not self.running:
+            return
+
+        sender, listener = self._tasks
+        self._loop = None
+        self._outgoing.put_nowait(None)
+        await sender
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        self._tasks = []
+        await self._close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "published": self.published,
+            "received": self.received,
+            "resets": self.resets,
+            "errors": self.errors,
+        }
+
+    def _dispatch(self, kind: str, key: Any) -> None:
+        for handler in self._handlers.get(kind, ()):
+            handler(key)
+
+    def _receive(self, payload: str) -> None:
+        message = json.loads(payload)
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._dispatch(message["kind"], message["key"])
+
+    def _reset(self) -> None:
+        self.resets += 1
+        for handler in self._reset_handlers:
+            handler()
+
+    async def _sender(self) -> None:
+        while True:
+            payload = await self._outgoing.get()
+            batch = []
+            stopping = payload is None
+            if not stopping:
+                batch.append(payload)
+            while not self._outgoing.empty():
+                payload = self._outgoing.get_nowait()
+                if payload is None:
+                    stopping = True
+                else:
+                    batch.append(payload)
+
+            if batch:
+                try:
+                    await self._send(batch)
+                except Exception:
+                    self.errors += 1
+                    logger.exception("Invalidation publish error", extra={"messages": len(batch)})
+
+            if stopping:
+                return
+
+    async def _connect(self) -> None:
+        pass
+
+    async def _close(self) -> None:
+        pass
+
+    async def _send(self, payloads: List[str]) -> None:
+        raise NotImplementedError
+
+    async def _listen(self) -> None:
+        raise NotImplementedError
+
+
+def _insert_invalidations(payloads: List[str]) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(insert(CacheInvalidation), [{"payload": payload} for payload in payloads])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _prune_invalidations(before: datetime) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(delete(CacheInvalidation).where(CacheInvalidation.created_at < before))
+        db.commit()
+    finally:
+        db.close()
+
+
+class DatabaseBus(InvalidationBus):
+    remote = True
+
+    def __init__(self, poll_interval: float = INVALIDATION_POLL_INTERVAL):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self._last_id = 0
+        self._applied: "OrderedDict[int, None]" = OrderedDict()
+
+    async def _connect(self) -> None:
+        # Postojeće poruke se ne primenjuju - keš ovog procesa je tek napravljen
+        async with AsyncReadSessionLocal() as db:
+            self._last_id = await db.scalar(select(func.max(CacheInvalidation.id))) or 0
+            for (message_id,) in await db.execute(
+                select(CacheInvalidation.id).where(CacheInvalidation.id > self._last_id - DB_BUS_LOOKBACK)
+            ):
+                self._applied[message_id] = None
+
+    async def _send(self, payloads: List[str]) -> None:
+        await db_writer.run(_insert_invalidations, payloads)
+
+    async def _listen(self) -> None:
+        polls = 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._poll()
+                polls += 1
+                if polls % 600 == 0:
+                    cutoff = datetime.utcnow() - timedelta(seconds=INVALIDATION_RETENTION)
+                    await db_writer.run(_prune_invalidations, cutoff)
+            except Exception:
+                self.errors += 1
+                logger.exception("Invalidation poll error")
+
+    async def _poll(self) -> None:
+        async with AsyncReadSessionLocal() as db:
+            rows = (await db.execute(
+                select(CacheInvalidation.id, CacheInvalidation.payload)
+                .where(CacheInvalidation.id > self._last_id - DB_BUS_LOOKBACK)
+                .order_by(CacheInvalidation.id)
+            )).all()
+
+        for row in rows:
+            if row.id in self._applied:
+                continue
+            self._applied[row.id] = None
+            self._last_id = max(self._last_id, row.id)
+            self._receive(row.payload)
+
+        while len(self._applied) > DB_BUS_LOOKBACK * 4:
+            self._applied.popitem(last=False)
+
+
+class RedisError(Exception):
+    pass
+
+
+def _encode_command(*args: str) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg.encode() if isinstance(arg, str) else arg
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest
+    if kind == b"-":
+        raise RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class RedisBus(InvalidationBus):
+    """Minimalni RESP klijent - PUBLISH na jednoj, SUBSCRIBE na drugoj konekciji"""
+
+    remote = True
+
+    def __init__(self, url: str = INVALIDATION_BUS_URL, channel: str = INVALIDATION_CHANNEL):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.channel = channel
+        self._publisher = None
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(_encode_command("AUTH", self.password))
+            await writer.drain()
+            await _read_reply(reader)
+        return reader, writer
+
+    async def _close(self) -> None:
+        if self._publisher is not None:
+            self._publisher[1].close()
+            self._publisher = None
+
+    async def _send(self, payloads: List[str]) -> None:
+        # Jedan ponovni pokušaj sa novom konekcijom
+        for attempt in range(2):
+            try:
+                if self._publisher is None:
+                    self._publisher = await self._open()
+                reader, writer = self._publisher
+                writer.write(b"".join(_encode_command("PUBLISH", self.channel, p) for p in payloads))
+                await writer.drain()
+                for _ in payloads:
+                    await _read_reply(reader)
+                return
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                await self._close()
+                if attempt:
+                    raise
+
+    async def _listen(self) -> None:
+        connected_before = False
+        backoff = 0.5
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                writer.write(_encode_command("SUBSCRIBE", self.channel))
+                await writer.drain()
+                await _read_reply(reader)
+
+                if connected_before:
+                    self._reset()
+                connected_before = True
+                backoff = 0.5
+
+                while True:
+                    reply = await _read_reply(reader)
+                    if isinstance(reply, list) and reply[0] == b"message":
+                        self._receive(reply[2].decode())
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, RedisError) as e:
+                self.errors += 1
+                logger.warning("Invalidation subscriber disconnected: %s", e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+
+def create_bus(backend: str = INVALIDATION_BUS) -> InvalidationBus:
+    if backend == "memory":
+        return InvalidationBus()
+    if backend == "db":
+        return DatabaseBus()
+    if backend == "redis":
+        return RedisBus()
+    raise ValueError("INVALIDATION_BUS must be one of ('memory', 'db', 'redis')")
+
+
+invalidation_bus = create_bus()
@@ -0,0 +1,268 @@
+"""
+Bulk import i export keyword-a jednog chatbota (CSV ili JSONL).
+
+Kolone / ključevi: trigger, response, is_active (opciono, default true),
+match_type (opciono, default substring) i priority (opciono, default 0).
+Import se čita iz request stream-a red po red i validira ceo pre upisa;
+ako ima grešaka ništa se ne upisuje. Postojeći keyword-i se prepoznaju po
+paru (trigger, match_type) i ažuriraju - trigger se poredi posle fold()-a
+kao u matcher-u, a regex doslovno (fold() menja izraz). Isti tekst sa
+drugim match_type-om je zaseban keyword. Ostali se dodaju - sve u jednoj
+transakciji, bulk naredbama po KEYWORD_IMPORT_CHUNK redova. Matcher se ponovo gradi jednom, posle commit-a.
+Export čita tabelu u delovima (stream) i ne drži je celu u memoriji.
+"""
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+import codecs
+import csv
+import io
+import os
+
+import orjson
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncReadSessionLocal
+from keyword_matcher import REGEX, SUBSTRING, fold, validate_trigger
+from models import Keyword
+from templates import validate_template
+
+KEYWORD_IMPORT_MAX_ROWS = int(os.getenv("KEYWORD_IMPORT_MAX_ROWS", "50000"))
+KEYWORD_IMPORT_CHUNK = int(os.getenv("KEYWORD_IMPORT_CHUNK", "1000"))
+KEYWORD_EXPORT_CHUNK = 1000
+
+# Najviše grešaka u odgovoru na neuspešan import
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = ("csv", "jsonl")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+COLUMNS = ("trigger", "response", "is_active", "match_type", "priority")
+
+_TRUE = {"1", "true", "yes", "da"}
+_FALSE = {"0", "false", "no", "ne"}
+
+
+class KeywordRow(NamedTuple):
+    line: int
+    trigger: str
+    response: str
+    is_active: bool
+    match_type: str
+    priority: int
+
+
+class KeywordImportError(Exception):
+    """Neispravan fajl - `errors` su {"line", "error"} parovi"""
+
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} invalid rows")
+        self.errors = errors
+
+
+def normalize_trigger(trigger: str) -> str:
+    return fold(trigger.strip())
+
+
+def import_key(trigger: str, match_type: Optional[str]) -> Tuple[str, str]:
+    """Ključ za prepoznavanje istog keyword-a pri importu"""
+    match_type = match_type or SUBSTRING
+    return (trigger.strip() if match_type == REGEX else normalize_trigger(trigger), match_type)
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, dict]]:
+    header = None
+    record: List[str] = []
+    quotes = 0
+    line_number = 0
+    start = 1
+
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not record:
+            start = line_number
+        record.append(line.rstrip("\r"))
+        quotes += line.count('"')
+        if quotes % 2:
+            # Polje pod navodnicima se nastavlja u sledećem redu
+            continue
+
+        text = "\n".join(record)
+        record, quotes = [], 0
+        if not text.strip():
+            continue
+        values = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        yield start, dict(zip(header, values))
+
+    if record:
+        yield start, {"__error__": "unterminated quoted field"}
+
+
+async def _iter_jsonl(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, dict]]:
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            value = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield line_number, {"__error__": "invalid JSON"}
+            continue
+        if not isinstance(value, dict):
+            yield line_number, {"__error__": "expected a JSON object"}
+            continue
+        yield line_number, value
+
+
+def _parse_bool(value) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    text = "" if value is None else str(value).strip().lower()
+    if not text or text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    return None
+
+
+def _validate(line: int, record: dict) -> KeywordRow:
+    if "__error__" in record:
+        raise ValueError(record["__error__"])
+
+    trigger = record.get("trigger")
+    response = record.get("response")
+    if not isinstance(trigger, str) or not trigger.strip():
+        raise ValueError("trigger is required")
+    if not isinstance(response, str) or not response.strip():
+        raise ValueError("response is required")
+    error = validate_template(response)
+    if error:
+        raise ValueError(error)
+
+    is_active = _parse_bool(record.get("is_active"))
+    if is_active is None:
+        raise ValueError("is_active must be true or false")
+
+    match_type = str(record.get("match_type") or SUBSTRING).strip().lower()
+    error = validate_trigger(trigger, match_type)
+    if error:
+        raise ValueError(error)
+
+    priority = record.get("priority")
+    try:
+        priority = int(priority) if priority not in (None, "") else 0
+    except (TypeError, ValueError):
+        raise ValueError("priority must be an integer")
+
+    return KeywordRow(line, trigger.strip(), response, is_active, match_type, priority)
+
+
+async def read_import(chunks: AsyncIterator[bytes], fmt: str) -> List[KeywordRow]:
+    """
+    Parsiranje i validacija upload-a; kasniji red sa istim triggerom i
+    match_type-om zamenjuje raniji. Diže KeywordImportError ako ima neispravnih redova.
+    """
+    records = _iter_csv(chunks) if fmt == "csv" else _iter_jsonl(chunks)
+    rows: Dict[Tuple[str, str], KeywordRow] = {}
+    errors: List[dict] = []
+    count = 0
+
+    async for line, record in records:
+        count += 1
+        if count > KEYWORD_IMPORT_MAX_ROWS:
+            errors.append({"line": line, "error": f"more than {KEYWORD_IMPORT_MAX_ROWS} rows"})
+            break
+        try:
+            row = _validate(line, record)
+        except ValueError as e:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": line, "error": str(e)})
+            continue
+        rows[import_key(row.trigger, row.match_type)] = row
+
+    if errors:
+        raise KeywordImportError(errors)
+    return list(rows.values())
+
+
+async def apply_import(db: AsyncSession, chatbot_id: int, rows: List[KeywordRow]) -> dict:
+    """Bulk insert/update u otvorenoj transakciji (commit radi pozivalac)"""
+    existing: Dict[Tuple[str, str], int] = {}
+    for keyword_id, trigger, match_type in await db.execute(
+        select(Keyword.id, Keyword.trigger, Keyword.match_type)
+        .filter(Keyword.chatbot_id == chatbot_id).order_by(Keyword.id)
+    ):
+        existing.setdefault(import_key(trigger, match_type), keyword_id)
+
+    inserts = []
+    updates = []
+    for row in rows:
+        keyword_id = existing.get(import_key(row.trigger, row.match_type))
+        values = {
+            "trigger": row.trigger,
+            "response": row.response,
+            "is_active": row.is_active,
+            "match_type": row.match_type,
+            "priority": row.priority,
+        }
+        if keyword_id is None:
+            inserts.append({**values, "chatbot_id": chatbot_id})
+        else:
+            updates.append({**values, "id": keyword_id})
+
+    for i in range(0, len(inserts), KEYWORD_IMPORT_CHUNK):
+        await db.execute(insert(Keyword), inserts[i:i + KEYWORD_IMPORT_CHUNK])
+    for i in range(0, len(updates), KEYWORD_IMPORT_CHUNK):
+        await db.execute(update(Keyword), updates[i:i + KEYWORD_IMPORT_CHUNK])
+
+    return {"created": len(inserts), "updated": len(updates)}
+
+
+async def export_keywords(chatbot_id: int, fmt: str) -> AsyncIterator[bytes]:
+    """
+    Stream redova za StreamingResponse. Sesija se otvara ovde jer se
+    dependency sesija zatvara pre slanja tela odgovora.
+    """
+    query = select(
+        Keyword.trigger, Keyword.response, Keyword.is_active, Keyword.match_type, Keyword.priority
+    ).filter(
+        Keyword.chatbot_id == chatbot_id
+    ).order_by(Keyword.id).execution_options(yield_per=KEYWORD_EXPORT_CHUNK)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if fmt == "csv":
+        yield (",".join(COLUMNS) + "\n").encode()
+
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            if fmt == "csv":
+                writer.writerows(
+                    (trigger, response, "true" if is_active else "false", match_type, priority)
+                    for trigger, response, is_active, match_type, priority in partition
+                )
+                chunk = buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                chunk = b"".join(
+                    orjson.dumps(dict(zip(COLUMNS, (trigger, response, bool(is_active), match_type, priority)))) + b"\n"
+                    for trigger, response, is_active, match_type, priority in partition
+                )
+            yield chunk
@@ -0,0 +1,575 @@
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import logging
+import os
+import re
+import unicodedata
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+try:
+    # Isti regex dijalekt kao `re`, ali search prima timeout
+    import regex as regex_engine
+except ImportError:
+    regex_engine = None
+
+logger = logging.getLogger(__name__)
+
+# Ispod ovog broja trigger-a obična petlja je brža od prolaska kroz automat
+LINEAR_SCAN_THRESHOLD = 128
+
+# Regex se izvršava nad najviše ovoliko znakova poruke (zaštita od sporih izraza)
+REGEX_MAX_INPUT = 1000
+
+# Najduže izvršavanje jednog regex-a po poruci (s); samo sa `regex` paketom
+KEYWORD_REGEX_TIMEOUT = float(os.getenv("KEYWORD_REGEX_TIMEOUT", "0.05"))
+
+# Ponavljanje sa više od ovoliko ponavljanja se tretira kao neograničeno
+REGEX_UNBOUNDED_REPEAT = 10
+
+# Fuzzy: najveći multi-word trigger (broj reči) koji se poredi sa n-gramima poruke
+FUZZY_MAX_WORDS = 3
+
+SUBSTRING = "substring"
+WORD = "word"
+REGEX = "regex"
+FUZZY = "fuzzy"
+MATCH_TYPES = (SUBSTRING, WORD, REGEX, FUZZY)
+
+_WORD_RE = re.compile(r"\w+")
+
+# Srpska ćirilica -> latinica (mala slova, posle casefold-a); dijakritici se
+# zatim skidaju kroz NFKD, pa "Шта", "šta" i "sta" postaju isto "sta"
+_FOLD_TABLE = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "ђ": "dj", "е": "e",
+    "ж": "z", "з": "z", "и": "i", "ј": "j", "к": "k", "л": "l", "љ": "lj",
+    "м": "m", "н": "n", "њ": "nj", "о": "o", "п": "p", "р": "r", "с": "s",
+    "т": "t", "ћ": "c", "у": "u", "ф": "f", "х": "h", "ц": "c", "ч": "c",
+    "џ": "dz", "ш": "s", "đ": "dj", "ł": "l", "ø": "o",
+})
+
+
+def fold(text: str) -> str:
+    """Unicode normalizacija za poređenje: mala slova, latinica, bez dijakritika"""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKD", text.casefold().translate(_FOLD_TABLE))
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def fold_pattern(pattern: str) -> str:
+    """fold() samo za ne-ASCII znakove - regex sintaksa (\\W, \\S...) ostaje ista"""
+    return "".join(char if char.isascii() else fold(char) for char in pattern)
+
+
+def word_text(folded: str) -> str:
+    """Reči razdvojene jednim razmakom, sa razmakom na početku i kraju"""
+    return " " + " ".join(_WORD_RE.findall(folded)) + " "
+
+
+def fuzzy_distance(trigger: str) -> int:
+    """Dozvoljeni broj grešaka (Levenshtein) za fuzzy trigger date dužine"""
+    if len(trigger) < 4:
+        return 0
+    return 1 if len(trigger) < 8 else 2
+
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+# Posesivna ponavljanja i atomske grupe (3.11+) ne backtrack-uju
+_POSSESSIVE_REPEAT = getattr(sre_parse, "POSSESSIVE_REPEAT", None)
+_ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+_NO_BACKTRACK = {_POSSESSIVE_REPEAT, _ATOMIC_GROUP} - {None}
+
+# Klase \d \s \w i negacije; dve klase se preklapaju ako obe pojedu neki od probnih znakova
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: re.compile(r"\d"),
+    sre_parse.CATEGORY_NOT_DIGIT: re.compile(r"\D"),
+    sre_parse.CATEGORY_SPACE: re.compile(r"\s"),
+    sre_parse.CATEGORY_NOT_SPACE: re.compile(r"\S"),
+    sre_parse.CATEGORY_WORD: re.compile(r"\w"),
+    sre_parse.CATEGORY_NOT_WORD: re.compile(r"\W"),
+}
+_CATEGORY_PROBES = "a0_ \n-.é٣"
+
+
+def _chars(items) -> Optional[Set]:
+    """
+    Znakovi koje deo izraza može da pojede (mala i velika slova) i klase
+    (CATEGORY_*); None = bilo koji
+    """
+    chars: Set = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.update((chr(av).lower(), chr(av).upper()))
+        elif op is sre_parse.IN:
+            for in_op, in_av in av:
+                if in_op is sre_parse.LITERAL:
+                    chars.update((chr(in_av).lower(), chr(in_av).upper()))
+                elif in_op is sre_parse.RANGE and in_av[1] - in_av[0] <= 256:
+                    for code in range(in_av[0], in_av[1] + 1):
+                        chars.update((chr(code).lower(), chr(code).upper()))
+                elif in_op is sre_parse.CATEGORY and in_av in _CATEGORIES:
+                    chars.add(in_av)
+                else:
+                    return None
+        elif op in _REPEATS or op is _POSSESSIVE_REPEAT or op is sre_parse.SUBPATTERN:
+            sub = _chars(av[-1])
+            if sub is None:
+                return None
+            chars |= sub
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                sub = _chars(branch)
+                if sub is None:
+                    return None
+                chars |= sub
+        elif op is _ATOMIC_GROUP:
+            sub = _chars(av)
+            if sub is None:
+                return None
+            chars |= sub
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue
+        else:
+            return None
+    return chars
+
+
+def _overlap(a: Optional[Set], b: Optional[Set]) -> bool:
+    if a is None or b is None or a & b:
+        return True
+    a_categories = [_CATEGORIES[item] for item in a if not isinstance(item, str)]
+    b_categories = [_CATEGORIES[item] for item in b if not isinstance(item, str)]
+    for categories, chars in ((a_categories, b), (b_categories, a)):
+        for category in categories:
+            if any(category.match(char) for char in chars if isinstance(char, str)):
+                return True
+    return any(
+        first.match(probe) and second.match(probe)
+        for first in a_categories for second in b_categories for probe in _CATEGORY_PROBES
+    )
+
+
+# Dubina ponavljanja oko dela izraza
+NOT_REPEATED, BOUNDED_REPEAT, UNBOUNDED_REPEAT = 0, 1, 2
+
+
+def _unbounded(high) -> bool:
+    return high is sre_parse.MAXREPEAT or high > REGEX_UNBOUNDED_REPEAT
+
+
+def _backtracking_risk(items, in_repeat: int = NOT_REPEATED) -> Optional[str]:
+    """
+    Konstrukcije sa eksponencijalnim (ili kubnim) backtracking-om:
+    neograničeno ponavljanje unutar bilo kog ponavljanja (`(a+)+`,
+    `(.*a){8}`), promenljivo ponavljanje unutar neograničenog (`(ab?)+`),
+    alternacija sa preklapanjem ili praznom alternativom pod ponavljanjem
+    (`(a|ab)*`, `(x|xx)+`) i 3+ neograničena ponavljanja sa istim znakovima
+    u nizu (`.*a.*b.*`). Znak koji prethodna ponavljanja ne mogu da pojedu
+    prekida niz (`\\w+ \\w+ \\w+` je u redu).
+    Provera je konzervativna - odbija i neke bezopasne izraze.
+    """
+    unbounded: List[Optional[Set]] = []
+    overlapping = 0
+    for op, av in items:
+        if op in _NO_BACKTRACK:
+            continue
+        if op in _REPEATS:
+            low, high, sub = av
+            repeated = _unbounded(high)
+            if in_repeat and (repeated or (low != high and in_repeat == UNBOUNDED_REPEAT)):
+                return "nested quantifiers"
+            inner = UNBOUNDED_REPEAT if repeated else BOUNDED_REPEAT if high > 1 else NOT_REPEATED
+            error = _backtracking_risk(sub, max(in_repeat, inner))
+            if error:
+                return error
+            if repeated:
+                chars = _chars(sub)
+                if any(_overlap(chars, previous) for previous in unbounded):
+                    overlapping += 1
+                    if overlapping >= 2:
+                        return "too many overlapping quantifiers"
+                unbounded.append(chars)
+            continue
+        if unbounded and op in (sre_parse.LITERAL, sre_parse.IN):
+            chars = _chars([(op, av)])
+            if not any(_overlap(chars, previous) for previous in unbounded):
+                unbounded.clear()
+                overlapping = 0
+        if op is sre_parse.SUBPATTERN:
+            error = _backtracking_risk(av[-1], in_repeat)
+            if error:
+                return error
+        elif op is sre_parse.BRANCH:
+            branches = av[1]
+            if in_repeat == UNBOUNDED_REPEAT:
+                if not all(branches):
+                    # (x|xx)+ se parsira kao x(?:|x)+ - prazna alternativa je opcioni deo
+                    return "optional alternatives inside a quantifier"
+                sets = [_chars(branch) for branch in branches]
+                for index, chars in enumerate(sets):
+                    if any(_overlap(chars, other) for other in sets[index + 1:]):
+                        return "overlapping alternatives inside a quantifier"
+            for branch in branches:
+                error = _backtracking_risk(branch, in_repeat)
+                if error:
+                    return error
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            error = _backtracking_risk(av[1], in_repeat)
+            if error:
+                return error
+        elif op is sre_parse.GROUPREF_EXISTS:
+            for branch in av[1:]:
+                if branch is not None:
+                    error = _backtracking_risk(branch, in_repeat)
+                    if error:
+                        return error
+    return None
+
+
+def compile_regex(pattern: str):
+    """Regex trigger - sa `regex` paketom ako je instaliran (search sa timeout-om)"""
+    if regex_engine is not None:
+        return regex_engine.compile(pattern, regex_engine.IGNORECASE)
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def validate_regex(pattern: str) -> Optional[str]:
+    """
+    Greška za regex koji se ne kompajlira ili može da backtrack-uje
+    eksponencijalno - regex-i tenanata rade na event loop-u pa jedan spor
+    izraz blokira webhook-e svih. Statička provera ne hvata sve, zato se
+    izraz u matcher-u izvršava i sa KEYWORD_REGEX_TIMEOUT.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+        re.compile(pattern)
+        compile_regex(pattern)
+    except re.error as e:
+        return f"invalid regex: {e}"
+    except Exception as e:  # regex.error
+        return f"invalid regex: {e}"
+    error = _backtracking_risk(parsed)
+    if error:
+        return f"regex rejected, {error} can make matching extremely slow"
+    return None
+
+
+def validate_trigger(trigger: str, match_type: str) -> Optional[str]:
+    """Poruka o grešci ili None ako je trigger ispravan za dati tip"""
+    if match_type not in MATCH_TYPES:
+        return f"match_type must be one of {MATCH_TYPES}"
+    if match_type == REGEX:
+        return validate_regex(fold_pattern(trigger))
+    elif match_type in (WORD, FUZZY) and not _WORD_RE.search(fold(trigger)):
+        return "trigger must contain at least one word"
+    return None
+
+
+class MatchedKeyword(NamedTuple):
+    """Lagana kopija Keyword reda koju matcher čuva"""
+    id: int
+    trigger: str
+    response: str
+    match_type: str = SUBSTRING
+    priority: int = 0
+
+
+class _PatternSet:
+    """
+    Skup fiksnih stringova sa rangom (manji = bolji) - Aho-Corasick automat,
+    ili obična petlja po rangu za male skupove.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]):
+        self._patterns = sorted(patterns, key=lambda item: item[1])
+
+        # Automat: goto tabela, fail linkovi, izlazi po čvoru
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._best: List[Optional[int]] = [None]
+
+        # Prazan pattern je uvek match ("" in poruka == True)
+        self._always: Optional[int] = None
+
+        if len(self._patterns) >= LINEAR_SCAN_THRESHOLD:
+            for pattern, rank in self._patterns:
+                self._add_pattern(pattern, rank)
+            self._build_fail_links()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def _add_pattern(self, pattern: str, rank: int) -> None:
+        if not pattern:
+            if self._always is None or rank < self._always:
+                self._always = rank
+            return
+
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._best.append(None)
+                self._goto[node][char] = next_node
+            node = next_node
+
+        self._out[node].append(rank)
+        if self._best[node] is None or rank < self._best[node]:
+            self._best[node] = rank
+
+    def _build_fail_links(self) -> None:
+        """BFS kroz trie - fail link i najbolji rang preko sufiksa"""
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                if fail == child:
+                    fail = 0
+                self._fail[child] = fail
+
+                inherited = self._best[fail]
+                if inherited is not None and (
+                    self._best[child] is None or inherited < self._best[child]
+                ):
+                    self._best[child] = inherited
+
+    def _step(self, node: int, char: str) -> int:
+        goto = self._goto
+        fail = self._fail
+        while node and char not in goto[node]:
+            node = fail[node]
+        return goto[node].get(char, 0)
+
+    def best(self, text: str) -> Optional[int]:
+        """Najbolji (najmanji) rang pattern-a koji se pojavljuje u tekstu"""
+        if len(self._patterns) < LINEAR_SCAN_THRESHOLD:
+            for pattern, rank in self._patterns:
+                if pattern in text:
+                    return rank
+            return None
+
+        best = self._always
+        node = 0
+        node_best = self._best
+        for char in text:
+            node = self._step(node, char)
+            candidate = node_best[node]
+            if candidate is not None and (best is None or candidate < best):
+                best = candidate
+        return best
+
+    def all(self, text: str) -> Set[int]:
+        """Rangovi svih pattern-a koji se pojavljuju u tekstu"""
+        if len(self._patterns) < LINEAR_SCAN_THRESHOLD:
+            return {rank for pattern, rank in self._patterns if pattern in text}
+
+        found = set() if self._always is None else {self._always}
+        node = 0
+        for char in text:
+            node = self._step(node, char)
+            match_node = node
+            while match_node:
+                found.update(self._out[match_node])
+                match_node = self._fail[match_node]
+        return found
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """Svi stringovi dobijeni brisanjem najviše `distance` znakova"""
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def _levenshtein(a: str, b: str, limit: int) -> int:
+    """Levenshtein rastojanje; bilo šta veće od `limit` se vraća kao limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class KeywordMatcher:
+    """
+    Kompajlirani matcher nad keyword-ima jednog chatbota.
+
+    Trigger i poruka se porede posle fold()-a (mala slova, ćirilica u
+    latinicu, bez dijakritika). Tipovi (`match_type`):
+
+        substring  trigger bilo gde u poruci (Aho-Corasick)
+        word       trigger kao cela reč / niz reči (Aho-Corasick nad rečima)
+        regex      re.search nad fold()-ovanom porukom, bez razlike u slovima
+        fuzzy      reč ili niz reči sa do 1-2 slovne greške (indeks brisanja,
+                   cena ne zavisi od broja trigger-a)
+
+    Kad se poklopi više keyword-a bira se onaj sa većim `priority`, pa
+    tačan match pre fuzzy, pa duži trigger, pa manji ID. Cena po poruci je
+    linearna u dužini poruke za substring/word/fuzzy; regex-i se proveravaju
+    po redu i samo dok mogu da pobede već nađeni match.
+    """
+
+    def __init__(self, keywords: Iterable):
+        rules = []
+        for order, keyword in enumerate(keywords):
+            match_type = getattr(keyword, "match_type", None) or SUBSTRING
+            priority = getattr(keyword, "priority", None) or 0
+            if match_type not in MATCH_TYPES:
+                logger.warning("Unknown match_type %r for keyword %s", match_type, keyword.id)
+                continue
+            rules.append((
+                (-priority, -len(keyword.trigger), order),
+                MatchedKeyword(keyword.id, keyword.trigger, keyword.response, match_type, priority),
+            ))
+
+        # Rang = pozicija po (priority, dužina, redosled); manji rang pobeđuje
+        rules.sort(key=lambda rule: rule[0])
+        self.keywords: List[MatchedKeyword] = [keyword for _, keyword in rules]
+
+        substrings = []
+        words = []
+        self._regexes: List[Tuple[int, object]] = []
+        self._fuzzy: Dict[str, List[Tuple[int, str, int]]] = {}
+        self._fuzzy_words: Set[int] = set()
+        self._fuzzy_distance = 0
+        # Najbolji ključ koji bilo koji fuzzy keyword može da dobije
+        self._fuzzy_bound: Optional[Tuple[int, int, int]] = None
+
+        for rank, keyword in enumerate(self.keywords):
+            folded = fold(keyword.trigger)
+            if keyword.match_type == SUBSTRING:
+                substrings.append((folded, rank))
+            elif keyword.match_type == WORD:
+                words.append((word_text(folded), rank))
+            elif keyword.match_type == REGEX:
+                # Redovi sačuvani pre provere backtracking-a se preskaču
+                error = validate_regex(fold_pattern(keyword.trigger))
+                if error:
+                    logger.warning("Regex for keyword %s ignored: %s", keyword.id, error)
+                    continue
+                self._regexes.append((rank, compile_regex(fold_pattern(keyword.trigger))))
+            else:
+                self._add_fuzzy(rank, " ".join(_WORD_RE.findall(folded)))
+
+        self._substrings = _PatternSet(substrings)
+        self._words = _PatternSet(words)
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def _add_fuzzy(self, rank: int, trigger: str) -> None:
+        word_count = trigger.count(" ") + 1
+        if not trigger or word_count > FUZZY_MAX_WORDS:
+            logger.warning("Fuzzy trigger %r ignored (1-%d words)", trigger, FUZZY_MAX_WORDS)
+            return
+        distance = fuzzy_distance(trigger)
+        if self._fuzzy_bound is None:
+            # Rangovi stižu rastuće, prvi fuzzy keyword ima najbolji ključ
+            self._fuzzy_bound = self._key(rank)
+        self._fuzzy_words.add(word_count)
+        self._fuzzy_distance = max(self._fuzzy_distance, distance)
+        for deleted in _deletes(trigger, distance):
+            self._fuzzy.setdefault(deleted, []).append((rank, trigger, distance))
+
+    def _key(self, rank: int, distance: int = 0) -> Tuple[int, int, int]:
+        return (-self.keywords[rank].priority, distance, rank)
+
+    def _search(self, rank: int, regex, text: str) -> bool:
+        if regex_engine is None:
+            return regex.search(text) is not None
+        try:
+            return regex.search(text, timeout=KEYWORD_REGEX_TIMEOUT) is not None
+        except TimeoutError:
+            logger.warning("Regex for keyword %s timed out", self.keywords[rank].id)
+            return False
+
+    def _fuzzy_matches(self, folded: str) -> Dict[int, int]:
+        """rang -> najmanje rastojanje za fuzzy keyword-e nađene u poruci"""
+        found: Dict[int, int] = {}
+        tokens = _WORD_RE.findall(folded)
+        seen: Set[str] = set()
+        for word_count in self._fuzzy_words:
+            for start in range(len(tokens) - word_count + 1):
+                gram = " ".join(tokens[start:start + word_count])
+                if gram in seen:
+                    continue
+                seen.add(gram)
+                # Trigger sa 2 dozvoljene greške ima bar 8 znakova, sa 1 bar 4
+                limit = min(self._fuzzy_distance, 2 if len(gram) >= 6 else 1 if len(gram) >= 3 else 0)
+                for deleted in _deletes(gram, limit):
+                    for rank, trigger, distance in self._fuzzy.get(deleted, ()):
+                        if found.get(rank, distance + 1) == 0:
+                            continue
+                        actual = _levenshtein(gram, trigger, distance)
+                        if actual <= distance and actual < found.get(rank, distance + 1):
+                            found[rank] = actual
+        return found
+
+    def _candidates(self, message_text: str, first_only: bool) -> List[Tuple[Tuple[int, int, int], int]]:
+        folded = fold(message_text)
+        candidates = []
+
+        for patterns, text in ((self._substrings, folded), (self._words, None)):
+            if not patterns:
+                continue
+            text = text if text is not None else word_text(folded)
+            ranks = patterns.all(text) if not first_only else (patterns.best(text),)
+            candidates.extend((self._key(rank), rank) for rank in ranks if rank is not None)
+
+        if self._regexes:
+            best = min(candidates)[0] if candidates else None
+            limited = folded[:REGEX_MAX_INPUT]
+            for rank, regex in self._regexes:
+                key = self._key(rank)
+                if first_only and best is not None and best < key:
+                    break
+                if self._search(rank, regex, limited):
+                    candidates.append((key, rank))
+                    if first_only:
+                        break
+
+        if self._fuzzy and not (first_only and candidates and min(candidates)[0] < self._fuzzy_bound):
+            for rank, distance in self._fuzzy_matches(folded).items():
+                candidates.append((self._key(rank, distance), rank))
+
+        return candidates
+
+    def find_all(self, message_text: str) -> List[MatchedKeyword]:
+        """Svi keyword-ovi koji se poklapaju sa porukom, od najboljeg"""
+        return [self.keywords[rank] for _, rank in sorted(self._candidates(message_text, first_only=False))]
+
+    def match(self, message_text: str) -> Optional[MatchedKeyword]:
+        """Keyword koji najbolje odgovara poruci (vidi docstring klase)"""
+        candidates = self._candidates(message_text, first_only=True)
+        if not candidates:
+            return None
+        return self.keywords[min(candidates)[1]]
@@ -0,0 +1,180 @@
+"""
+Live feed poruka za dashboard (Server-Sent Events) umesto poll-ovanja.
+
+process_incoming_batch posle upisa loga objavljuje poruke vlasniku chatbota;
+svaki otvoren `GET /api/live` je jedan pretplatnik sa ograničenim redom
+(LIVE_FEED_QUEUE_SIZE SSE frame-ova). Kad klijent ne stiže da čita, najstariji
+frame-ovi se izbacuju, a klijent dobija `event: dropped` sa brojem propuštenih
+poruka pa može da dopuni istoriju preko /messages. Frame se serijalizuje
+jednom po poruci i deli između svih pretplatnika.
+
+Pretplatnici su u memoriji procesa. Sa više worker-a i INVALIDATION_BUS=redis
+poruke idu i preko bus-a (LIVE_FEED_RELAY) pa ih vide svi worker-i; sa db
+backend-om relay je isključen (red u tabeli po poruci) i tab vidi samo poruke
+koje je obradio njegov worker.
+"""
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Set
+import asyncio
+import os
+
+import orjson
+
+from invalidation_bus import INVALIDATION_BUS, invalidation_bus
+
+LIVE_FEED_QUEUE_SIZE = int(os.getenv("LIVE_FEED_QUEUE_SIZE", "100"))
+LIVE_FEED_MAX_SUBSCRIBERS = int(os.getenv("LIVE_FEED_MAX_SUBSCRIBERS", "10000"))
+LIVE_FEED_KEEPALIVE = float(os.getenv("LIVE_FEED_KEEPALIVE", "15"))
+LIVE_FEED_RELAY = os.getenv("LIVE_FEED_RELAY", "1" if INVALIDATION_BUS == "redis" else "0") == "1"
+
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+class LiveFeedFull(Exception):
+    """Dostignut LIVE_FEED_MAX_SUBSCRIBERS"""
+
+
+class Subscriber:
+    __slots__ = ("owner_id", "chatbot_id", "queue", "dropped", "_ready")
+
+    def __init__(self, owner_id: int, chatbot_id: Optional[int], queue_size: int):
+        self.owner_id = owner_id
+        self.chatbot_id = chatbot_id
+        self.queue: deque = deque(maxlen=queue_size)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def push(self, frame: bytes) -> None:
+        if len(self.queue) == self.queue.maxlen:
+            # Drop-oldest: spor klijent ne može da poveća memoriju
+            self.dropped += 1
+        self.queue.append(frame)
+        self._ready.set()
+
+
+class LiveFeed:
+    """Fan-out po vlasniku; koristi se samo iz event loop-a, bez lock-a"""
+
+    def __init__(
+        self,
+        queue_size: int = LIVE_FEED_QUEUE_SIZE,
+        max_subscribers: int = LIVE_FEED_MAX_SUBSCRIBERS,
+        keepalive: float = LIVE_FEED_KEEPALIVE,
+        relay: bool = LIVE_FEED_RELAY,
+    ):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.keepalive = keepalive
+        self.relay = relay
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self._count = 0
+        self._closed = False
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def subscribe(self, owner_id: int, chatbot_id: Optional[int] = None) -> Subscriber:
+        if self._count >= self.max_subscribers:
+            self.rejected += 1
+            raise LiveFeedFull()
+
+        subscriber = Subscriber(owner_id, chatbot_id, self.queue_size)
+        self._subscribers.setdefault(owner_id, set()).add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.owner_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[subscriber.owner_id]
+        self._count -= 1
+        self.dropped += subscriber.dropped
+
+    def listening(self, owner_id: int) -> bool:
+        """Da li vredi praviti payload - bez relay-a i pretplatnika publish je no-op"""
+        return self.relay or owner_id in self._subscribers
+
+    def publish(self, owner_id: int, chatbot_id: int, messages: List[dict]) -> None:
+        """`messages` moraju biti JSON tipovi (timestamp kao ISO string) zbog relay-a"""
+        if not messages:
+            return
+        event = {"owner_id": owner_id, "chatbot_id": chatbot_id, "messages": messages}
+        if self.relay:
+            # Bus odmah poziva i lokalni handler (_dispatch)
+            invalidation_bus.publish("live_feed", event)
+        else:
+            self._dispatch(event)
+
+    def _dispatch(self, event: dict) -> None:
+        subscribers = self._subscribers.get(event["owner_id"])
+        if not subscribers:
+            return
+
+        chatbot_id = event["chatbot_id"]
+        frames = [b"event: message\ndata: " + orjson.dumps(message) + b"\n\n" for message in event["messages"]]
+        self.published += len(frames)
+        for subscriber in subscribers:
+            if subscriber.chatbot_id is not None and subscriber.chatbot_id != chatbot_id:
+                continue
+            for frame in frames:
+                subscriber.push(frame)
+            self.delivered += len(frames)
+
+    async def stream(self, subscriber: Subscriber) -> AsyncIterator[bytes]:
+        """SSE telo odgovora; pretplata se uklanja kad se klijent odvoji ili server gasi"""
+        reported = 0
+        try:
+            yield b"retry: 3000\n\n"
+            while not self._closed:
+                if not subscriber.queue:
+                    subscriber._ready.clear()
+                    try:
+                        await asyncio.wait_for(subscriber._ready.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        yield KEEPALIVE_FRAME
+                        continue
+                    if self._closed:
+                        break
+
+                if subscriber.dropped > reported:
+                    yield b"event: dropped\ndata: " + orjson.dumps({"count": subscriber.dropped - reported}) + b"\n\n"
+                    reported = subscriber.dropped
+
+                frames = list(subscriber.queue)
+                subscriber.queue.clear()
+                yield b"".join(frames)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def open(self) -> None:
+        self._closed = False
+
+    def close(self) -> None:
+        """Gašenje - otvoreni stream-ovi se završavaju da ne bi blokirali shutdown"""
+        self._closed = True
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                subscriber._ready.set()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "owners": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped + sum(
+                subscriber.dropped for subscribers in self._subscribers.values() for subscriber in subscribers
+            ),
+            "rejected": self.rejected,
+            "relay": self.relay,
+        }
+
+
+live_feed = LiveFeed()
+
+invalidation_bus.subscribe("live_feed", live_feed._dispatch)
@@ -0,0 +1,104 @@
+"""
+Limit pokušaja logina po korisničkom imenu i po IP adresi.
+
+Svaki pokušaj troši token iz oba bucket-a (token bucket: LOGIN_MAX_ATTEMPTS_*
+pokušaja, dopunjava se ravnomerno kroz LOGIN_ATTEMPT_WINDOW sekundi); kad
+je neki prazan, login dobija 429 pre upita u bazu i skupe verifikacije
+lozinke. Uspešan login vraća pun bucket korisničkog imena.
+
+Stanje je po procesu - sa više worker-a stvarni limit je do N puta veći.
+Koristi se samo iz event loop-a, bez lock-a.
+"""
+from collections import OrderedDict
+from typing import Optional
+import os
+import time
+
+LOGIN_MAX_ATTEMPTS_PER_USER = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_USER", "10"))  # 0 = bez limita
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "50"))  # 0 = bez limita
+LOGIN_ATTEMPT_WINDOW = float(os.getenv("LOGIN_ATTEMPT_WINDOW", "300"))
+LOGIN_LIMITER_SIZE = int(os.getenv("LOGIN_LIMITER_SIZE", "100000"))
+
+
+class _Bucket:
+    __slots__ = ("tokens", "refilled_at")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.refilled_at = now
+
+
+class LoginLimiter:
+    def __init__(
+        self,
+        max_per_user: int = LOGIN_MAX_ATTEMPTS_PER_USER,
+        max_per_ip: int = LOGIN_MAX_ATTEMPTS_PER_IP,
+        window: float = LOGIN_ATTEMPT_WINDOW,
+        max_size: int = LOGIN_LIMITER_SIZE,
+    ):
+        self.max_per_user = max_per_user
+        self.max_per_ip = max_per_ip
+        self.window = window
+        self.max_size = max_size
+        self._buckets: "OrderedDict[tuple, _Bucket]" = OrderedDict()
+
+        self.allowed = 0
+        self.blocked = 0
+        self.evictions = 0
+
+    def check(self, username: str, ip: str, now: Optional[float] = None) -> Optional[float]:
+        """
+        None ako je pokušaj dozvoljen (i troši token), inače broj sekundi
+        do sledećeg dozvoljenog pokušaja.
+        """
+        now = time.monotonic() if now is None else now
+        buckets = []
+        wait = 0.0
+        for key, limit in ((("user", username), self.max_per_user), (("ip", ip), self.max_per_ip)):
+            if limit <= 0:
+                continue
+            bucket = self._bucket(key, limit, now)
+            if bucket.tokens < 1:
+                wait = max(wait, (1 - bucket.tokens) * self.window / limit)
+            buckets.append(bucket)
+
+        if wait:
+            self.blocked += 1
+            return wait
+
+        for bucket in buckets:
+            bucket.tokens -= 1
+        self.allowed += 1
+        return None
+
+    def reset(self, username: str) -> None:
+        """Posle uspešnog logina"""
+        self._buckets.pop(("user", username), None)
+
+    def _bucket(self, key: tuple, limit: int, now: float) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(limit, now)
+            if len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            return bucket
+
+        self._buckets.move_to_end(key)
+        bucket.tokens = min(limit, bucket.tokens + (now - bucket.refilled_at) * limit / self.window)
+        bucket.refilled_at = now
+        return bucket
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._buckets),
+            "allowed": self.allowed,
+            "blocked": self.blocked,
+            "evictions": self.evictions,
+        }
+
+
+login_limiter = LoginLimiter()
@@ -1,80 +1,223 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import base64
+import asyncio
+import logging
+import math
 import os
+import time
 
-from database import get_db, engine
-from models import Base, User, Chatbot, Keyword, Message
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+from database import get_async_db, get_read_db, write_session, async_engine, async_read_engine
+from db_writer import db_writer
+from models import User, Chatbot, Keyword, Message
 from schemas import (
     UserCreate, UserLogin, UserResponse, Token,
     ChatbotCreate, ChatbotUpdate, ChatbotResponse,
-    KeywordCreate, KeywordUpdate, KeywordResponse,
-    MessageResponse
-)
-from auth import (
-    get_password_hash, verify_password, create_access_token, get_current_user
-)
-from instagram_service import process_incoming_message, verify_webhook
-
-# Kreiranje tabela
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Instagram Chatbot Platform API")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:5174"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    KeywordCreate, KeywordUpdate, KeywordResponse, KeywordImportResult,
+    MessageResponse, MessagePage, ChatbotStats
 )
+from auth import create_access_token, get_current_user
+from auth_cache import token_cache, user_cache
+from password_hasher import PasswordHasherBusy, password_hasher
+from login_limiter import login_limiter
+from instagram_service import process_incoming_batch, verify_webhook
+from chatbot_cache import chatbot_cache
+from response_cache import CHATBOT_LIST, KEYWORD_LIST, CachedResponse, etag_matches, response_cache
+import keyword_io
+from keyword_matcher import validate_trigger
+from templates import validate_template
+from profiles import profile_cache
+from conversation_state import conversation_store
+from invalidation_bus import invalidation_bus
+from outbound_sender import outbound_sender
+from graph_rate_limiter import graph_rate_limiter
+from outbox import outbox_workers
+from message_log import message_log
+from live_feed import LiveFeedFull, live_feed
+from rollups import rollup_aggregator, read_stats
+from retention import message_archiver
+from migrate import DB_AUTO_MIGRATE, upgrade_database
+from logging_config import setup_logging, stop_logging
+from metrics import registry, webhook_latency
+
+logger = logging.getLogger(__name__)
+
+# Prosečno svaki N-ti webhook se loguje na INFO nivou
+LOG_SAMPLE_WEBHOOK = int(os.getenv("LOG_SAMPLE_WEBHOOK", "100"))
+
+
+# Serijalizacija listi direktno u JSON bajtove (keširaju se u response_cache-u)
+_chatbot_list = TypeAdapter(List[ChatbotResponse])
+_keyword_list = TypeAdapter(List[KeywordResponse])
+
+
+def _cached_json(request: Request, cached: CachedResponse) -> Response:
+    """Keširan JSON ili 304 ako klijent već ima istu verziju"""
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def _check_trigger(trigger: str, match_type: str) -> None:
+    """422 za regex koji se ne kompajlira ili word/fuzzy trigger bez reči"""
+    error = validate_trigger(trigger, match_type)
+    if error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=error)
+
+
+def _check_template(response: Optional[str]) -> None:
+    """422 za šablon odgovora koji se ne kompajlira (vidi templates.py)"""
+    error = validate_template(response) if response else None
+    if error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=error)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Pokretanje i gašenje pozadinskih servisa"""
+    setup_logging()
+    if DB_AUTO_MIGRATE:
+        await asyncio.to_thread(upgrade_database)
+    await invalidation_bus.start()
+    await password_hasher.start()
+    await outbound_sender.start()
+    await outbox_workers.start()
+    await message_log.start()
+    await rollup_aggregator.start()
+    await message_archiver.start()
+    live_feed.open()
+    yield
+    # Otvoreni SSE stream-ovi bi inače držali gašenje do isteka timeout-a
+    live_feed.close()
+    await message_archiver.stop()
+    await rollup_aggregator.stop()
+    await message_log.stop()
+    await outbox_workers.stop()
+    await outbound_sender.stop()
+    await password_hasher.stop()
+    await invalidation_bus.stop()
+    db_writer.shutdown()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+    stop_logging()
+
+
+router = APIRouter()
 
 WEBHOOK_VERIFY_TOKEN = os.getenv("WEBHOOK_VERIFY_TOKEN", "your-verify-token-123")
 
 
 # ==================== AUTH ROUTES ====================
 
-@app.post("/api/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent logins, try again",
+        headers={"Retry-After": "1"}
+    )
+
+
+async def _rehash_password(user_id: int, old_hash: str, new_hash: str) -> None:
+    """Zamena hash-a posle promene šeme/cene - samo ako ga niko nije promenio u međuvremenu"""
+    try:
+        async with write_session() as session:
+            await session.execute(update(User).where(
+                User.id == user_id,
+                User.hashed_password == old_hash
+            ).values(hashed_password=new_hash))
+            await session.commit()
+    except Exception:
+        logger.exception("Password rehash failed", extra={"user_id": user_id})
+
+
+@router.post("/api/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_read_db)):
     """Registracija novog admin korisnika"""
     # Provera da li user već postoji
-    if db.query(User).filter(User.username == user_data.username).first():
+    if await db.scalar(select(User).filter(User.username == user_data.username)):
         raise HTTPException(status_code=400, detail="Username already exists")
     
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await db.scalar(select(User).filter(User.email == user_data.email)):
         raise HTTPException(status_code=400, detail="Email already exists")
     
-    # Kreiranje novog usera
+    # Kreiranje novog usera (hash je CPU posao - u pool procesa, vidi password_hasher.py);
+    # hash se računa pre transakcije da ne bi držao writer-a
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    
     new_user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=hashed_password
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        async with write_session() as write_db:
+            write_db.add(new_user)
+            await write_db.commit()
+            await write_db.refresh(new_user)
+    except IntegrityError:
+        # Isti username/email registrovan dok se računao hash
+        raise HTTPException(status_code=400, detail="Username or email already exists")
     
     return new_user
 
 
-@app.post("/api/auth/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
+@router.post("/api/auth/login", response_model=Token)
+async def login(user_data: UserLogin, request: Request, db: AsyncSession = Depends(get_read_db)):
     """Login i dobijanje JWT tokena"""
-    user = db.query(User).filter(User.username == user_data.username).first()
+    # Limit pokušaja pre upita i verifikacije (vidi login_limiter.py)
+    retry_after = login_limiter.check(user_data.username, request.client.host if request.client else "unknown")
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
     
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    user = await db.scalar(select(User).filter(User.username == user_data.username))
+    
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await password_hasher.verify(user_data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            raise _hasher_busy()
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
         )
     
+    login_limiter.reset(user_data.username)
+    if new_hash:
+        await _rehash_password(user.id, user.hashed_password, new_hash)
+    
     # FIX: Konvertuj user.id u STRING!
     access_token = create_access_token(data={"sub": str(user.id)})
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.get("/api/auth/me", response_model=UserResponse)
+@router.get("/api/auth/me", response_model=UserResponse)
 def get_me(current_user: User = Depends(get_current_user)):
     return {
         "id": current_user.id,
@@ -86,68 +229,83 @@ def get_me(current_user: User = Depends(get_current_user)):
 
 # ==================== CHATBOT ROUTES ====================
 
-@app.get("/api/chatbots", response_model=List[ChatbotResponse])
-def get_chatbots(
+@router.get("/api/chatbots", response_model=List[ChatbotResponse])
+async def get_chatbots(
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Dobijanje svih chatbotova"""
-    chatbots = db.query(Chatbot).filter(Chatbot.owner_id == current_user.id).all()
-    return [
+    """Dobijanje svih chatbotova (keširano do izmene, ETag/304 - vidi response_cache.py)"""
+    cached = response_cache.get(CHATBOT_LIST, current_user.id, current_user.id)
+    if cached is not None:
+        return _cached_json(request, cached)
+    
+    version = response_cache.version(CHATBOT_LIST, current_user.id)
+    chatbots = (await db.scalars(select(Chatbot).filter(Chatbot.owner_id == current_user.id))).all()
+    body = _chatbot_list.dump_json(_chatbot_list.validate_python([
         {
             "id": bot.id,
             "name": bot.name,
             "instagram_account_id": bot.instagram_account_id,
             "instagram_username": bot.instagram_username,
             "is_active": bot.is_active,
+            "message_retention_days": bot.message_retention_days,
+            "default_response": bot.default_response,
             "created_at": bot.created_at,
             "updated_at": bot.updated_at
         }
         for bot in chatbots
-    ]
+    ]))
+    return _cached_json(request, response_cache.put(CHATBOT_LIST, current_user.id, version, current_user.id, body))
 
 
-@app.post("/api/chatbots", response_model=ChatbotResponse, status_code=status.HTTP_201_CREATED)
-def create_chatbot(
+@router.post("/api/chatbots", response_model=ChatbotResponse, status_code=status.HTTP_201_CREATED)
+async def create_chatbot(
     chatbot_data: ChatbotCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Kreiranje novog chatbota"""
     # Provera da li već postoji bot za taj Instagram account
-    existing = db.query(Chatbot).filter(
+    existing = await db.scalar(select(Chatbot).filter(
         Chatbot.instagram_account_id == chatbot_data.instagram_account_id
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(status_code=400, detail="Chatbot for this Instagram account already exists")
     
+    _check_template(chatbot_data.default_response)
+    
     new_chatbot = Chatbot(
         name=chatbot_data.name,
         instagram_account_id=chatbot_data.instagram_account_id,
         instagram_username=chatbot_data.instagram_username,
         access_token=chatbot_data.access_token,
+        message_retention_days=chatbot_data.message_retention_days,
+        default_response=chatbot_data.default_response or None,
         owner_id=current_user.id
     )
     
     db.add(new_chatbot)
-    db.commit()
-    db.refresh(new_chatbot)
+    await db.commit()
+    await db.refresh(new_chatbot)
+    invalidation_bus.publish("chatbot", new_chatbot.instagram_account_id)
+    invalidation_bus.publish(CHATBOT_LIST, current_user.id)
     
     return new_chatbot
 
 
-@app.get("/api/chatbots/{chatbot_id}", response_model=ChatbotResponse)
-def get_chatbot(
+@router.get("/api/chatbots/{chatbot_id}", response_model=ChatbotResponse)
+async def get_chatbot(
     chatbot_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Dobijanje specifičnog chatbota"""
-    chatbot = db.query(Chatbot).filter(
+    chatbot = await db.scalar(select(Chatbot).filter(
         Chatbot.id == chatbot_id,
         Chatbot.owner_id == current_user.id
-    ).first()
+    ))
     
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
@@ -155,18 +313,18 @@ def get_chatbot(
     return chatbot
 
 
-@app.put("/api/chatbots/{chatbot_id}", response_model=ChatbotResponse)
-def update_chatbot(
+@router.put("/api/chatbots/{chatbot_id}", response_model=ChatbotResponse)
+async def update_chatbot(
     chatbot_id: int,
     chatbot_data: ChatbotUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ažuriranje chatbota"""
-    chatbot = db.query(Chatbot).filter(
+    chatbot = await db.scalar(select(Chatbot).filter(
         Chatbot.id == chatbot_id,
         Chatbot.owner_id == current_user.id
-    ).first()
+    ))
     
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
@@ -180,184 +338,505 @@ def update_chatbot(
         chatbot.access_token = chatbot_data.access_token
     if chatbot_data.is_active is not None:
         chatbot.is_active = chatbot_data.is_active
-    
-    db.commit()
-    db.refresh(chatbot)
+    if chatbot_data.message_retention_days is not None:
+        chatbot.message_retention_days = chatbot_data.message_retention_days
+    if chatbot_data.default_response is not None:
+        # Prazan string vraća podrazumevani tekst
+        _check_template(chatbot_data.default_response)
+        chatbot.default_response = chatbot_data.default_response or None
+    
+    await db.commit()
+    await db.refresh(chatbot)
+    invalidation_bus.publish("chatbot", chatbot.instagram_account_id)
+    invalidation_bus.publish(CHATBOT_LIST, current_user.id)
     
     return chatbot
 
 
-@app.delete("/api/chatbots/{chatbot_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_chatbot(
+@router.delete("/api/chatbots/{chatbot_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_chatbot(
     chatbot_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Brisanje chatbota"""
-    chatbot = db.query(Chatbot).filter(
+    chatbot = await db.scalar(select(Chatbot).filter(
         Chatbot.id == chatbot_id,
         Chatbot.owner_id == current_user.id
-    ).first()
+    ))
     
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
     
-    db.delete(chatbot)
-    db.commit()
+    # Samo oznaka - poruke i red briše retention.py u malim transakcijama;
+    # nalog se oslobađa odmah da bi mogao ponovo da se poveže
+    instagram_account_id = chatbot.instagram_account_id
+    chatbot.deleted_at = datetime.utcnow()
+    chatbot.owner_id = None
+    chatbot.is_active = False
+    chatbot.instagram_account_id = f"deleted-{chatbot.id}"
+    await db.commit()
+    invalidation_bus.publish("chatbot", instagram_account_id)
+    invalidation_bus.publish(CHATBOT_LIST, current_user.id)
+    invalidation_bus.publish(KEYWORD_LIST, chatbot_id)
+    message_archiver.wake()
     
     return None
 
 
 # ==================== KEYWORD ROUTES ====================
 
-@app.get("/api/chatbots/{chatbot_id}/keywords", response_model=List[KeywordResponse])
-def get_keywords(
+@router.get("/api/chatbots/{chatbot_id}/keywords", response_model=List[KeywordResponse])
+async def get_keywords(
     chatbot_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Dobijanje svih keyword-ova za chatbot"""
-    chatbot = db.query(Chatbot).filter(
+    """Dobijanje svih keyword-ova za chatbot (keširano do izmene, ETag/304)"""
+    cached = response_cache.get(KEYWORD_LIST, chatbot_id, current_user.id)
+    if cached is not None:
+        return _cached_json(request, cached)
+    
+    version = response_cache.version(KEYWORD_LIST, chatbot_id)
+    chatbot = await db.scalar(select(Chatbot).filter(
         Chatbot.id == chatbot_id,
         Chatbot.owner_id == current_user.id
-    ).first()
+    ))
     
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
     
-    keywords = db.query(Keyword).filter(Keyword.chatbot_id == chatbot_id).all()
-    return keywords
+    keywords = (await db.scalars(select(Keyword).filter(Keyword.chatbot_id == chatbot_id))).all()
+    body = _keyword_list.dump_json(_keyword_list.validate_python(keywords, from_attributes=True))
+    return _cached_json(request, response_cache.put(KEYWORD_LIST, chatbot_id, version, current_user.id, body))
+
 
+@router.get("/api/chatbots/{chatbot_id}/keywords/export")
+async def export_keywords(
+    chatbot_id: int,
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Export svih keyword-a chatbota kao CSV ili JSONL (stream)"""
+    chatbot = await db.scalar(select(Chatbot).filter(
+        Chatbot.id == chatbot_id,
+        Chatbot.owner_id == current_user.id
+    ))
+    
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    return StreamingResponse(
+        keyword_io.export_keywords(chatbot_id, format),
+        media_type=keyword_io.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="keywords-{chatbot_id}.{format}"'},
+    )
 
-@app.post("/api/keywords", response_model=KeywordResponse, status_code=status.HTTP_201_CREATED)
-def create_keyword(
+
+@router.post("/api/chatbots/{chatbot_id}/keywords/import", response_model=KeywordImportResult)
+async def import_keywords(
+    chatbot_id: int,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Bulk import keyword-a iz tela zahteva (CSV ili JSONL, vidi keyword_io.py).
+    Postojeći triggeri se ažuriraju, novi dodaju; sve ili ništa.
+    """
+    chatbot = await db.scalar(select(Chatbot).filter(
+        Chatbot.id == chatbot_id,
+        Chatbot.owner_id == current_user.id
+    ))
+    
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    # Upload se parsira pre otvaranja transakcije - spor klijent ne drži writer konekciju
+    try:
+        rows = await keyword_io.read_import(request.stream(), format)
+    except keyword_io.KeywordImportError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors)
+    
+    async with write_session() as write_db:
+        result = await keyword_io.apply_import(write_db, chatbot_id, rows)
+        await write_db.commit()
+    
+    if rows:
+        invalidation_bus.publish("chatbot", chatbot.instagram_account_id)
+        invalidation_bus.publish(KEYWORD_LIST, chatbot_id)
+    
+    logger.info(
+        "Keywords imported",
+        extra={"chatbot_id": chatbot_id, "keywords_created": result["created"], "keywords_updated": result["updated"]}
+    )
+    return result
+
+
+@router.post("/api/keywords", response_model=KeywordResponse, status_code=status.HTTP_201_CREATED)
+async def create_keyword(
     keyword_data: KeywordCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Kreiranje novog keyword-a"""
     # Provera da li chatbot pripada current useru
-    chatbot = db.query(Chatbot).filter(
+    chatbot = await db.scalar(select(Chatbot).filter(
         Chatbot.id == keyword_data.chatbot_id,
         Chatbot.owner_id == current_user.id
-    ).first()
+    ))
     
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
     
+    _check_trigger(keyword_data.trigger, keyword_data.match_type)
+    _check_template(keyword_data.response)
+    
     new_keyword = Keyword(
         trigger=keyword_data.trigger,
         response=keyword_data.response,
-        chatbot_id=keyword_data.chatbot_id
+        chatbot_id=keyword_data.chatbot_id,
+        match_type=keyword_data.match_type,
+        priority=keyword_data.priority
     )
     
     db.add(new_keyword)
-    db.commit()
-    db.refresh(new_keyword)
+    await db.commit()
+    await db.refresh(new_keyword)
+    invalidation_bus.publish("chatbot", chatbot.instagram_account_id)
+    invalidation_bus.publish(KEYWORD_LIST, chatbot.id)
     
     return new_keyword
 
 
-@app.put("/api/keywords/{keyword_id}", response_model=KeywordResponse)
-def update_keyword(
+@router.put("/api/keywords/{keyword_id}", response_model=KeywordResponse)
+async def update_keyword(
     keyword_id: int,
     keyword_data: KeywordUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ažuriranje keyword-a"""
-    keyword = db.query(Keyword).join(Chatbot).filter(
+    row = (await db.execute(select(Keyword, Chatbot.instagram_account_id).join(Chatbot).filter(
         Keyword.id == keyword_id,
         Chatbot.owner_id == current_user.id
-    ).first()
+    ))).first()
     
-    if not keyword:
+    if not row:
         raise HTTPException(status_code=404, detail="Keyword not found")
     
+    keyword, instagram_account_id = row
+    
     if keyword_data.trigger is not None:
         keyword.trigger = keyword_data.trigger
     if keyword_data.response is not None:
         keyword.response = keyword_data.response
     if keyword_data.is_active is not None:
         keyword.is_active = keyword_data.is_active
+    if keyword_data.match_type is not None:
+        keyword.match_type = keyword_data.match_type
+    if keyword_data.priority is not None:
+        keyword.priority = keyword_data.priority
+    
+    _check_trigger(keyword.trigger, keyword.match_type)
+    _check_template(keyword.response)
     
-    db.commit()
-    db.refresh(keyword)
+    await db.commit()
+    await db.refresh(keyword)
+    invalidation_bus.publish("chatbot", instagram_account_id)
+    invalidation_bus.publish(KEYWORD_LIST, keyword.chatbot_id)
     
     return keyword
 
 
-@app.delete("/api/keywords/{keyword_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_keyword(
+@router.delete("/api/keywords/{keyword_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_keyword(
     keyword_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Brisanje keyword-a"""
-    keyword = db.query(Keyword).join(Chatbot).filter(
+    row = (await db.execute(select(Keyword, Chatbot.instagram_account_id).join(Chatbot).filter(
         Keyword.id == keyword_id,
         Chatbot.owner_id == current_user.id
-    ).first()
+    ))).first()
     
-    if not keyword:
+    if not row:
         raise HTTPException(status_code=404, detail="Keyword not found")
     
-    db.delete(keyword)
-    db.commit()
+    keyword, instagram_account_id = row
+    
+    await db.delete(keyword)
+    await db.commit()
+    invalidation_bus.publish("chatbot", instagram_account_id)
+    invalidation_bus.publish(KEYWORD_LIST, keyword.chatbot_id)
     
     return None
 
 
+# ==================== MESSAGE HISTORY ====================
+
+def _encode_cursor(message: Message) -> str:
+    raw = f"{message.timestamp.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/api/chatbots/{chatbot_id}/messages", response_model=MessagePage)
+async def get_messages(
+    chatbot_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sender_id: Optional[str] = None,
+    matched_keyword: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Istorija poruka chatbota, od najnovijih.
+
+    Keyset paginacija po (timestamp, id): `next_cursor` iz odgovora se šalje
+    kao `cursor` za sledeću stranu, pa svaka strana koristi indeks umesto OFFSET-a.
+    """
+    chatbot = await db.scalar(select(Chatbot).filter(
+        Chatbot.id == chatbot_id,
+        Chatbot.owner_id == current_user.id
+    ))
+    
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    query = select(Message).filter(Message.chatbot_id == chatbot_id)
+    
+    if sender_id is not None:
+        query = query.filter(Message.sender_id == sender_id)
+    if matched_keyword is not None:
+        query = query.filter(Message.matched_keyword == matched_keyword)
+    if since is not None:
+        query = query.filter(Message.timestamp >= since)
+    if until is not None:
+        query = query.filter(Message.timestamp < until)
+    if cursor is not None:
+        query = query.filter(tuple_(Message.timestamp, Message.id) < _decode_cursor(cursor))
+    
+    # Jedan red viška govori da li postoji sledeća strana
+    messages = (await db.scalars(
+        query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1)
+    )).all()
+    
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = _encode_cursor(messages[-1])
+    
+    return {"items": messages, "next_cursor": next_cursor}
+
+
+@router.get("/api/live")
+async def live_messages(
+    chatbot_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Nove poruke svih chatbotova korisnika (ili jednog) kao Server-Sent Events.
+
+    Zamena za poll-ovanje /messages: dashboard drži jednu konekciju, a posle
+    `event: dropped` (spor klijent, vidi live_feed.py) dopunjava istoriju upitom.
+    """
+    if chatbot_id is not None:
+        chatbot = await db.scalar(select(Chatbot.id).filter(
+            Chatbot.id == chatbot_id,
+            Chatbot.owner_id == current_user.id
+        ))
+        if not chatbot:
+            raise HTTPException(status_code=404, detail="Chatbot not found")
+
+    # Stream može da traje satima - konekcija iz pool-a se vraća odmah
+    await db.close()
+
+    try:
+        subscriber = live_feed.subscribe(current_user.id, chatbot_id)
+    except LiveFeedFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live connections",
+            headers={"Retry-After": "5"}
+        )
+
+    return StreamingResponse(
+        live_feed.stream(subscriber),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx/Render proxy ne sme da baferuje stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ==================== STATS ====================
+
+@router.get("/api/chatbots/{chatbot_id}/stats", response_model=ChatbotStats)
+async def get_chatbot_stats(
+    chatbot_id: int,
+    days: int = Query(7, ge=1, le=365),
+    top: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Statistika chatbota za poslednjih `days` dana (iz rollup tabela, vidi rollups.py)"""
+    chatbot = await db.scalar(select(Chatbot).filter(
+        Chatbot.id == chatbot_id,
+        Chatbot.owner_id == current_user.id
+    ))
+    
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    since = datetime.utcnow() - timedelta(days=days)
+    return await read_stats(db, chatbot_id, since, top_keywords=top)
+
+
 # ==================== INSTAGRAM WEBHOOK ====================
 
-@app.post("/api/webhook")
-async def webhook_handler(request: Request, db: Session = Depends(get_db)):
+@router.post("/api/webhook")
+async def webhook_handler(request: Request, db: AsyncSession = Depends(get_read_db)):
     """Primanje Instagram poruka"""
+    start = time.perf_counter()
     try:
-        body = await request.json()
-        print(f"📨 WEBHOOK DATA: {body}")
+        body = json_loads(await request.body())
         
         if body.get("object") != "instagram":
-            print("❌ Not Instagram object, ignoring")
+            logger.debug("Not Instagram object, ignoring")
             return {"status": "ignored"}
         
+        # Grupisanje poruka po Instagram nalogu (recipient_id) cele isporuke
+        events_by_recipient = defaultdict(list)
         for entry in body.get("entry", []):
             for messaging_event in entry.get("messaging", []):
-                sender_id = messaging_event["sender"]["id"]
-                recipient_id = messaging_event["recipient"]["id"]
-                
-                print(f"📩 Message from {sender_id} to {recipient_id}")
-                
                 if "message" in messaging_event:
-                    message_text = messaging_event["message"].get("text", "")
-                    print(f"💬 Message text: {message_text}")
-                    
-                    chatbot = db.query(Chatbot).filter(
-                        Chatbot.instagram_account_id == recipient_id,
-                        Chatbot.is_active == True
-                    ).first()
-                    
-                    if chatbot:
-                        print(f"✅ Found chatbot: {chatbot.name}")
-                        process_incoming_message(sender_id, message_text, chatbot, db)
-                    else:
-                        print(f"❌ No chatbot found for recipient_id: {recipient_id}")
+                    events_by_recipient[messaging_event["recipient"]["id"]].append((
+                        messaging_event["sender"]["id"],
+                        messaging_event["message"].get("text", ""),
+                        messaging_event["message"].get("mid")
+                    ))
+        
+        if not events_by_recipient:
+            return {"status": "ok"}
+        
+        # Svi chatbotovi jednim lookup-om (keš, miss-evi jednim upitom)
+        chatbots = await chatbot_cache.get_many(events_by_recipient, db)
+        
+        batches = []
+        for recipient_id, events in events_by_recipient.items():
+            chatbot = chatbots.get(recipient_id)
+            if chatbot and chatbot.is_active:
+                batches.append(process_incoming_batch(chatbot, events))
+            else:
+                logger.info(
+                    "No active chatbot for recipient",
+                    extra={"recipient_id": recipient_id, "sample_every": LOG_SAMPLE_WEBHOOK}
+                )
+        
+        # Paralelno - upisi svih grupa ulaze u isti group commit
+        await asyncio.gather(*batches)
+        
+        logger.info(
+            "Webhook delivery processed",
+            extra={
+                "events": sum(len(events) for events in events_by_recipient.values()),
+                "chatbots": len(batches),
+                "sample_every": LOG_SAMPLE_WEBHOOK,
+            }
+        )
         
         return {"status": "ok"}
     
     except Exception as e:
-        print(f"❌ Webhook error: {e}")
+        logger.exception("Webhook error")
         return {"status": "error", "message": str(e)}
+    
+    finally:
+        webhook_latency.observe(time.perf_counter() - start)
+
+
+# ==================== CACHE ====================
+
+@router.get("/api/cache/stats")
+def cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit/miss/eviction brojači keša chatbotova"""
+    return {
+        **chatbot_cache.stats(),
+        "outbound": outbound_sender.stats(),
+        "graph_rate_limiter": graph_rate_limiter.stats(),
+        "outbox": outbox_workers.stats(),
+        "message_log": message_log.stats(),
+        "rollups": rollup_aggregator.stats(),
+        "retention": message_archiver.stats(),
+        "db_writer": db_writer.stats(),
+        "invalidation_bus": invalidation_bus.stats(),
+        "auth_tokens": token_cache.stats(),
+        "auth_users": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "login_limiter": login_limiter.stats(),
+        "conversations": conversation_store.stats(),
+        "responses": response_cache.stats(),
+        "profiles": profile_cache.stats(),
+        "live_feed": live_feed.stats(),
+    }
+
+
+# ==================== METRICS ====================
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format - histogrami se serijalizuju tek ovde"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 # ==================== HEALTH CHECK ====================
 
-@app.get("/")
+@router.get("/")
 def health_check():
     """Health check endpoint"""
     return {"status": "ok", "message": "Instagram Chatbot Platform API"}
 
 
+def create_app() -> FastAPI:
+    """
+    App factory (`uvicorn main:create_app --factory`). Import modula ne
+    dira bazu - šema se migrira i servisi pokreću tek u lifespan-u.
+    """
+    app = FastAPI(title="Instagram Chatbot Platform API", lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173", "http://localhost:5174"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
+
+
+def __getattr__(name: str):
+    # `main:app` (gunicorn, benchmark skripte) - aplikacija se pravi pri prvom pristupu
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(create_app(), host="0.0.0.0", port=8000)
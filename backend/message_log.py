@@ -0,0 +1,191 @@
+"""
+Baferisani upis Message loga (i outbox redova) u bazu.
+
+Umesto jedne transakcije po poruci, redovi se skupljaju u memoriji i upisuju
+bulk insert-om kad se skupi MESSAGE_LOG_BATCH_SIZE redova ili prođe
+MESSAGE_LOG_FLUSH_INTERVAL sekundi. MESSAGE_LOG_DURABILITY bira garanciju:
+
+- sync:  svaki poziv odmah upisuje svoje redove u sopstvenoj transakciji
+- group: pozivalac čeka commit batch-a u kome je njegov red (group commit)
+- async: pozivalac ne čeka; redovi se gube ako proces padne pre flush-a
+"""
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import os
+
+from sqlalchemy import insert
+
+from database import SessionLocal
+from db_writer import db_writer
+from models import Message, OutboundMessage
+from outbox import outbox_workers
+from metrics import db_latency
+
+MESSAGE_LOG_DURABILITY = os.getenv("MESSAGE_LOG_DURABILITY", "group")
+MESSAGE_LOG_BATCH_SIZE = int(os.getenv("MESSAGE_LOG_BATCH_SIZE", "500"))
+MESSAGE_LOG_FLUSH_INTERVAL = float(os.getenv("MESSAGE_LOG_FLUSH_INTERVAL", "0.02"))
+MESSAGE_LOG_MAX_BUFFER = int(os.getenv("MESSAGE_LOG_MAX_BUFFER", "50000"))
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("sync", "group", "async")
+
+# (Message kolone, OutboundMessage kolone ili None)
+LogRow = Tuple[dict, Optional[dict]]
+
+
+def insert_rows(rows: List[LogRow]) -> None:
+    """Bulk insert Message i OutboundMessage redova u jednoj transakciji"""
+    messages = [message for message, _ in rows]
+    outbound = [outbound for _, outbound in rows if outbound is not None]
+
+    with db_latency.time(operation="message_log_insert"):
+        db = SessionLocal()
+        try:
+            db.execute(insert(Message), messages)
+            if outbound:
+                db.execute(insert(OutboundMessage), outbound)
+            db.commit()
+        finally:
+            db.close()
+
+
+class MessageLogWriter:
+    def __init__(
+        self,
+        durability: str = MESSAGE_LOG_DURABILITY,
+        batch_size: int = MESSAGE_LOG_BATCH_SIZE,
+        flush_interval: float = MESSAGE_LOG_FLUSH_INTERVAL,
+        max_buffer: int = MESSAGE_LOG_MAX_BUFFER,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"MESSAGE_LOG_DURABILITY must be one of {DURABILITY_MODES}")
+
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+
+        self._buffer: List[LogRow] = []
+        self._waiters: List[asyncio.Future] = []
+        self._has_data: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self.running or self.durability == "sync":
+            return
+
+        self._stopping = False
+        self._has_data = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self) -> None:
+        """Flush svega iz bafera pre gašenja"""
+        if not self.running:
+            return
+
+        self._stopping = True
+        self._has_data.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+        while self._buffer:
+            if not await self._flush():
+                break
+
+    async def write(self, rows: List[LogRow]) -> None:
+        """Upis redova prema podešenoj durability garanciji"""
+        if not rows:
+            return
+
+        if not self.running:
+            await self._insert(rows)
+            return
+
+        if len(self._buffer) >= self.max_buffer:
+            # Backpressure - baza ne stiže, ne puštamo bafer da raste
+            await self._flush()
+
+        self._buffer.extend(rows)
+        self._has_data.set()
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+        if self.durability == "group":
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+    async def _insert(self, rows: List[LogRow]) -> None:
+        await db_writer.run(insert_rows, rows)
+        self.rows_written += len(rows)
+        self.flushes += 1
+        if any(outbound is not None for _, outbound in rows):
+            outbox_workers.notify()
+
+    async def _flush(self) -> bool:
+        rows, self._buffer = self._buffer, []
+        waiters, self._waiters = self._waiters, []
+        if not rows:
+            return True
+
+        try:
+            await self._insert(rows)
+        except Exception as e:
+            self.errors += 1
+            logger.error("Message log flush error (%d rows): %s", len(rows), e)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            if self.durability == "async" and len(self._buffer) + len(rows) <= self.max_buffer:
+                # Niko ne čeka rezultat - vraćamo redove za sledeći pokušaj
+                self._buffer[:0] = rows
+            return False
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        return True
+
+    async def _flusher(self) -> None:
+        while not self._stopping:
+            await self._has_data.wait()
+            if len(self._buffer) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            self._has_data.clear()
+            self._full.clear()
+            flushed = await self._flush()
+
+            if self._buffer:
+                self._has_data.set()
+                if not flushed:
+                    await asyncio.sleep(self.flush_interval)
+
+    def stats(self) -> dict:
+        return {
+            "durability": self.durability,
+            "buffered": len(self._buffer),
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "errors": self.errors,
+        }
+
+
+message_log = MessageLogWriter()
@@ -0,0 +1,104 @@
+"""
+Migracije šeme (Alembic, migrations/ folder).
+
+Šema se više ne pravi pri importu main.py. `upgrade_database()` dovodi bazu
+na poslednju reviziju; zove je lifespan kad je DB_AUTO_MIGRATE=1 (default,
+jedan proces), gunicorn master pre pokretanja worker-a (gunicorn.conf.py),
+ili ručno / release faza deploy-a:
+
+    python migrate.py               # upgrade na head
+    python migrate.py current       # trenutna revizija baze
+
+Nova revizija posle izmene models.py:
+    alembic revision --autogenerate -m "opis"
+"""
+from contextlib import contextmanager
+from typing import Optional
+import argparse
+import logging
+import os
+import tempfile
+
+from database import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows - bez zaštite između procesa
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+@contextmanager
+def _migrate_lock():
+    """Više procesa na istom hostu (npr. uvicorn --workers) ne migrira istovremeno"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(os.path.join(tempfile.gettempdir(), "instagram-chatbot-migrate.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _config(configure_logger: bool = False):
+    # Alembic se učitava tek ovde - nije potreban na startu worker-a bez migracija
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    config.attributes["configure_logger"] = configure_logger
+    return config
+
+
+def current_revision() -> Optional[str]:
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def head_revision() -> Optional[str]:
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_config()).get_current_head()
+
+
+def upgrade_database(configure_logger: bool = False) -> None:
+    """Upgrade na head; ako je baza već na head-u, samo jedan upit"""
+    from alembic import command
+
+    with _migrate_lock():
+        current, head = current_revision(), head_revision()
+        if current == head:
+            return
+
+        logger.info("Migrating database schema", extra={"from_revision": current, "to_revision": head})
+        config = _config(configure_logger)
+        with engine.begin() as connection:
+            config.attributes["connection"] = connection
+            command.upgrade(config, "head")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", nargs="?", choices=("upgrade", "current"), default="upgrade")
+    args = parser.parse_args()
+
+    if args.command == "current":
+        print(f"{current_revision()} (head {head_revision()})")
+        return
+
+    upgrade_database(configure_logger=True)
+    print(f"Database at revision {current_revision()}")
+
+
+if __name__ == "__main__":
+    main()
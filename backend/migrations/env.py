@@ -0,0 +1,52 @@
+"""
+Alembic okruženje - koristi sinhroni engine iz database.py (isti DATABASE_URL
+kao aplikacija). migrate.py prosleđuje već otvorenu konekciju.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import IS_SQLITE, engine
+from models import Base
+
+config = context.config
+
+# Iz aplikacije logging je već podešen (setup_logging) - ne dira se
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """SQL skripta umesto izvršavanja (alembic upgrade head --sql)"""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=IS_SQLITE,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is None:
+        with engine.connect() as connection:
+            _run(connection)
+    else:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    # SQLite ne podržava većinu ALTER TABLE naredbi - batch mod pravi novu tabelu
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=IS_SQLITE)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
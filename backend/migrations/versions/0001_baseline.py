@@ -0,0 +1,165 @@
+"""Baseline šema
+
+Šema u trenutku prelaska sa create_all na migracije. Baze napravljene ranije
+(create_all + dodavanje kolona pri startu) nemaju alembic_version tabelu, pa
+ova revizija pravi samo ono što u njima nedostaje - tabele, kolone i indekse.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables() -> list:
+    return [
+        ("users", lambda: op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )),
+        ("chatbots", lambda: op.create_table(
+            "chatbots",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("instagram_account_id", sa.String(), nullable=False, unique=True),
+            sa.Column("instagram_username", sa.String()),
+            sa.Column("access_token", sa.Text(), nullable=False),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.Column("message_retention_days", sa.Integer()),
+            sa.Column("deleted_at", sa.DateTime()),
+            sa.Column("default_response", sa.Text()),
+            sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+        )),
+        ("keywords", lambda: op.create_table(
+            "keywords",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("trigger", sa.String(), nullable=False),
+            sa.Column("response", sa.Text(), nullable=False),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("match_type", sa.String(), nullable=False, server_default="substring"),
+            sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("chatbot_id", sa.Integer(), sa.ForeignKey("chatbots.id")),
+        )),
+        ("messages", lambda: op.create_table(
+            "messages",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("sender_id", sa.String(), nullable=False),
+            sa.Column("sender_username", sa.String()),
+            sa.Column("message_text", sa.Text(), nullable=False),
+            sa.Column("bot_response", sa.Text()),
+            sa.Column("matched_keyword", sa.String()),
+            sa.Column("timestamp", sa.DateTime()),
+            sa.Column("chatbot_id", sa.Integer(), sa.ForeignKey("chatbots.id")),
+        )),
+        ("outbound_messages", lambda: op.create_table(
+            "outbound_messages",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("recipient_id", sa.String(), nullable=False),
+            sa.Column("message_text", sa.Text(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime()),
+            sa.Column("locked_until", sa.DateTime()),
+            sa.Column("last_error", sa.Text()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("sent_at", sa.DateTime()),
+            sa.Column("chatbot_id", sa.Integer(), sa.ForeignKey("chatbots.id")),
+        )),
+        ("chatbot_hourly_stats", lambda: op.create_table(
+            "chatbot_hourly_stats",
+            sa.Column("chatbot_id", sa.Integer(), sa.ForeignKey("chatbots.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("hour", sa.DateTime(), primary_key=True),
+            sa.Column("messages", sa.Integer(), nullable=False),
+            sa.Column("default_replies", sa.Integer(), nullable=False),
+        )),
+        ("keyword_daily_stats", lambda: op.create_table(
+            "keyword_daily_stats",
+            sa.Column("chatbot_id", sa.Integer(), sa.ForeignKey("chatbots.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("keyword", sa.String(), primary_key=True),
+            sa.Column("matches", sa.Integer(), nullable=False),
+        )),
+        ("chatbot_daily_senders", lambda: op.create_table(
+            "chatbot_daily_senders",
+            sa.Column("chatbot_id", sa.Integer(), sa.ForeignKey("chatbots.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("sender_id", sa.String(), primary_key=True),
+        )),
+        ("cache_invalidations", lambda: op.create_table(
+            "cache_invalidations",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("payload", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )),
+    ]
+
+
+# Kolone koje je stari start dodavao sa ALTER TABLE
+_ADDED_COLUMNS = {
+    "keywords": [
+        lambda: sa.Column("match_type", sa.String(), nullable=False, server_default="substring"),
+        lambda: sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+    ],
+    "chatbots": [
+        lambda: sa.Column("message_retention_days", sa.Integer()),
+        lambda: sa.Column("deleted_at", sa.DateTime()),
+        lambda: sa.Column("default_response", sa.Text()),
+    ],
+}
+
+# (ime, tabela, kolone, unique)
+_INDEXES = [
+    ("ix_users_id", "users", ["id"], False),
+    ("ix_users_username", "users", ["username"], True),
+    ("ix_users_email", "users", ["email"], True),
+    ("ix_chatbots_id", "chatbots", ["id"], False),
+    ("ix_keywords_id", "keywords", ["id"], False),
+    ("ix_messages_id", "messages", ["id"], False),
+    ("ix_messages_chatbot_timestamp", "messages", ["chatbot_id", "timestamp", "id"], False),
+    ("ix_messages_chatbot_sender_timestamp", "messages", ["chatbot_id", "sender_id", "timestamp", "id"], False),
+    ("ix_messages_chatbot_keyword_timestamp", "messages", ["chatbot_id", "matched_keyword", "timestamp", "id"], False),
+    ("ix_outbound_messages_id", "outbound_messages", ["id"], False),
+    ("ix_outbound_messages_status_next_attempt", "outbound_messages", ["status", "next_attempt_at"], False),
+    ("ix_cache_invalidations_created_at", "cache_invalidations", ["created_at"], False),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+
+    for table, create in _tables():
+        if table not in existing:
+            create()
+        elif table in _ADDED_COLUMNS:
+            columns = {column["name"] for column in inspector.get_columns(table)}
+            for make_column in _ADDED_COLUMNS[table]:
+                column = make_column()
+                if column.name not in columns:
+                    with op.batch_alter_table(table) as batch:
+                        batch.add_column(column)
+
+    indexes = {}
+    for name, table, columns, unique in _INDEXES:
+        if table not in indexes:
+            indexes[table] = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+        if name not in indexes[table]:
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    for table, _ in reversed(_tables()):
+        op.drop_table(table)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text, ForeignKey, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -32,6 +32,12 @@ class Chatbot(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Dani čuvanja poruka; None = MESSAGE_RETENTION_DAYS, 0 = zauvek (vidi retention.py)
+    message_retention_days = Column(Integer)
+    # Označen za brisanje - poruke i red briše retention.py u pozadini
+    deleted_at = Column(DateTime)
+    # Šablon odgovora kad nijedan keyword ne pogodi; None = podrazumevani tekst (vidi templates.py)
+    default_response = Column(Text)
     
     # Owner
     owner_id = Column(Integer, ForeignKey("users.id"))
@@ -39,7 +45,8 @@ class Chatbot(Base):
     
     # Relationships
     keywords = relationship("Keyword", back_populates="chatbot", cascade="all, delete-orphan")
-    messages = relationship("Message", back_populates="chatbot", cascade="all, delete-orphan")
+    messages = relationship("Message", back_populates="chatbot", cascade="all, delete-orphan", passive_deletes=True)
+    outbound_messages = relationship("OutboundMessage", back_populates="chatbot", cascade="all, delete-orphan")
 
 
 class Keyword(Base):
@@ -50,6 +57,9 @@ class Keyword(Base):
     trigger = Column(String, nullable=False)  # Keyword koji triggeruje odgovor
     response = Column(Text, nullable=False)   # Automatski odgovor
     is_active = Column(Boolean, default=True)
+    # substring / word / regex / fuzzy (vidi keyword_matcher.py)
+    match_type = Column(String, nullable=False, default="substring", server_default="substring")
+    priority = Column(Integer, nullable=False, default=0, server_default="0")  # Veći pobeđuje
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Foreign key
@@ -72,3 +82,72 @@ class Message(Base):
     # Foreign key
     chatbot_id = Column(Integer, ForeignKey("chatbots.id"))
     chatbot = relationship("Chatbot", back_populates="messages")
+    
+    # Keyset paginacija istorije: (chatbot_id, [filter], timestamp, id)
+    __table_args__ = (
+        Index("ix_messages_chatbot_timestamp", "chatbot_id", "timestamp", "id"),
+        Index("ix_messages_chatbot_sender_timestamp", "chatbot_id", "sender_id", "timestamp", "id"),
+        Index("ix_messages_chatbot_keyword_timestamp", "chatbot_id", "matched_keyword", "timestamp", "id"),
+    )
+
+
+class OutboundMessage(Base):
+    """Outbox - odgovori koji čekaju slanje preko Instagram API"""
+    __tablename__ = "outbound_messages"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    recipient_id = Column(String, nullable=False)  # Instagram user ID
+    message_text = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending / sending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    locked_until = Column(DateTime)  # Lease - posle isteka red se ponovo preuzima
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+    
+    # Foreign key
+    chatbot_id = Column(Integer, ForeignKey("chatbots.id"))
+    chatbot = relationship("Chatbot", back_populates="outbound_messages")
+    
+    __table_args__ = (
+        Index("ix_outbound_messages_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+
+class ChatbotHourlyStats(Base):
+    """Rollup: broj poruka i default odgovora po chatbotu i satu"""
+    __tablename__ = "chatbot_hourly_stats"
+    
+    chatbot_id = Column(Integer, ForeignKey("chatbots.id", ondelete="CASCADE"), primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # Početak sata (UTC)
+    messages = Column(Integer, nullable=False, default=0)
+    default_replies = Column(Integer, nullable=False, default=0)
+
+
+class KeywordDailyStats(Base):
+    """Rollup: broj match-eva po keyword-u i danu"""
+    __tablename__ = "keyword_daily_stats"
+    
+    chatbot_id = Column(Integer, ForeignKey("chatbots.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    keyword = Column(String, primary_key=True)  # Message.matched_keyword
+    matches = Column(Integer, nullable=False, default=0)
+
+
+class ChatbotDailySender(Base):
+    """Rollup: jedinstveni pošiljaoci po chatbotu i danu (red po pošiljaocu)"""
+    __tablename__ = "chatbot_daily_senders"
+    
+    chatbot_id = Column(Integer, ForeignKey("chatbots.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    sender_id = Column(String, primary_key=True)
+
+
+class CacheInvalidation(Base):
+    """Invalidacije keša za ostale procese (INVALIDATION_BUS=db)"""
+    __tablename__ = "cache_invalidations"
+    
+    id = Column(Integer, primary_key=True)
+    payload = Column(Text, nullable=False)  # JSON: origin, kind, key
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
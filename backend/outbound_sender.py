@@ -0,0 +1,198 @@
+from typing import Dict, Optional
+import asyncio
+import os
+import random
+
+import httpx
+
+from graph_rate_limiter import GraphRateLimiter, graph_rate_limiter
+from metrics import send_latency
+
+GRAPH_API_BASE_URL = os.getenv("GRAPH_API_BASE_URL", "https://graph.instagram.com/v18.0")
+GRAPH_API_TIMEOUT = float(os.getenv("GRAPH_API_TIMEOUT", "10"))
+GRAPH_API_CONNECT_TIMEOUT = float(os.getenv("GRAPH_API_CONNECT_TIMEOUT", "3"))
+GRAPH_API_MAX_RETRIES = int(os.getenv("GRAPH_API_MAX_RETRIES", "3"))
+GRAPH_API_RETRY_BACKOFF = float(os.getenv("GRAPH_API_RETRY_BACKOFF", "0.5"))
+GRAPH_API_MAX_CONNECTIONS = int(os.getenv("GRAPH_API_MAX_CONNECTIONS", "100"))
+GRAPH_API_CONCURRENCY_PER_TOKEN = int(os.getenv("GRAPH_API_CONCURRENCY_PER_TOKEN", "4"))
+
+# "outbox" - webhook upisuje odgovor u outbox tabelu; "inline" - staro blokirajuće slanje
+OUTBOUND_SEND_MODE = os.getenv("OUTBOUND_SEND_MODE", "outbox")
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OutboundSender:
+    """
+    Asinhrono slanje odgovora preko Instagram Graph API-ja.
+
+    Svi zahtevi idu kroz jedan httpx.AsyncClient (keep-alive connection pool),
+    broj istovremenih zahteva po access tokenu je ograničen semaforom, a
+    brzina po tokenu rate limiter-om (vidi graph_rate_limiter.py).
+    429/5xx odgovori i mrežne greške se ponavljaju sa eksponencijalnim
+    backoff-om; 429 pauzira i ostala slanja istim tokenom.
+    """
+
+    def __init__(
+        self,
+        base_url: str = GRAPH_API_BASE_URL,
+        concurrency_per_token: int = GRAPH_API_CONCURRENCY_PER_TOKEN,
+        max_retries: int = GRAPH_API_MAX_RETRIES,
+        retry_backoff: float = GRAPH_API_RETRY_BACKOFF,
+        rate_limiter: GraphRateLimiter = graph_rate_limiter,
+    ):
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.concurrency_per_token = concurrency_per_token
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def running(self) -> bool:
+        return self._client is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(GRAPH_API_TIMEOUT, connect=GRAPH_API_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=GRAPH_API_MAX_CONNECTIONS,
+                max_keepalive_connections=GRAPH_API_MAX_CONNECTIONS,
+            ),
+        )
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+
+        await self._client.aclose()
+        self._client = None
+        self._semaphores.clear()
+
+    async def send(self, access_token: str, recipient_id: str, message_text: str, retry: bool = False) -> dict:
+        """
+        Slanje jedne poruke sa retry-em na 429/5xx.
+
+        Ako ni posle svih pokušaja nije uspelo zbog privremene greške, rezultat
+        ima "retryable": True pa outbox može da pokuša ponovo kasnije. Ako bi
+        limiter čekao predugo, rezultat ima i "defer" (sekunde) - poruka nije
+        ni poslata. `retry` je ponovni pokušaj iz outbox-a (niži prioritet).
+        """
+        with send_latency.time(mode="async"):
+            return await self._send(access_token, recipient_id, message_text, retry)
+
+    async def _send(self, access_token: str, recipient_id: str, message_text: str, retry: bool) -> dict:
+        semaphore = self._semaphores.get(access_token)
+        if semaphore is None:
+            semaphore = self._semaphores[access_token] = asyncio.Semaphore(self.concurrency_per_token)
+
+        payload = {
+            "recipient": {"id": recipient_id},
+            "message": {"text": message_text}
+        }
+        params = {"access_token": access_token}
+
+        attempt = 0
+        while True:
+            defer = await self.rate_limiter.acquire(access_token, retry=retry or attempt > 0)
+            if defer:
+                return {"error": "Rate limited", "retryable": True, "defer": defer}
+
+            retry_after = None
+            async with semaphore:
+                try:
+                    response = await self._client.post(
+                        f"{self.base_url}/me/messages", json=payload, params=params
+                    )
+                    retry_after = self._retry_after(response)
+                    self.rate_limiter.observe(access_token, response.status_code, response.headers, retry_after)
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        result = response.json()
+                        if response.is_success:
+                            self.sent += 1
+                        else:
+                            self.failed += 1
+                        return result
+                    error = f"HTTP {response.status_code}"
+                except httpx.HTTPError as e:
+                    error = str(e) or e.__class__.__name__
+                except ValueError as e:
+                    self.failed += 1
+                    return {"error": f"Invalid JSON response: {e}"}
+
+            if retry_after is not None and retry_after > self.rate_limiter.max_wait:
+                # Dugačak Retry-After se ne odspavljuje ovde - outbox odlaže red
+                return {"error": error, "retryable": True, "defer": retry_after}
+
+            if attempt >= self.max_retries:
+                self.failed += 1
+                return {"error": error, "retryable": True}
+
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    async def get_profile(self, access_token: str, user_id: str) -> Optional[dict]:
+        """
+        Profil pošiljaoca (username, name) - bez retry-a, profil nije neophodan
+        za odgovor. None za bilo koju grešku, {"rate_limited": True} ako je
+        token na limitu (ne kešira se kao neuspeh).
+        """
+        if not self.running:
+            return None
+
+        semaphore = self._semaphores.get(access_token)
+        if semaphore is None:
+            semaphore = self._semaphores[access_token] = asyncio.Semaphore(self.concurrency_per_token)
+
+        # Profil ne čeka na limit - bolje bez imena nego kasniji odgovori
+        if not self.rate_limiter.try_acquire(access_token):
+            return {"rate_limited": True}
+
+        async with semaphore:
+            try:
+                response = await self._client.get(
+                    f"{self.base_url}/{user_id}",
+                    params={"fields": "username,name", "access_token": access_token},
+                )
+                self.rate_limiter.observe(
+                    access_token, response.status_code, response.headers, self._retry_after(response)
+                )
+                if not response.is_success:
+                    return None
+                return response.json()
+            except (httpx.HTTPError, ValueError):
+                return None
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Najviše max_wait limiter-a - batch outbox worker-a ne sme da stoji iza jednog slanja"""
+        if retry_after is not None:
+            return min(retry_after, self.rate_limiter.max_wait)
+        delay = self.retry_backoff * (2 ** (attempt - 1))
+        return min(delay + random.uniform(0, delay / 2), self.rate_limiter.max_wait)
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+outbound_sender = OutboundSender()
@@ -0,0 +1,355 @@
+"""
+Trajni outbox za odgovore: webhook upisuje OutboundMessage red u istoj
+transakciji kao i Message log, a pool worker-a ga šalje (at-least-once).
+
+Worker-i mogu da rade u web procesu (OUTBOX_WORKERS > 0) ili kao zasebni
+procesi:
+    python outbox.py
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+import asyncio
+import logging
+import os
+import signal
+import threading
+
+from sqlalchemy import and_, bindparam, or_, update
+
+from database import SessionLocal, engine
+from db_writer import db_writer
+from models import Chatbot, OutboundMessage
+from outbound_sender import outbound_sender
+from metrics import db_latency
+from logging_config import setup_logging, stop_logging
+
+try:
+    import fcntl
+except ImportError:  # Windows - ostaje samo lock unutar procesa
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BACKOFF = float(os.getenv("OUTBOX_RETRY_BACKOFF", "5"))
+# Najduže jedno slanje (sa retry-em) - mora biti dosta kraće od lease-a, inače
+# drugi worker preuzima red koji se još šalje
+OUTBOX_SEND_TIMEOUT = float(os.getenv("OUTBOX_SEND_TIMEOUT", str(OUTBOX_LEASE_SECONDS / 3)))
+# Rezultati završenih slanja se upisuju bar ovoliko često, ne tek na kraju batch-a
+OUTBOX_FLUSH_INTERVAL = float(os.getenv("OUTBOX_FLUSH_INTERVAL", "1.0"))
+# Ponovni upisi rezultata posle greške (pauza 0.5s, 1s, 2s...) pre upisa red po red
+OUTBOX_COMPLETE_RETRIES = int(os.getenv("OUTBOX_COMPLETE_RETRIES", "3"))
+
+_claim_thread_lock = threading.Lock()
+
+
+class ClaimedMessage(NamedTuple):
+    id: int
+    recipient_id: str
+    message_text: str
+    attempts: int
+    access_token: str
+
+
+def _lock_file_path() -> Optional[str]:
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        return None
+    return f"{database}.outbox.lock"
+
+
+@contextmanager
+def _claim_lock():
+    """
+    Na SQLite nema SKIP LOCKED - preuzimanje serijalizujemo lock fajlom
+    (važi i između procesa na istom hostu). Na Postgres-u nije potreban.
+    """
+    if engine.dialect.name == "postgresql":
+        yield
+        return
+
+    with _claim_thread_lock:
+        path = _lock_file_path()
+        if fcntl is None or path is None:
+            yield
+            return
+
+        with open(path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def claim_batch(batch_size: int = OUTBOX_BATCH_SIZE) -> List[ClaimedMessage]:
+    """Preuzimanje sledećeg batch-a poruka za slanje (status -> sending)"""
+    with _claim_lock(), db_latency.time(operation="outbox_claim"):
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            query = db.query(OutboundMessage, Chatbot.access_token).join(Chatbot).filter(
+                or_(
+                    and_(
+                        OutboundMessage.status == "pending",
+                        OutboundMessage.next_attempt_at <= now
+                    ),
+                    # Worker koji je preuzeo red je pao - lease je istekao
+                    and_(
+                        OutboundMessage.status == "sending",
+                        OutboundMessage.locked_until < now
+                    ),
+                )
+            ).order_by(OutboundMessage.next_attempt_at, OutboundMessage.id).limit(batch_size)
+
+            if db.bind.dialect.name == "postgresql":
+                query = query.with_for_update(of=OutboundMessage, skip_locked=True)
+
+            claimed = []
+            locked_until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+            for message, access_token in query.all():
+                message.status = "sending"
+                message.locked_until = locked_until
+                message.attempts += 1
+                claimed.append(ClaimedMessage(
+                    message.id, message.recipient_id, message.message_text,
+                    message.attempts, access_token
+                ))
+
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+
+def complete_batch(results: List[tuple]) -> None:
+    """
+    Upis rezultata slanja za ceo batch u jednoj transakciji. Red koji je u
+    međuvremenu obrisan (brisanje chatbota) se preskače.
+    """
+    now = datetime.utcnow()
+    updates = []
+
+    for message, result in results:
+        if isinstance(result, Exception):
+            result = {"error": str(result), "retryable": True}
+
+        if "error" not in result:
+            updates.append({
+                "outbound_id": message.id, "status": "sent", "sent_at": now,
+                "locked_until": None, "last_error": None
+            })
+        elif "defer" in result:
+            # Nalog je na limitu (graph_rate_limiter) - poruka nije ni poslata,
+            # pokušaj se ne računa
+            updates.append({
+                "outbound_id": message.id, "status": "pending", "locked_until": None,
+                "attempts": message.attempts - 1,
+                "next_attempt_at": now + timedelta(seconds=result["defer"]),
+                "last_error": str(result["error"])
+            })
+        elif result.get("retryable") and message.attempts < OUTBOX_MAX_ATTEMPTS:
+            delay = OUTBOX_RETRY_BACKOFF * (2 ** (message.attempts - 1))
+            updates.append({
+                "outbound_id": message.id, "status": "pending", "locked_until": None,
+                "next_attempt_at": now + timedelta(seconds=delay),
+                "last_error": str(result["error"])
+            })
+        else:
+            updates.append({
+                "outbound_id": message.id, "status": "failed", "locked_until": None,
+                "last_error": str(result["error"])
+            })
+            logger.warning(
+                "Giving up on outbound message: %s", result["error"],
+                extra={"outbound_id": message.id, "recipient_id": message.recipient_id}
+            )
+
+    # Core executemany po skupu kolona - za razliku od ORM bulk update-a ne
+    # proverava broj izmenjenih redova, pa obrisan red ne obara ceo batch
+    table = OutboundMessage.__table__
+    statement = update(table).where(table.c.id == bindparam("outbound_id"))
+    groups = {}
+    for row in updates:
+        groups.setdefault(tuple(row), []).append(row)
+
+    with db_latency.time(operation="outbox_complete"):
+        db = SessionLocal()
+        try:
+            for rows in groups.values():
+                db.execute(statement, rows)
+            db.commit()
+        finally:
+            db.close()
+
+
+class OutboxWorkerPool:
+    """Pool asinhronih worker-a koji prazne outbox u batch-evima"""
+
+    def __init__(
+        self,
+        workers: int = OUTBOX_WORKERS,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        self.sent = 0
+        self.failed = 0
+        self.deferred = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running or self.workers <= 0:
+            return
+
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Worker-i završavaju batch koji šalju; ostatak ostaje u outbox-u"""
+        if not self.running:
+            return
+
+        self._stopping = True
+        self._wake.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Buđenje worker-a posle upisa novog reda (umesto čekanja na poll)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                batch = await db_writer.run(claim_batch, self.batch_size)
+            except Exception:
+                logger.exception("Outbox claim error")
+                batch = []
+
+            if not batch:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            # Završena slanja se upisuju odmah (u grupama), pa jedno sporo slanje
+            # ne drži poslate redove u "sending" dok im lease ne istekne
+            pending = {asyncio.ensure_future(self._send(message)): message for message in batch}
+            while pending:
+                done, _ = await asyncio.wait(set(pending), timeout=OUTBOX_FLUSH_INTERVAL)
+                if not done:
+                    continue
+                results = [(pending.pop(task), task.result()) for task in done]
+
+                for _, result in await self._complete(results):
+                    if isinstance(result, dict) and "error" not in result:
+                        self.sent += 1
+                    elif isinstance(result, dict) and "defer" in result:
+                        self.deferred += 1
+                    else:
+                        self.failed += 1
+
+            self.batches += 1
+
+    async def _complete(self, results: List[tuple]) -> List[tuple]:
+        """
+        Upis rezultata; vraća upisane. Rezultat koji se ne upiše ostaje
+        "sending" pa se poruka posle isteka lease-a šalje ponovo - zato se
+        upis ponavlja, a na kraju ide red po red da jedan loš red ne zadrži
+        ostale.
+        """
+        for attempt in range(OUTBOX_COMPLETE_RETRIES + 1):
+            try:
+                await db_writer.run(complete_batch, results)
+                return results
+            except Exception as e:
+                if attempt == OUTBOX_COMPLETE_RETRIES:
+                    logger.exception("Outbox complete error", extra={"results": len(results)})
+                    break
+                logger.warning("Outbox complete error, retrying: %s", e, extra={"attempt": attempt + 1})
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+        if len(results) == 1:
+            return []
+        written = []
+        for item in results:
+            try:
+                await db_writer.run(complete_batch, [item])
+                written.append(item)
+            except Exception:
+                # Red ostaje "sending" i biće ponovo preuzet kad lease istekne
+                logger.exception("Outbox complete error", extra={"outbound_id": item[0].id})
+        return written
+
+    async def _send(self, message: ClaimedMessage):
+        """Rezultat slanja ili izuzetak; ograničeno na OUTBOX_SEND_TIMEOUT (< lease)"""
+        try:
+            # Ponovni pokušaji (attempts > 1) imaju niži prioritet kod limiter-a
+            return await asyncio.wait_for(
+                outbound_sender.send(
+                    message.access_token, message.recipient_id, message.message_text, retry=message.attempts > 1
+                ),
+                OUTBOX_SEND_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            return {"error": f"Send timed out after {OUTBOX_SEND_TIMEOUT:g}s", "retryable": True}
+        except Exception as e:
+            return e
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "batches": self.batches,
+            "sent": self.sent,
+            "failed": self.failed,
+            "deferred": self.deferred,
+        }
+
+
+outbox_workers = OutboxWorkerPool()
+
+
+async def run_forever() -> None:
+    """Samostalni worker proces (bez web servera)"""
+    setup_logging()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    pool = OutboxWorkerPool(workers=max(OUTBOX_WORKERS, 1))
+    await outbound_sender.start()
+    await pool.start()
+    logger.info("Outbox worker running", extra={"workers": pool.workers})
+
+    await stop.wait()
+
+    await pool.stop()
+    await outbound_sender.stop()
+    db_writer.shutdown()
+    stop_logging()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_forever())
@@ -0,0 +1,143 @@
+"""
+Hash-ovanje i verifikacija lozinki van event loop-a.
+
+Hash je namerno skup CPU posao; na thread-u i dalje drži GIL i usporava
+webhook-e u istom procesu, pa ide u mali pool zasebnih procesa
+(PASSWORD_HASH_WORKERS, 0 = thread kao ranije). Broj poslova koji čekaju
+je ograničen (PASSWORD_HASH_MAX_PENDING) - preko toga login/register
+dobijaju 503 umesto da se red beskonačno puni.
+
+Šema i cena se podešavaju (PASSWORD_HASH_SCHEME, PASSWORD_HASH_ROUNDS).
+Hash-evi starih šema (PASSWORD_HASH_LEGACY_SCHEMES) ili sa drugim brojem
+rundi i dalje prolaze verifikaciju, a posle uspešnog logina se zamenjuju
+novim (`verify_and_update`).
+
+Modul se importuje i u worker procesima pa ne sme da vuče ostatak aplikacije.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "sha256_crypt")
+# Prazno = podrazumevana cena šeme u passlib-u
+PASSWORD_HASH_ROUNDS = os.getenv("PASSWORD_HASH_ROUNDS", "")
+PASSWORD_HASH_LEGACY_SCHEMES = os.getenv("PASSWORD_HASH_LEGACY_SCHEMES", "sha256_crypt,pbkdf2_sha256,bcrypt")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+
+@lru_cache(maxsize=None)
+def _context():
+    """passlib se učitava pri prvom hash-u (u worker procesu pool-a), ne pri importu"""
+    from passlib.context import CryptContext
+
+    schemes = [PASSWORD_HASH_SCHEME]
+    for scheme in PASSWORD_HASH_LEGACY_SCHEMES.split(","):
+        scheme = scheme.strip()
+        if scheme and scheme not in schemes:
+            schemes.append(scheme)
+
+    policy = {}
+    if PASSWORD_HASH_ROUNDS:
+        # Hash sa bilo kojim drugim brojem rundi se menja na sledećem loginu
+        rounds = int(PASSWORD_HASH_ROUNDS)
+        for key in ("default_rounds", "min_rounds", "max_rounds"):
+            policy[f"{PASSWORD_HASH_SCHEME}__{key}"] = rounds
+
+    return CryptContext(schemes=schemes, default=PASSWORD_HASH_SCHEME, deprecated="auto", **policy)
+
+
+def hash_password(password: str) -> str:
+    return _context().hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(ispravna, novi hash ako stari treba zameniti)"""
+    return _context().verify_and_update(password, hashed_password)
+
+
+class PasswordHasherBusy(Exception):
+    """Previše hash poslova u redu"""
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    async def start(self) -> None:
+        if self.running or self.workers <= 0:
+            return
+
+        # spawn - fork procesa sa pozadinskim thread-ovima (db_writer, logging) nije bezbedan
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+
+        pool, self._pool = self._pool, None
+        await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+    async def hash(self, password: str) -> str:
+        result = await self._run(hash_password, password)
+        self.hashed += 1
+        return result
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        result = await self._run(verify_password, password, hashed_password)
+        self.verified += 1
+        return result
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        self._pending += 1
+        try:
+            if self._pool is None:
+                # Bez pool-a (CLI, PASSWORD_HASH_WORKERS=0) - thread
+                return await asyncio.to_thread(fn, *args)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+            except BrokenProcessPool:
+                # Worker proces je pao (npr. OOM kill) - novi pool i jedan ponovni pokušaj
+                logger.warning("Password hash pool broken, restarting")
+                self.restarts += 1
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+                return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "scheme": PASSWORD_HASH_SCHEME,
+            "workers": self.workers if self.running else 0,
+            "pending": self._pending,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+
+password_hasher = PasswordHasher()
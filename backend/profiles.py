@@ -0,0 +1,175 @@
+"""
+Keš profila pošiljalaca (username, name) za šablone i Message.sender_username.
+
+Profil se traži preko Graph API-ja (`GET /{sender_id}?fields=username,name`)
+jednom po pošiljaocu i čuva PROFILE_CACHE_TTL sekundi; neuspeo lookup se
+kešira kraće (PROFILE_NEGATIVE_TTL) da nedostupan profil ne bi išao na API
+uz svaku poruku. Svi miss-evi jedne webhook isporuke idu jednim lookup-om
+(paralelni zahtevi kroz semafor tokena u outbound_sender-u), a pošiljalac
+koji se već traži se ne traži ponovo - čeka se isti task.
+
+Webhook čeka profil (najviše PROFILE_LOOKUP_TIMEOUT sekundi) samo ako neki
+šablon chatbota koristi username/name. Za ostale chatbotove se koristi samo
+ono što je već u kešu - svaki lookup troši limit tokena (graph_rate_limiter)
+- osim sa PROFILE_PREFETCH=1, kad lookup ide u pozadini radi sender_username
+u logu.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import asyncio
+import os
+import time
+
+from outbound_sender import outbound_sender
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "100000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "86400"))
+PROFILE_NEGATIVE_TTL = float(os.getenv("PROFILE_NEGATIVE_TTL", "300"))
+PROFILE_LOOKUP_TIMEOUT = float(os.getenv("PROFILE_LOOKUP_TIMEOUT", "1.0"))
+PROFILE_PREFETCH = os.getenv("PROFILE_PREFETCH", "0") == "1"
+
+
+class Profile(NamedTuple):
+    username: Optional[str]
+    name: Optional[str]
+
+
+ProfileKey = Tuple[int, str]
+
+
+class ProfileCache:
+    """
+    LRU keš profila po (chatbot_id, sender_id) - isti korisnik ima različit
+    ID za svaki Instagram nalog. Koristi se samo iz event loop-a, bez lock-a.
+    """
+
+    def __init__(
+        self,
+        max_size: int = PROFILE_CACHE_SIZE,
+        ttl: float = PROFILE_CACHE_TTL,
+        negative_ttl: float = PROFILE_NEGATIVE_TTL,
+        timeout: float = PROFILE_LOOKUP_TIMEOUT,
+        prefetch: bool = PROFILE_PREFETCH,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.prefetch = prefetch
+        self._entries: "OrderedDict[ProfileKey, Tuple[float, Optional[Profile]]]" = OrderedDict()
+        self._pending: Dict[ProfileKey, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.lookups = 0
+        self.failures = 0
+        self.skipped = 0
+        self.timeouts = 0
+        self.evictions = 0
+
+    async def lookup(
+        self, chatbot_id: int, access_token: str, sender_ids: Iterable[str], wait: bool
+    ) -> Dict[str, Optional[Profile]]:
+        """
+        Profili pošiljalaca iz keša; za ostale se pokreće lookup. Sa `wait`
+        se čeka do isteka timeout-a, inače se vraća samo ono što je u kešu
+        (lookup u pozadini samo sa `prefetch`).
+        """
+        now = time.monotonic()
+        found: Dict[str, Optional[Profile]] = {}
+        waiting: List[Tuple[str, asyncio.Task]] = []
+        missing: List[str] = []
+
+        for sender_id in dict.fromkeys(sender_ids):
+            key = (chatbot_id, sender_id)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                found[sender_id] = entry[1]
+                continue
+
+            task = self._pending.get(key)
+            if task is not None:
+                self.coalesced += 1
+                waiting.append((sender_id, task))
+            else:
+                self.misses += 1
+                missing.append(sender_id)
+
+        if missing and (wait or self.prefetch):
+            task = asyncio.create_task(self._fetch(chatbot_id, access_token, missing))
+            for sender_id in missing:
+                self._pending[(chatbot_id, sender_id)] = task
+                waiting.append((sender_id, task))
+
+        if not wait or not waiting:
+            return found
+
+        done, pending = await asyncio.wait({task for _, task in waiting}, timeout=self.timeout)
+        if pending:
+            self.timeouts += 1
+        for sender_id, task in waiting:
+            if task in done and not task.cancelled() and task.exception() is None:
+                found[sender_id] = task.result().get(sender_id)
+        return found
+
+    async def _fetch(self, chatbot_id: int, access_token: str, sender_ids: List[str]) -> Dict[str, Optional[Profile]]:
+        self.lookups += 1
+        try:
+            results = await asyncio.gather(
+                *(outbound_sender.get_profile(access_token, sender_id) for sender_id in sender_ids)
+            )
+        finally:
+            current = asyncio.current_task()
+            for sender_id in sender_ids:
+                if self._pending.get((chatbot_id, sender_id)) is current:
+                    del self._pending[(chatbot_id, sender_id)]
+
+        now = time.monotonic()
+        profiles = {}
+        for sender_id, data in zip(sender_ids, results):
+            if data and data.get("rate_limited"):
+                # Token je na limitu - pokušava se ponovo na sledećoj poruci
+                profiles[sender_id] = None
+                self.skipped += 1
+                continue
+            if data and (data.get("username") or data.get("name")):
+                profile = Profile(data.get("username"), data.get("name"))
+                expires_at = now + self.ttl
+            else:
+                profile = None
+                expires_at = now + self.negative_ttl
+                self.failures += 1
+
+            key = (chatbot_id, sender_id)
+            self._entries[key] = (expires_at, profile)
+            self._entries.move_to_end(key)
+            profiles[sender_id] = profile
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return profiles
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "lookups": self.lookups,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "timeouts": self.timeouts,
+            "evictions": self.evictions,
+        }
+
+
+profile_cache = ProfileCache()
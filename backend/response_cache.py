@@ -0,0 +1,120 @@
+"""
+Keš serijalizovanih odgovora dashboard ruta koje se stalno poll-uju
+(lista chatbotova vlasnika, keyword-i chatbota) sa ETag/304 podrškom.
+
+Svaki opseg (scope, id) ima verziju koju CRUD rute povećavaju preko
+invalidation_bus-a ("chatbot_list" po vlasniku, "keyword_list" po chatbotu).
+Dok se verzija ne promeni, ruta vraća keširane JSON bajtove bez upita i
+serijalizacije, a klijent sa istim If-None-Match dobija 304.
+
+ETag sadrži i nasumičnu epohu procesa: brojači verzija su po procesu, pa
+ETag jednog worker-a nikad ne pogađa kod drugog (tamo je samo miss).
+"""
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+import os
+import threading
+import uuid
+
+from invalidation_bus import invalidation_bus
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+
+CHATBOT_LIST = "chatbot_list"
+KEYWORD_LIST = "keyword_list"
+
+ScopeKey = Tuple[str, int]
+
+
+class CachedResponse(NamedTuple):
+    version: int
+    owner_id: int
+    etag: str
+    body: bytes
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._epoch = uuid.uuid4().hex[:12]
+        self._versions: Dict[ScopeKey, int] = {}
+        self._entries: "OrderedDict[ScopeKey, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self, scope: str, key: int) -> int:
+        """Uzima se pre upita - put() odbacuje rezultat ako se verzija u međuvremenu promenila"""
+        with self._lock:
+            return self._versions.get((scope, key), 0)
+
+    def get(self, scope: str, key: int, owner_id: int) -> Optional[CachedResponse]:
+        """Keširan odgovor ako je aktuelan i pripada korisniku (inače ruta proverava vlasništvo upitom)"""
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if (
+                entry is None or entry.owner_id != owner_id
+                or entry.version != self._versions.get((scope, key), 0)
+            ):
+                self.misses += 1
+                return None
+            self._entries.move_to_end((scope, key))
+            self.hits += 1
+            return entry
+
+    def put(self, scope: str, key: int, version: int, owner_id: int, body: bytes) -> CachedResponse:
+        entry = CachedResponse(version, owner_id, f'W/"{self._epoch}.{version}"', body)
+        with self._lock:
+            if self._versions.get((scope, key), 0) != version:
+                return entry
+            self._entries[(scope, key)] = entry
+            self._entries.move_to_end((scope, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def bump(self, scope: str, key: int) -> None:
+        with self._lock:
+            self._versions[(scope, key)] = self._versions.get((scope, key), 0) + 1
+            if self._entries.pop((scope, key), None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Propuštene invalidacije - nova epoha poništava i sve izdate ETag-ove"""
+        with self._lock:
+            self._epoch = uuid.uuid4().hex[:12]
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match (lista ETag-ova ili *) - poređenje je slabo, W/ prefiks se ignoriše"""
+    if not if_none_match:
+        return False
+    tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == tag:
+            return True
+    return False
+
+
+response_cache = ResponseCache()
+
+invalidation_bus.subscribe(CHATBOT_LIST, lambda owner_id: response_cache.bump(CHATBOT_LIST, owner_id))
+invalidation_bus.subscribe(KEYWORD_LIST, lambda chatbot_id: response_cache.bump(KEYWORD_LIST, chatbot_id))
+invalidation_bus.on_reset(response_cache.clear)
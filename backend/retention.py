@@ -0,0 +1,318 @@
+"""
+Retencija i arhiviranje Message loga.
+
+Poruke starije od retencije chatbota (`Chatbot.message_retention_days`, ako
+nije postavljena MESSAGE_RETENTION_DAYS; 0 = čuva se zauvek) pozadinski
+task na svakih MESSAGE_ARCHIVE_INTERVAL sekundi prebacuje u gzip JSONL
+fajlove po chatbotu i mesecu:
+
+    MESSAGE_ARCHIVE_DIR/chatbot-<id>/<YYYY-MM>.jsonl.gz
+
+i briše iz baze. Svaki batch (MESSAGE_ARCHIVE_BATCH_SIZE redova, indeks
+chatbot_id + timestamp) je jedan posao na db_writer-u: čitanje, dopisivanje
+u fajl (novi gzip member, fsync) pa brisanje. Pad između upisa fajla i
+brisanja daje duplikat u arhivi, nikad gubitak poruke.
+
+Brisanje chatbota je jeftino: ruta ga samo označi (`deleted_at`, bez
+vlasnika, oslobođen instagram_account_id), a ovaj task zatim briše njegove
+poruke u malim transakcijama i na kraju sam red chatbota. Outbox redovi koje
+worker upravo šalje (`sending` sa važećim lease-om) se ne diraju - chatbot
+se briše u nekom od sledećih prolaza (CHATBOT_PURGE_RETRY), kad worker upiše
+rezultat.
+
+Jedan prolaz ručno:
+    python retention.py run [--chatbot-id 3]
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+
+import orjson
+from sqlalchemy import delete, func, or_, select
+
+try:
+    import fcntl
+except ImportError:  # Windows - bez zaštite između procesa
+    fcntl = None
+
+from database import SessionLocal
+from db_writer import db_writer
+from models import (
+    Chatbot, ChatbotDailySender, ChatbotHourlyStats, KeywordDailyStats, Message, OutboundMessage,
+)
+from metrics import db_latency
+from logging_config import setup_logging, stop_logging
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", "0"))
+MESSAGE_ARCHIVE_DIR = os.getenv("MESSAGE_ARCHIVE_DIR", "./archive")
+MESSAGE_ARCHIVE_INTERVAL = float(os.getenv("MESSAGE_ARCHIVE_INTERVAL", "3600"))
+MESSAGE_ARCHIVE_BATCH_SIZE = int(os.getenv("MESSAGE_ARCHIVE_BATCH_SIZE", "2000"))
+# Ponovni prolaz posle ovoliko sekundi kad brisanje chatbota čeka outbox
+CHATBOT_PURGE_RETRY = float(os.getenv("CHATBOT_PURGE_RETRY", "30"))
+
+ARCHIVE_COLUMNS = (
+    "id", "sender_id", "sender_username", "message_text", "bot_response", "matched_keyword", "timestamp",
+)
+
+
+@contextmanager
+def _archive_lock():
+    """
+    Sa više worker-a samo jedan proces na hostu radi prolaz (lock fajl u
+    MESSAGE_ARCHIVE_DIR); ostali preskaču. Daje False ako je lock zauzet.
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    os.makedirs(MESSAGE_ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(MESSAGE_ARCHIVE_DIR, ".lock"), "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def archive_path(chatbot_id: int, month: str) -> str:
+    return os.path.join(MESSAGE_ARCHIVE_DIR, f"chatbot-{chatbot_id}", f"{month}.jsonl.gz")
+
+
+def _append_archive(chatbot_id: int, rows: List[Message]) -> None:
+    """Redovi jednog batch-a u fajlove po mesecu (gzip dozvoljava dopisivanje member-a)"""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row.timestamp.strftime("%Y-%m"), []).append(row)
+
+    for month, month_rows in by_month.items():
+        path = archive_path(chatbot_id, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = b"".join(
+            orjson.dumps({column: getattr(row, column) for column in ARCHIVE_COLUMNS}) + b"\n"
+            for row in month_rows
+        )
+        with open(path, "ab") as f:
+            f.write(gzip.compress(data))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def archive_batch(chatbot_id: int, cutoff: datetime, batch_size: int = MESSAGE_ARCHIVE_BATCH_SIZE) -> int:
+    """Jedan batch poruka starijih od `cutoff`: u arhivu pa brisanje. Vraća broj redova."""
+    with db_latency.time(operation="message_archive"):
+        db = SessionLocal()
+        try:
+            rows = db.scalars(select(Message).filter(
+                Message.chatbot_id == chatbot_id,
+                Message.timestamp < cutoff
+            ).order_by(Message.timestamp, Message.id).limit(batch_size)).all()
+            if not rows:
+                return 0
+
+            _append_archive(chatbot_id, rows)
+            db.execute(delete(Message).where(Message.id.in_([row.id for row in rows])))
+            db.commit()
+            return len(rows)
+        finally:
+            db.close()
+
+
+def purge_batch(chatbot_id: int, batch_size: int = MESSAGE_ARCHIVE_BATCH_SIZE) -> Optional[int]:
+    """
+    Jedan batch brisanja obrisanog chatbota (bez arhive). Kad poruka više
+    nema brišu se outbox, rollup-ovi i sam chatbot (keyword-i preko ORM cascade-a).
+    Vraća broj obrisanih poruka, ili None ako outbox worker još šalje neki
+    njegov red - chatbot tada ostaje za sledeći prolaz.
+    """
+    with db_latency.time(operation="chatbot_purge"):
+        db = SessionLocal()
+        try:
+            ids = db.scalars(
+                select(Message.id).filter(Message.chatbot_id == chatbot_id).limit(batch_size)
+            ).all()
+            if ids:
+                db.execute(delete(Message).where(Message.id.in_(ids)))
+                db.commit()
+                return len(ids)
+
+            # Red u "sending" sa važećim lease-om drži worker koji će upisati rezultat
+            now = datetime.utcnow()
+            db.execute(delete(OutboundMessage).where(
+                OutboundMessage.chatbot_id == chatbot_id,
+                or_(
+                    OutboundMessage.status != "sending",
+                    OutboundMessage.locked_until.is_(None),
+                    OutboundMessage.locked_until < now,
+                ),
+            ))
+            sending = db.scalar(
+                select(func.count()).select_from(OutboundMessage).where(OutboundMessage.chatbot_id == chatbot_id)
+            )
+            if sending:
+                db.commit()
+                return None
+
+            # Rollup FK-ovi imaju ON DELETE CASCADE, ali SQLite ga bez pragme ne primenjuje
+            for model in (ChatbotHourlyStats, KeywordDailyStats, ChatbotDailySender):
+                db.execute(delete(model).where(model.chatbot_id == chatbot_id))
+            chatbot = db.get(Chatbot, chatbot_id)
+            if chatbot is not None:
+                db.delete(chatbot)
+            db.commit()
+            return 0
+        finally:
+            db.close()
+
+
+def _pending_chatbots(chatbot_id: Optional[int] = None) -> List[Tuple[int, int, bool]]:
+    """(id, retencija u danima, obrisan) za chatbotove koje treba obraditi"""
+    db = SessionLocal()
+    try:
+        query = select(Chatbot.id, Chatbot.message_retention_days, Chatbot.deleted_at)
+        if chatbot_id is not None:
+            query = query.filter(Chatbot.id == chatbot_id)
+
+        pending = []
+        for row in db.execute(query):
+            days = MESSAGE_RETENTION_DAYS if row.message_retention_days is None else row.message_retention_days
+            deleted = row.deleted_at is not None
+            if deleted or days > 0:
+                pending.append((row.id, days, deleted))
+        return pending
+    finally:
+        db.close()
+
+
+class MessageArchiver:
+    def __init__(self, interval: float = MESSAGE_ARCHIVE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # Brisanje nekog chatbota čeka outbox - sledeći prolaz posle CHATBOT_PURGE_RETRY
+        self._retry = False
+
+        self.archived = 0
+        self.purged = 0
+        self.runs = 0
+        self.errors = 0
+        self.last_run: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Prekid posle tekućeg batch-a"""
+        if not self.running:
+            return
+
+        self._stopping.set()
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    def wake(self) -> None:
+        """Prolaz odmah (npr. posle brisanja chatbota) umesto na sledećem intervalu"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run_once(self, chatbot_id: Optional[int] = None) -> None:
+        with _archive_lock() as acquired:
+            if acquired:
+                await self._run(chatbot_id)
+
+    async def _run(self, chatbot_id: Optional[int]) -> None:
+        self._retry = False
+        for chatbot_id, retention_days, deleted in await db_writer.run(_pending_chatbots, chatbot_id):
+            if deleted:
+                while not self._stopped():
+                    count = await db_writer.run(purge_batch, chatbot_id)
+                    if count is None:
+                        logger.info("Deleted chatbot waits for outbox", extra={"chatbot_id": chatbot_id})
+                        self._retry = True
+                        break
+                    self.purged += count
+                    if not count:
+                        logger.info("Deleted chatbot purged", extra={"chatbot_id": chatbot_id})
+                        break
+                continue
+
+            cutoff = datetime.utcnow() - timedelta(days=retention_days)
+            while not self._stopped():
+                count = await db_writer.run(archive_batch, chatbot_id, cutoff)
+                self.archived += count
+                if count < MESSAGE_ARCHIVE_BATCH_SIZE:
+                    break
+
+        self.runs += 1
+        self.last_run = datetime.utcnow()
+
+    def _stopped(self) -> bool:
+        return self._stopping is not None and self._stopping.is_set()
+
+    async def _loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self.run_once()
+            except Exception:
+                self.errors += 1
+                logger.exception("Message archive error")
+
+            try:
+                interval = min(self.interval, CHATBOT_PURGE_RETRY) if self._retry else self.interval
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def stats(self) -> dict:
+        return {
+            "archived": self.archived,
+            "purged": self.purged,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+message_archiver = MessageArchiver()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--chatbot-id", type=int)
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        asyncio.run(message_archiver.run_once(args.chatbot_id))
+        logger.info("Message archive done", extra=message_archiver.stats())
+    finally:
+        db_writer.shutdown()
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Inkrementalni rollup-ovi za statistiku chatbotova.
+
+Webhook posle upisa loga samo uvećava brojače u memoriji; pozadinski task ih
+na svakih ROLLUP_FLUSH_INTERVAL sekundi sabira u rollup tabele (upsert
+`x = x + excluded.x`). Stats API čita samo iz rollup tabela.
+
+Ponovno građenje iz postojećih `messages` (celi dani, podrazumevano do danas):
+    python rollups.py backfill [--chatbot-id 3] [--since 2026-01-01] [--until 2026-02-01]
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import argparse
+import asyncio
+import logging
+import os
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+from db_writer import db_writer
+from models import ChatbotDailySender, ChatbotHourlyStats, KeywordDailyStats, Message
+from metrics import db_latency
+from logging_config import setup_logging, stop_logging
+
+if engine.dialect.name == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert
+else:
+    from sqlalchemy.dialects.sqlite import insert
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("ROLLUP_FLUSH_INTERVAL", "5"))
+ROLLUP_BACKFILL_CHUNK = int(os.getenv("ROLLUP_BACKFILL_CHUNK", "50000"))
+
+# matched_keyword koji process_incoming_batch upisuje kad nema match-a
+DEFAULT_KEYWORD = "default"
+
+
+class RollupBuffer:
+    """Brojači koji još nisu upisani u rollup tabele"""
+
+    def __init__(self):
+        # (chatbot_id, hour) -> [messages, default_replies]
+        self.hourly: Dict[Tuple[int, datetime], List[int]] = defaultdict(lambda: [0, 0])
+        self.keywords: Dict[Tuple[int, date, str], int] = defaultdict(int)
+        self.senders: Set[Tuple[int, date, str]] = set()
+
+    def __bool__(self) -> bool:
+        return bool(self.hourly)
+
+    def add(self, chatbot_id: int, timestamp: datetime, sender_id: str, matched_keyword: Optional[str]) -> None:
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        day = hour.date()
+        counts = self.hourly[(chatbot_id, hour)]
+        counts[0] += 1
+        if matched_keyword == DEFAULT_KEYWORD:
+            counts[1] += 1
+        elif matched_keyword:
+            self.keywords[(chatbot_id, day, matched_keyword)] += 1
+        self.senders.add((chatbot_id, day, sender_id))
+
+
+def apply_buffer(db: Session, buffer: RollupBuffer) -> None:
+    """Sabiranje bafera u rollup tabele (bez commit-a)"""
+    if buffer.hourly:
+        stmt = insert(ChatbotHourlyStats)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["chatbot_id", "hour"],
+                set_={
+                    "messages": ChatbotHourlyStats.messages + stmt.excluded.messages,
+                    "default_replies": ChatbotHourlyStats.default_replies + stmt.excluded.default_replies,
+                },
+            ),
+            [
+                {"chatbot_id": chatbot_id, "hour": hour, "messages": messages, "default_replies": defaults}
+                for (chatbot_id, hour), (messages, defaults) in buffer.hourly.items()
+            ],
+        )
+
+    if buffer.keywords:
+        stmt = insert(KeywordDailyStats)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["chatbot_id", "day", "keyword"],
+                set_={"matches": KeywordDailyStats.matches + stmt.excluded.matches},
+            ),
+            [
+                {"chatbot_id": chatbot_id, "day": day, "keyword": keyword, "matches": matches}
+                for (chatbot_id, day, keyword), matches in buffer.keywords.items()
+            ],
+        )
+
+    if buffer.senders:
+        db.execute(
+            insert(ChatbotDailySender).on_conflict_do_nothing(),
+            [
+                {"chatbot_id": chatbot_id, "day": day, "sender_id": sender_id}
+                for chatbot_id, day, sender_id in buffer.senders
+            ],
+        )
+
+
+def write_buffer(buffer: RollupBuffer) -> None:
+    with db_latency.time(operation="rollup_flush"):
+        db = SessionLocal()
+        try:
+            apply_buffer(db, buffer)
+            db.commit()
+        finally:
+            db.close()
+
+
+class RollupAggregator:
+    def __init__(self, flush_interval: float = ROLLUP_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+
+        self._buffer = RollupBuffer()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+        self.flushes = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+
+        self._stopping.set()
+        await self._task
+        self._task = None
+        await self._flush()
+
+    async def record(
+        self, chatbot_id: int, timestamp: datetime, events: Iterable[Tuple[str, Optional[str]]]
+    ) -> None:
+        """`events` su (sender_id, matched_keyword) parovi upisanih poruka"""
+        for sender_id, matched_keyword in events:
+            self._buffer.add(chatbot_id, timestamp, sender_id, matched_keyword)
+
+        if not self.running:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        buffer, self._buffer = self._buffer, RollupBuffer()
+        if not buffer:
+            return
+
+        try:
+            await db_writer.run(write_buffer, buffer)
+            self.flushes += 1
+        except Exception:
+            # Brojači su izgubljeni - `python rollups.py backfill` ih vraća iz messages
+            self.errors += 1
+            logger.exception("Rollup flush error")
+
+    async def _flusher(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_hours": len(self._buffer.hourly),
+            "flushes": self.flushes,
+            "errors": self.errors,
+        }
+
+
+rollup_aggregator = RollupAggregator()
+
+
+async def read_stats(db: AsyncSession, chatbot_id: int, since: datetime, top_keywords: int = 10) -> dict:
+    """Statistika chatbota od `since` - samo iz rollup tabela"""
+    since_hour = since.replace(minute=0, second=0, microsecond=0)
+    since_day = since.date()
+
+    hours = (await db.execute(select(
+        ChatbotHourlyStats.hour, ChatbotHourlyStats.messages, ChatbotHourlyStats.default_replies
+    ).filter(
+        ChatbotHourlyStats.chatbot_id == chatbot_id,
+        ChatbotHourlyStats.hour >= since_hour
+    ).order_by(ChatbotHourlyStats.hour))).all()
+
+    keywords = (await db.execute(select(
+        KeywordDailyStats.keyword, func.sum(KeywordDailyStats.matches).label("matches")
+    ).filter(
+        KeywordDailyStats.chatbot_id == chatbot_id,
+        KeywordDailyStats.day >= since_day
+    ).group_by(KeywordDailyStats.keyword).order_by(
+        func.sum(KeywordDailyStats.matches).desc()
+    ).limit(top_keywords))).all()
+
+    unique_senders = await db.scalar(select(
+        func.count(func.distinct(ChatbotDailySender.sender_id))
+    ).filter(
+        ChatbotDailySender.chatbot_id == chatbot_id,
+        ChatbotDailySender.day >= since_day
+    ))
+
+    messages = sum(row.messages for row in hours)
+    default_replies = sum(row.default_replies for row in hours)
+
+    return {
+        "since": since_hour,
+        "messages": messages,
+        "default_replies": default_replies,
+        "default_reply_rate": default_replies / messages if messages else 0.0,
+        "unique_senders": unique_senders or 0,
+        "messages_per_hour": [
+            {"hour": row.hour, "messages": row.messages, "default_replies": row.default_replies}
+            for row in hours
+        ],
+        "top_keywords": [
+            {"keyword": row.keyword, "matches": int(row.matches)} for row in keywords
+        ],
+    }
+
+
+def backfill(
+    chatbot_id: Optional[int] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> int:
+    """
+    Ponovno građenje rollup-ova za cele dane [since, until) iz messages.
+    Podrazumevani `until` je današnji dan (UTC), čije brojače i dalje vodi
+    aplikacija. Vraća broj obrađenih poruka.
+    """
+    until = until or datetime.utcnow().date()
+    until_ts = datetime.combine(until, datetime.min.time())
+    since_ts = datetime.combine(since, datetime.min.time()) if since else None
+
+    def scoped(query, model, column, start, end):
+        if chatbot_id is not None:
+            query = query.filter(model.chatbot_id == chatbot_id)
+        if start is not None:
+            query = query.filter(column >= start)
+        return query.filter(column < end)
+
+    db = SessionLocal()
+    try:
+        scoped(db.query(ChatbotHourlyStats), ChatbotHourlyStats, ChatbotHourlyStats.hour, since_ts, until_ts) \
+            .delete(synchronize_session=False)
+        scoped(db.query(KeywordDailyStats), KeywordDailyStats, KeywordDailyStats.day, since, until) \
+            .delete(synchronize_session=False)
+        scoped(db.query(ChatbotDailySender), ChatbotDailySender, ChatbotDailySender.day, since, until) \
+            .delete(synchronize_session=False)
+
+        messages = scoped(
+            db.query(Message.id, Message.chatbot_id, Message.timestamp, Message.sender_id, Message.matched_keyword),
+            Message, Message.timestamp, since_ts, until_ts
+        ).filter(Message.chatbot_id.isnot(None), Message.timestamp.isnot(None))
+
+        # Keyset po id-u - svaki chunk se pročita ceo pre upisa
+        total = 0
+        last_id = 0
+        while True:
+            chunk = messages.filter(Message.id > last_id).order_by(Message.id).limit(ROLLUP_BACKFILL_CHUNK).all()
+            if not chunk:
+                break
+
+            buffer = RollupBuffer()
+            for row in chunk:
+                buffer.add(row.chatbot_id, row.timestamp, row.sender_id, row.matched_keyword)
+            apply_buffer(db, buffer)
+
+            total += len(chunk)
+            last_id = chunk[-1].id
+            logger.info("Rollup backfill progress", extra={"messages": total})
+
+        db.commit()
+        return total
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill")
+    backfill_parser.add_argument("--chatbot-id", type=int)
+    backfill_parser.add_argument("--since", type=date.fromisoformat)
+    backfill_parser.add_argument("--until", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        total = backfill(args.chatbot_id, args.since, args.until)
+        logger.info("Rollup backfill done", extra={"messages": total})
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 
 # User schemas
@@ -31,6 +31,10 @@ class ChatbotCreate(BaseModel):
     instagram_account_id: str
     instagram_username: Optional[str] = None
     access_token: str
+    # None = MESSAGE_RETENTION_DAYS, 0 = poruke se čuvaju zauvek
+    message_retention_days: Optional[int] = Field(None, ge=0)
+    # Šablon odgovora bez match-a; None = podrazumevani tekst
+    default_response: Optional[str] = None
 
 
 class ChatbotUpdate(BaseModel):
@@ -38,6 +42,8 @@ class ChatbotUpdate(BaseModel):
     instagram_username: Optional[str] = None
     access_token: Optional[str] = None
     is_active: Optional[bool] = None
+    message_retention_days: Optional[int] = Field(None, ge=0)
+    default_response: Optional[str] = None
 
 
 class ChatbotResponse(BaseModel):
@@ -46,6 +52,8 @@ class ChatbotResponse(BaseModel):
     instagram_account_id: str
     instagram_username: Optional[str]
     is_active: bool
+    message_retention_days: Optional[int] = None
+    default_response: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     
@@ -54,16 +62,23 @@ class ChatbotResponse(BaseModel):
 
 
 # Keyword schemas
+MatchType = Literal["substring", "word", "regex", "fuzzy"]
+
+
 class KeywordCreate(BaseModel):
     trigger: str
     response: str
     chatbot_id: int
+    match_type: MatchType = "substring"
+    priority: int = 0
 
 
 class KeywordUpdate(BaseModel):
     trigger: Optional[str] = None
     response: Optional[str] = None
     is_active: Optional[bool] = None
+    match_type: Optional[MatchType] = None
+    priority: Optional[int] = None
 
 
 class KeywordResponse(BaseModel):
@@ -71,6 +86,8 @@ class KeywordResponse(BaseModel):
     trigger: str
     response: str
     is_active: bool
+    match_type: str
+    priority: int
     chatbot_id: int
     created_at: datetime
     
@@ -78,6 +95,11 @@ class KeywordResponse(BaseModel):
         from_attributes = True
 
 
+class KeywordImportResult(BaseModel):
+    created: int
+    updated: int
+
+
 # Message schemas
 class MessageResponse(BaseModel):
     id: int
@@ -93,6 +115,33 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None
+
+
+# Stats schemas (iz rollup tabela)
+class HourlyStats(BaseModel):
+    hour: datetime
+    messages: int
+    default_replies: int
+
+
+class KeywordStats(BaseModel):
+    keyword: str
+    matches: int
+
+
+class ChatbotStats(BaseModel):
+    since: datetime
+    messages: int
+    default_replies: int
+    default_reply_rate: float
+    unique_senders: int
+    messages_per_hour: List[HourlyStats]
+    top_keywords: List[KeywordStats]
+
+
 # Token schema
 class Token(BaseModel):
     access_token: str
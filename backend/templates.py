@@ -0,0 +1,163 @@
+"""
+Šabloni za odgovore keyword-a i default odgovor chatbota.
+
+    Zdravo {{ username }}!                     promenljiva
+    Zdravo {{ name | "prijatelju" }}!         promenljiva sa podrazumevanom vrednošću
+    {% if username %}@{{ username }}{% else %}Zdravo{% endif %}
+    {% random %}Hvala!{% or %}Hvala puno!{% endrandom %}
+
+Promenljive: username, name (profil pošiljaoca), chatbot (ime chatbota),
+message (dolazna poruka), keyword (trigger koji je pogodio).
+
+`compile_template()` parsira izvor jednom u stablo closure-a; `render()` je
+jedan poziv funkcije po poruci. Šablon bez tagova vraća izvor bez kopiranja.
+"""
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+import logging
+import random
+import re
+
+logger = logging.getLogger(__name__)
+
+VARIABLES = ("username", "name", "chatbot", "message", "keyword")
+
+# Promenljive koje zahtevaju profil pošiljaoca (vidi profiles.py)
+PROFILE_VARIABLES = frozenset({"username", "name"})
+
+DEFAULT_RESPONSE = "Hvala na poruci! Odgovorićemo Vam uskoro."
+
+_TOKEN_RE = re.compile(r"\{\{(.*?)\}\}|\{%(.*?)%\}", re.S)
+_VARIABLE_RE = re.compile(r'^\s*(\w+)\s*(?:\|\s*"((?:[^"\\]|\\.)*)"\s*)?$')
+
+Context = Dict[str, Optional[str]]
+Renderer = Callable[[Context], str]
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class Template:
+    __slots__ = ("source", "variables", "_render")
+
+    def __init__(self, source: str, render: Optional[Renderer], variables: FrozenSet[str]):
+        self.source = source
+        self.variables = variables
+        self._render = render
+
+    @property
+    def needs_profile(self) -> bool:
+        return not self.variables.isdisjoint(PROFILE_VARIABLES)
+
+    def render(self, context: Context) -> str:
+        if self._render is None:
+            return self.source
+        return self._render(context)
+
+
+def _join(parts: List[Renderer]) -> Renderer:
+    if len(parts) == 1:
+        return parts[0]
+    return lambda context: "".join([part(context) for part in parts])
+
+
+def _text(value: str) -> Renderer:
+    return lambda context: value
+
+
+def _variable(name: str, default: str) -> Renderer:
+    return lambda context: context.get(name) or default
+
+
+def _condition(name: str, then: Renderer, otherwise: Renderer) -> Renderer:
+    return lambda context: then(context) if context.get(name) else otherwise(context)
+
+
+def _choice(variants: List[Renderer]) -> Renderer:
+    return lambda context: random.choice(variants)(context)
+
+
+def _parse(source: str) -> Tuple[Optional[Renderer], FrozenSet[str]]:
+    # Stek otvorenih blokova: (tag, promenljiva, završene grane, delovi tekuće grane)
+    stack: List[Tuple[str, Optional[str], List[Renderer], List[Renderer]]] = [("root", None, [], [])]
+    variables = set()
+    position = 0
+    tagged = False
+
+    def add(renderer: Renderer) -> None:
+        stack[-1][3].append(renderer)
+
+    for token in _TOKEN_RE.finditer(source):
+        tagged = True
+        if token.start() > position:
+            add(_text(source[position:token.start()]))
+        position = token.end()
+
+        if token.group(1) is not None:
+            match = _VARIABLE_RE.match(token.group(1))
+            if not match or match.group(1) not in VARIABLES:
+                raise TemplateError(f"unknown variable {{{{{token.group(1).strip()}}}}}; use one of {VARIABLES}")
+            variables.add(match.group(1))
+            default = (match.group(2) or "").replace('\\"', '"')
+            add(_variable(match.group(1), default))
+            continue
+
+        words = token.group(2).split()
+        tag = words[0] if words else ""
+        if tag == "if" and len(words) == 2 and words[1] in VARIABLES:
+            variables.add(words[1])
+            stack.append(("if", words[1], [], []))
+        elif tag == "random" and len(words) == 1:
+            stack.append(("random", None, [], []))
+        elif tag in ("else", "or") and len(words) == 1:
+            block = stack[-1]
+            if (block[0], tag) not in (("if", "else"), ("random", "or")) or (tag == "else" and block[2]):
+                raise TemplateError(f"unexpected {{% {tag} %}}")
+            # Grana dobija svoju listu - _join zatvara listu koju je dobio
+            block[2].append(_join(list(block[3])) if block[3] else _text(""))
+            block[3].clear()
+        elif tag in ("endif", "endrandom") and len(words) == 1:
+            kind, name, branches, parts = stack.pop() if len(stack) > 1 else ("root", None, [], [])
+            if kind != tag[3:]:
+                raise TemplateError(f"unexpected {{% {tag} %}}")
+            branches.append(_join(parts) if parts else _text(""))
+            if kind == "if":
+                add(_condition(name, branches[0], branches[1] if len(branches) > 1 else _text("")))
+            else:
+                add(_choice(branches))
+        else:
+            raise TemplateError(f"invalid tag {{% {token.group(2).strip()} %}}")
+
+    if len(stack) > 1:
+        raise TemplateError(f"missing {{% end{stack[-1][0]} %}}")
+    if not tagged:
+        return None, frozenset()
+    if position < len(source):
+        add(_text(source[position:]))
+
+    parts = stack[0][3]
+    return (_join(parts) if parts else _text("")), frozenset(variables)
+
+
+def compile_template(source: str) -> Template:
+    """Diže TemplateError za neispravan šablon"""
+    render, variables = _parse(source)
+    return Template(source, render, variables)
+
+
+def compile_or_literal(source: str) -> Template:
+    """Za odgovore sačuvane pre šablona - neispravan šablon se šalje doslovno"""
+    try:
+        return compile_template(source)
+    except TemplateError as e:
+        logger.warning("Invalid response template, sending verbatim: %s", e)
+        return Template(source, None, frozenset())
+
+
+def validate_template(source: str) -> Optional[str]:
+    """Poruka o grešci ili None"""
+    try:
+        compile_template(source)
+    except TemplateError as e:
+        return str(e)
+    return None
@@ -0,0 +1,14 @@
+"""
+Testovi se pokreću iz backend/ foldera:
+    python -m pytest -q
+Moduli se uvoze kao u aplikaciji (`import templates`), pa je backend/ na putanji.
+Baza je privremeni SQLite fajl - database.py čita DATABASE_URL pri uvozu.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="chatbot-tests-"), "test.db")
+os.environ.setdefault("LOG_FORMAT", "text")
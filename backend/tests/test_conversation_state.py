@@ -0,0 +1,111 @@
+import pytest
+
+import conversation_state
+from conversation_state import DUPLICATE, RATE_LIMITED, REPEAT, REPLY, ConversationStore
+
+
+@pytest.fixture
+def store():
+    return ConversationStore(max_size=100, ttl=3600)
+
+
+def answer(store, mid, text, now, sender="s1"):
+    """admit + remember kao process_incoming_batch za poruku na koju se odgovara"""
+    verdict, state = store.admit(1, sender, mid, text, now)
+    turn = state.remember(text, "odgovor", now) if verdict == REPLY else None
+    return verdict, state, turn
+
+
+def test_redelivered_mid_is_duplicate(store):
+    assert answer(store, "m1", "cena", 0)[0] == REPLY
+    assert answer(store, "m1", "cena", 1)[0] == DUPLICATE
+    assert store.stats()["duplicates"] == 1
+
+
+def test_mid_is_per_sender(store):
+    assert answer(store, "m1", "cena", 0, sender="a")[0] == REPLY
+    assert answer(store, "m1", "cena", 0, sender="b")[0] == REPLY
+
+
+def test_forget_lets_redelivery_through(store):
+    verdict, state, turn = answer(store, "m1", "cena", 0)
+    assert verdict == REPLY
+    # Upis loga nije uspeo
+    state.forget("m1", turn)
+    assert answer(store, "m1", "cena", 1)[0] == REPLY
+
+
+def test_repeat_within_window(store, monkeypatch):
+    monkeypatch.setattr(conversation_state, "REPLY_REPEAT_WINDOW", 30)
+    assert answer(store, "m1", "cena", 0)[0] == REPLY
+    assert answer(store, "m2", "cena", 10)[0] == REPEAT
+    assert answer(store, "m3", "dostava", 11)[0] == REPLY
+
+
+def test_suppressed_repeats_do_not_extend_window(store, monkeypatch):
+    monkeypatch.setattr(conversation_state, "REPLY_REPEAT_WINDOW", 30)
+    assert answer(store, "m1", "cena", 0)[0] == REPLY
+    # Ista poruka na svakih 10s - prozor se računa od poslednjeg odgovora
+    assert answer(store, "m2", "cena", 10)[0] == REPEAT
+    assert answer(store, "m3", "cena", 20)[0] == REPEAT
+    assert answer(store, "m4", "cena", 31)[0] == REPLY
+
+
+def test_rate_limit(store, monkeypatch):
+    monkeypatch.setattr(conversation_state, "REPLY_RATE_LIMIT", 2)
+    monkeypatch.setattr(conversation_state, "REPLY_RATE_WINDOW", 60)
+    store = ConversationStore()
+    assert answer(store, "m1", "a", 0)[0] == REPLY
+    assert answer(store, "m2", "b", 0)[0] == REPLY
+    assert answer(store, "m3", "c", 0)[0] == RATE_LIMITED
+    # Jedan token se vraća za REPLY_RATE_WINDOW / REPLY_RATE_LIMIT sekundi
+    assert answer(store, "m4", "d", 30)[0] == REPLY
+
+
+def test_ttl_and_size(store):
+    store = ConversationStore(max_size=2, ttl=10)
+    answer(store, "m1", "a", 0, sender="a")
+    answer(store, "m2", "b", 0, sender="b")
+    answer(store, "m3", "c", 0, sender="c")
+    assert store.stats()["evictions"] == 1
+    answer(store, "m4", "d", 20, sender="d")
+    assert store.stats()["size"] == 1
+
+
+def test_failed_log_write_rolls_back_state(monkeypatch):
+    pytest.importorskip("sqlalchemy")
+    import asyncio
+
+    import instagram_service
+    from chatbot_cache import CachedChatbot
+    from keyword_matcher import KeywordMatcher
+    from templates import compile_template
+
+    store = ConversationStore()
+    monkeypatch.setattr(instagram_service, "conversation_store", store)
+    monkeypatch.setattr(instagram_service, "OUTBOUND_SEND_MODE", "outbox")
+
+    async def no_profiles(*args, **kwargs):
+        return {}
+
+    failures = [RuntimeError("database is locked")]
+
+    async def write(rows):
+        if failures:
+            raise failures.pop()
+
+    monkeypatch.setattr(instagram_service.profile_cache, "lookup", no_profiles)
+    monkeypatch.setattr(instagram_service.message_log, "write", write)
+    monkeypatch.setattr(instagram_service.rollup_aggregator, "record", no_profiles)
+
+    chatbot = CachedChatbot(
+        id=1, owner_id=1, name="bot", instagram_account_id="ig", access_token="token", is_active=True,
+        matcher=KeywordMatcher([]), templates={}, default_template=compile_template("Hvala!"),
+        needs_profile=False, version=1,
+    )
+    events = [("s1", "cena", "m1")]
+    assert asyncio.run(instagram_service.process_incoming_batch(chatbot, events)) == [None]
+    # Platforma ponovo isporučuje istu poruku - ni DUPLICATE ni REPEAT
+    assert asyncio.run(instagram_service.process_incoming_batch(chatbot, events)) == ["Hvala!"]
+    assert asyncio.run(instagram_service.process_incoming_batch(chatbot, events)) == [None]
+    assert store.stats()["duplicates"] == 1
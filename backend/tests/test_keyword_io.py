@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import select
+
+import database
+from database import SessionLocal, engine, write_session
+from keyword_io import KeywordImportError, apply_import, export_keywords, read_import
+from models import Base, Chatbot, Keyword, User
+
+
+async def chunks(data: bytes, size: int = 7):
+    """Upload u malim delovima - red i UTF-8 znak mogu da budu presečeni"""
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            # Konekcije async pool-a su vezane za event loop ovog asyncio.run
+            await database.async_engine.dispose()
+            await database.async_read_engine.dispose()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def chatbot_id():
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        user = User(username="keywords", email="keywords@example.com", hashed_password="x")
+        chatbot = Chatbot(name="keywords", instagram_account_id="keywords-ig", access_token="token", owner=user)
+        db.add(chatbot)
+        db.commit()
+        chatbot_id, user_id = chatbot.id, user.id
+    finally:
+        db.close()
+
+    yield chatbot_id
+
+    db = SessionLocal()
+    try:
+        db.query(Keyword).filter(Keyword.chatbot_id == chatbot_id).delete()
+        db.query(Chatbot).filter(Chatbot.id == chatbot_id).delete()
+        db.query(User).filter(User.id == user_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+async def import_file(chatbot_id, data: bytes, fmt: str) -> dict:
+    rows = await read_import(chunks(data), fmt)
+    async with write_session() as db:
+        summary = await apply_import(db, chatbot_id, rows)
+        await db.commit()
+    return summary
+
+
+async def export_file(chatbot_id, fmt: str) -> bytes:
+    return b"".join([chunk async for chunk in export_keywords(chatbot_id, fmt)])
+
+
+def keywords(chatbot_id):
+    db = SessionLocal()
+    try:
+        return [
+            tuple(row) for row in db.execute(
+                select(Keyword.trigger, Keyword.response, Keyword.is_active, Keyword.match_type, Keyword.priority)
+                .filter(Keyword.chatbot_id == chatbot_id).order_by(Keyword.id)
+            )
+        ]
+    finally:
+        db.close()
+
+
+def test_read_csv_with_quoted_newline_and_bom():
+    data = (
+        "﻿trigger,response,is_active,match_type,priority\n"
+        'cena,"Cena je 100 din.\nHvala!",da,word,5\n'
+        "\n"
+        "ćao,Zdravo {{ username }},,,\n"
+    ).encode()
+
+    rows = run(read_import(chunks(data), "csv"))
+
+    assert [(r.line, r.trigger, r.response, r.is_active, r.match_type, r.priority) for r in rows] == [
+        (2, "cena", "Cena je 100 din.\nHvala!", True, "word", 5),
+        (5, "ćao", "Zdravo {{ username }}", True, "substring", 0),
+    ]
+
+
+def test_read_jsonl_later_row_wins():
+    data = (
+        b'{"trigger": "Cena", "response": "prva"}\n'
+        b'{"trigger": "cena ", "response": "druga", "is_active": false}\n'
+        b'{"trigger": "cena", "response": "regex", "match_type": "regex"}\n'
+    )
+
+    rows = run(read_import(chunks(data), "jsonl"))
+
+    assert [(r.trigger, r.response, r.is_active, r.match_type) for r in rows] == [
+        ("cena", "druga", False, "substring"),
+        ("cena", "regex", True, "regex"),
+    ]
+
+
+def test_read_reports_every_invalid_row():
+    data = (
+        b'{"trigger": "", "response": "x"}\n'
+        b'not json\n'
+        b'{"trigger": "a", "response": "x", "is_active": "maybe"}\n'
+        b'{"trigger": "(a+)+$", "response": "x", "match_type": "regex"}\n'
+        b'{"trigger": "a", "response": "x", "priority": "high"}\n'
+        b'{"trigger": "a", "response": "{% if %}"}\n'
+        b'{"trigger": "ok", "response": "x"}\n'
+    )
+
+    with pytest.raises(KeywordImportError) as excinfo:
+        run(read_import(chunks(data), "jsonl"))
+
+    assert [error["line"] for error in excinfo.value.errors] == [1, 2, 3, 4, 5, 6]
+    assert excinfo.value.errors[1]["error"] == "invalid JSON"
+
+
+def test_read_csv_unterminated_quote():
+    data = b'trigger,response\ncena,"bez kraja\n'
+    with pytest.raises(KeywordImportError) as excinfo:
+        run(read_import(chunks(data), "csv"))
+    assert excinfo.value.errors == [{"line": 2, "error": "unterminated quoted field"}]
+
+
+def test_import_creates_then_updates(chatbot_id):
+    first = b"trigger,response,priority\nCena,Prvi odgovor,1\ndostava,Besplatna,0\n"
+    assert run(import_file(chatbot_id, first, "csv")) == {"created": 2, "updated": 0}
+
+    # Isti trigger posle fold()-a ažurira postojeći; drugi match_type je novi keyword
+    second = (
+        b'{"trigger": "cena", "response": "Novi odgovor", "priority": 3}\n'
+        b'{"trigger": "cena", "response": "Regex", "match_type": "regex"}\n'
+    )
+    assert run(import_file(chatbot_id, second, "jsonl")) == {"created": 1, "updated": 1}
+
+    assert keywords(chatbot_id) == [
+        ("cena", "Novi odgovor", True, "substring", 3),
+        ("dostava", "Besplatna", True, "substring", 0),
+        ("cena", "Regex", True, "regex", 0),
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_export_round_trip(chatbot_id, fmt):
+    data = (
+        b'{"trigger": "cena", "response": "Cena je \\"100\\",\\nhvala", "priority": 2, "match_type": "word"}\n'
+        b'{"trigger": "ugasen", "response": "x", "is_active": false}\n'
+    )
+    run(import_file(chatbot_id, data, "jsonl"))
+    before = keywords(chatbot_id)
+
+    exported = run(export_file(chatbot_id, fmt))
+    rows = run(read_import(chunks(exported), fmt))
+
+    assert [(r.trigger, r.response, r.is_active, r.match_type, r.priority) for r in rows] == before
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+import keyword_matcher
+from keyword_matcher import KeywordMatcher, fold, validate_regex, validate_trigger
+
+
+def keyword(id, trigger, match_type="substring", priority=0):
+    return SimpleNamespace(id=id, trigger=trigger, response=f"odgovor {id}", match_type=match_type, priority=priority)
+
+
+@pytest.mark.parametrize("pattern", [
+    r"cen[ae]",
+    r"\d+-\d+",
+    r"\d{3}-\d{4}",
+    r"\w+\s+\w+",
+    r"\w+ \w+ \w+",
+    r"\s*\w+\s*",
+    r"(ab?){3}",
+    r"^(hi|hello)\b",
+    r"\bdostav\w*",
+    r"[a-z]+@[a-z]+\.[a-z]+",
+    r"(?:a|b)+c",
+])
+def test_validate_regex_accepts(pattern):
+    assert validate_regex(pattern) is None
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(a+)+",
+    r"(\w+\s?)+",
+    r"(ab?)*x",
+    r"(.*a){8}x",
+    r"(.*a){10}x",
+    r"(a|ab)*c",
+    r"(x|xx)+y",
+    r".*a.*b.*c",
+    r"\w+\w+\w+x",
+])
+def test_validate_regex_rejects(pattern):
+    assert "rejected" in validate_regex(pattern)
+
+
+def test_validate_regex_invalid_syntax():
+    assert validate_regex("(abc").startswith("invalid regex")
+
+
+def test_validate_trigger():
+    assert validate_trigger("cena", "substring") is None
+    assert validate_trigger("cena", "exact") is not None
+    assert validate_trigger("!!!", "word") is not None
+    assert validate_trigger("(a+)+", "regex") is not None
+
+
+def test_fold():
+    assert fold("Шта") == fold("šta") == fold("sta") == "sta"
+    assert fold("ĐAK") == "djak"
+
+
+def test_match_types():
+    matcher = KeywordMatcher([
+        keyword(1, "cena"),
+        keyword(2, "dostava", "word"),
+        keyword(3, r"\d+\s*rsd", "regex"),
+        keyword(4, "porudzbina", "fuzzy"),
+    ])
+    assert matcher.match("Koja je CENA?").id == 1
+    assert matcher.match("Koliko košta dostava?").id == 2
+    assert matcher.match("dostavanje") is None
+    assert matcher.match("Imam 500 RSD").id == 3
+    assert matcher.match("gde je moja porudžbna").id == 4
+
+
+def test_priority_then_length_then_order():
+    matcher = KeywordMatcher([
+        keyword(1, "cena"),
+        keyword(2, "cena dostave"),
+        keyword(3, "dostave", priority=5),
+    ])
+    assert matcher.match("cena dostave").id == 3
+    assert [match.id for match in matcher.find_all("cena dostave")] == [3, 2, 1]
+
+
+def test_unsafe_stored_regex_is_skipped():
+    matcher = KeywordMatcher([keyword(1, "(.*a){8}x", "regex"), keyword(2, "a")])
+    assert matcher.match("a" * 1000).id == 2
+
+
+@pytest.mark.skipif(keyword_matcher.regex_engine is None, reason="regex paket nije instaliran")
+def test_slow_regex_times_out(monkeypatch):
+    monkeypatch.setattr(keyword_matcher, "KEYWORD_REGEX_TIMEOUT", 0.01)
+    matcher = KeywordMatcher([keyword(1, "x")])
+    # Mimo validacije, kao red sačuvan pre nje
+    matcher._regexes = [(0, keyword_matcher.compile_regex("(.*a){12}x"))]
+    assert matcher.match("a" * 1000) is None
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import outbox
+from database import SessionLocal, engine
+from models import Base, Chatbot, OutboundMessage, User
+from outbox import ClaimedMessage, claim_batch, complete_batch
+
+
+@pytest.fixture
+def chatbot_id():
+    # U SQLite modu sync engine ima jednu konekciju - sesije se odmah zatvaraju
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        user = User(username="outbox", email="outbox@example.com", hashed_password="x")
+        chatbot = Chatbot(name="outbox", instagram_account_id="outbox-ig", access_token="token", owner=user)
+        db.add(chatbot)
+        db.commit()
+        chatbot_id, user_id = chatbot.id, user.id
+    finally:
+        db.close()
+
+    yield chatbot_id
+
+    db = SessionLocal()
+    try:
+        db.query(OutboundMessage).delete()
+        db.query(Chatbot).filter(Chatbot.id == chatbot_id).delete()
+        db.query(User).filter(User.id == user_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def enqueue(chatbot_id, count=1, **values):
+    db = SessionLocal()
+    try:
+        messages = [
+            OutboundMessage(chatbot_id=chatbot_id, recipient_id=f"r{i}", message_text="zdravo", **values)
+            for i in range(count)
+        ]
+        db.add_all(messages)
+        db.commit()
+        return [message.id for message in messages]
+    finally:
+        db.close()
+
+
+def load(outbound_id):
+    db = SessionLocal()
+    try:
+        return db.get(OutboundMessage, outbound_id)
+    finally:
+        db.close()
+
+
+def test_claim_leases_pending_rows(chatbot_id):
+    ids = enqueue(chatbot_id, 2)
+    enqueue(chatbot_id, next_attempt_at=datetime.utcnow() + timedelta(hours=1))
+
+    claimed = claim_batch(10)
+
+    assert sorted(message.id for message in claimed) == ids
+    assert all(message.attempts == 1 and message.access_token == "token" for message in claimed)
+    row = load(ids[0])
+    assert row.status == "sending" and row.locked_until > datetime.utcnow()
+    assert claim_batch(10) == []
+
+
+def test_claim_takes_over_expired_lease(chatbot_id):
+    [outbound_id] = enqueue(
+        chatbot_id, status="sending", attempts=1, locked_until=datetime.utcnow() - timedelta(seconds=1)
+    )
+    [message] = claim_batch(10)
+    assert message.id == outbound_id and message.attempts == 2
+
+
+def test_complete_sent(chatbot_id):
+    enqueue(chatbot_id)
+    [message] = claim_batch(10)
+
+    complete_batch([(message, {"message_id": "mid.1"})])
+
+    row = load(message.id)
+    assert row.status == "sent"
+    assert row.sent_at is not None and row.locked_until is None and row.last_error is None
+
+
+def test_complete_defer_does_not_spend_attempt(chatbot_id):
+    enqueue(chatbot_id)
+    [message] = claim_batch(10)
+
+    complete_batch([(message, {"error": "rate limited", "defer": 30})])
+
+    row = load(message.id)
+    assert row.status == "pending" and row.attempts == 0 and row.locked_until is None
+    assert row.next_attempt_at > datetime.utcnow() + timedelta(seconds=20)
+    assert row.last_error == "rate limited"
+
+
+def test_complete_retryable_backs_off(chatbot_id, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_RETRY_BACKOFF", 10)
+    enqueue(chatbot_id, attempts=1)
+    [message] = claim_batch(10)
+
+    complete_batch([(message, RuntimeError("connection reset"))])
+
+    row = load(message.id)
+    # Drugi pokušaj: 10 * 2^1 sekundi
+    assert row.status == "pending" and row.attempts == 2
+    assert row.next_attempt_at > datetime.utcnow() + timedelta(seconds=15)
+    assert row.last_error == "connection reset"
+    assert claim_batch(10) == []
+
+
+def test_complete_fails_after_max_attempts(chatbot_id, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    enqueue(chatbot_id, attempts=1)
+    [message] = claim_batch(10)
+
+    complete_batch([(message, {"error": "timeout", "retryable": True})])
+
+    row = load(message.id)
+    assert row.status == "failed" and row.locked_until is None and row.last_error == "timeout"
+
+
+def test_complete_non_retryable_fails(chatbot_id):
+    enqueue(chatbot_id)
+    [message] = claim_batch(10)
+
+    complete_batch([(message, {"error": "invalid recipient", "retryable": False})])
+
+    assert load(message.id).status == "failed"
+
+
+def test_complete_batch_skips_deleted_row(chatbot_id):
+    enqueue(chatbot_id, 2)
+    first, second = claim_batch(10)
+    db = SessionLocal()
+    try:
+        db.query(OutboundMessage).filter(OutboundMessage.id == first.id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+    complete_batch([(first, {}), (second, {"error": "rate limited", "defer": 5})])
+
+    assert load(first.id) is None
+    assert load(second.id).status == "pending"
+
+
+def test_complete_batch_mixed_results(chatbot_id):
+    enqueue(chatbot_id, 3)
+    sent, deferred, failed = claim_batch(10)
+
+    complete_batch([
+        (sent, {"message_id": "mid.1"}),
+        (deferred, {"error": "rate limited", "defer": 5}),
+        (failed, {"error": "invalid recipient"}),
+    ])
+
+    assert [load(m.id).status for m in (sent, deferred, failed)] == ["sent", "pending", "failed"]
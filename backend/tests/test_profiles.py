@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import profiles
+from profiles import ProfileCache
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    calls = []
+
+    async def get_profile(access_token, sender_id):
+        calls.append(sender_id)
+        return {"username": f"user_{sender_id}", "name": None}
+
+    monkeypatch.setattr(profiles.outbound_sender, "get_profile", get_profile)
+    return calls
+
+
+def test_no_lookup_without_wait_or_prefetch(graph):
+    cache = ProfileCache(prefetch=False)
+
+    async def run():
+        found = await cache.lookup(1, "token", ["a", "b"], wait=False)
+        await asyncio.sleep(0)
+        return found
+
+    assert asyncio.run(run()) == {}
+    assert graph == []
+
+
+def test_wait_fetches_once_and_caches(graph):
+    cache = ProfileCache(prefetch=False)
+
+    async def run():
+        first = await cache.lookup(1, "token", ["a", "a"], wait=True)
+        second = await cache.lookup(1, "token", ["a"], wait=False)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["a"].username == second["a"].username == "user_a"
+    assert graph == ["a"]
+
+
+def test_prefetch_fills_cache_in_background(graph):
+    cache = ProfileCache(prefetch=True)
+
+    async def run():
+        assert await cache.lookup(1, "token", ["a"], wait=False) == {}
+        await asyncio.sleep(0.01)
+        return await cache.lookup(1, "token", ["a"], wait=False)
+
+    assert asyncio.run(run())["a"].username == "user_a"
+    assert graph == ["a"]
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from templates import TemplateError, compile_or_literal, compile_template, validate_template
+
+
+def render(source, **context):
+    return compile_template(source).render(context)
+
+
+def test_plain_text_is_returned_as_is():
+    template = compile_template("Hvala na poruci!")
+    assert template.render({}) == "Hvala na poruci!"
+    assert template.variables == frozenset()
+    assert not template.needs_profile
+
+
+def test_variable_and_default():
+    assert render("Zdravo {{ username }}!", username="ana") == "Zdravo ana!"
+    assert render('Zdravo {{ name | "prijatelju" }}!') == "Zdravo prijatelju!"
+    assert render('Zdravo {{ name | "prijatelju" }}!', name="Ana") == "Zdravo Ana!"
+
+
+def test_if_else_with_multi_part_branch():
+    source = "{% if username %}@{{ username }}{% else %}Zdravo{% endif %}"
+    assert render(source, username="ana") == "@ana"
+    assert render(source) == "Zdravo"
+
+
+def test_if_without_else():
+    source = "Hvala{% if name %}, {{ name }}{% endif %}!"
+    assert render(source, name="Ana") == "Hvala, Ana!"
+    assert render(source) == "Hvala!"
+
+
+def test_random_branches_keep_their_own_parts():
+    template = compile_template("{% random %}Hi {{ name }}!{% or %}Hey{% endrandom %}")
+    seen = set()
+    for seed in range(50):
+        random.seed(seed)
+        seen.add(template.render({"name": "Ana"}))
+    assert seen == {"Hi Ana!", "Hey"}
+
+
+def test_nested_blocks():
+    source = (
+        "{% if username %}{% random %}Ćao @{{ username }}{% or %}Hej @{{ username }}{% endrandom %}"
+        "{% else %}{% if name %}Zdravo {{ name }}{% else %}Zdravo{% endif %}!{% endif %}"
+    )
+    assert render(source, username="ana") in ("Ćao @ana", "Hej @ana")
+    assert render(source, name="Ana") == "Zdravo Ana!"
+    assert render(source) == "Zdravo!"
+
+
+def test_needs_profile():
+    assert compile_template("{% if name %}x{% endif %}").needs_profile
+    assert not compile_template("Tražili ste {{ keyword }}").needs_profile
+
+
+@pytest.mark.parametrize("source", [
+    "{{ email }}",
+    "{% if username %}x",
+    "{% else %}",
+    "{% if username %}a{% else %}b{% else %}c{% endif %}",
+    "{% random %}a{% endif %}",
+    "{% for x in y %}{% endfor %}",
+])
+def test_invalid_templates(source):
+    with pytest.raises(TemplateError):
+        compile_template(source)
+    assert validate_template(source)
+
+
+def test_invalid_stored_template_is_sent_verbatim():
+    assert compile_or_literal("{{ email }}").render({}) == "{{ email }}"
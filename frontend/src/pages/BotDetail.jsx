@@ -3,6 +3,39 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { chatbotAPI, keywordAPI } from '../services/api';
 import './BotDetail.css';
 
+const EMPTY_KEYWORD = { trigger: '', response: '', match_type: 'substring', priority: 0 };
+
+const MATCH_TYPES = [
+  { value: 'substring', label: 'Contains text' },
+  { value: 'word', label: 'Whole word' },
+  { value: 'regex', label: 'Regular expression' },
+  { value: 'fuzzy', label: 'Fuzzy (allows typos)' },
+];
+
+const MatchFields = ({ formData, setFormData }) => (
+  <>
+    <div className="form-group">
+      <label>Match Type</label>
+      <select
+        value={formData.match_type}
+        onChange={(e) => setFormData({ ...formData, match_type: e.target.value })}
+      >
+        {MATCH_TYPES.map((type) => (
+          <option key={type.value} value={type.value}>{type.label}</option>
+        ))}
+      </select>
+    </div>
+    <div className="form-group">
+      <label>Priority</label>
+      <input
+        type="number"
+        value={formData.priority}
+        onChange={(e) => setFormData({ ...formData, priority: parseInt(e.target.value, 10) || 0 })}
+      />
+    </div>
+  </>
+);
+
 const BotDetail = () => {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -11,7 +44,7 @@ const BotDetail = () => {
   const [loading, setLoading] = useState(true);
   const [showAddModal, setShowAddModal] = useState(false);
   const [editingKeyword, setEditingKeyword] = useState(null);
-  const [formData, setFormData] = useState({ trigger: '', response: '' });
+  const [formData, setFormData] = useState(EMPTY_KEYWORD);
 
   useEffect(() => {
     fetchBotData();
@@ -37,7 +70,7 @@ const BotDetail = () => {
     e.preventDefault();
     try {
       await keywordAPI.create({ ...formData, chatbot_id: parseInt(id) });
-      setFormData({ trigger: '', response: '' });
+      setFormData(EMPTY_KEYWORD);
       setShowAddModal(false);
       fetchBotData();
     } catch (err) {
@@ -50,7 +83,7 @@ const BotDetail = () => {
     try {
       await keywordAPI.update(editingKeyword.id, formData);
       setEditingKeyword(null);
-      setFormData({ trigger: '', response: '' });
+      setFormData(EMPTY_KEYWORD);
       fetchBotData();
     } catch (err) {
       alert('Failed to update keyword');
@@ -69,7 +102,12 @@ const BotDetail = () => {
 
   const openEditModal = (keyword) => {
     setEditingKeyword(keyword);
-    setFormData({ trigger: keyword.trigger, response: keyword.response });
+    setFormData({
+      trigger: keyword.trigger,
+      response: keyword.response,
+      match_type: keyword.match_type,
+      priority: keyword.priority,
+    });
   };
 
   if (loading) {
@@ -109,6 +147,7 @@ const BotDetail = () => {
                 <div className="keyword-content">
                   <div className="keyword-trigger">
                     <strong>Trigger:</strong> {keyword.trigger}
+                    {keyword.match_type !== 'substring' && ` (${keyword.match_type})`}
                   </div>
                   <div className="keyword-response">
                     <strong>Response:</strong> {keyword.response}
@@ -144,6 +183,7 @@ const BotDetail = () => {
                   required
                 />
               </div>
+              <MatchFields formData={formData} setFormData={setFormData} />
               <div className="form-group">
                 <label>Bot Response</label>
                 <textarea
@@ -180,6 +220,7 @@ const BotDetail = () => {
                   required
                 />
               </div>
+              <MatchFields formData={formData} setFormData={setFormData} />
               <div className="form-group">
                 <label>Bot Response</label>
                 <textarea
@@ -56,6 +56,68 @@ export const keywordAPI = {
   create: (data) => api.post('/keywords', data),
   update: (id, data) => api.put(`/keywords/${id}`, data),
   delete: (id) => api.delete(`/keywords/${id}`),
+  // format: 'csv' | 'jsonl'; file je File/Blob iz <input type="file">
+  importFile: (chatbotId, file, format = 'csv') =>
+    api.post(`/chatbots/${chatbotId}/keywords/import`, file, {
+      params: { format },
+      headers: { 'Content-Type': format === 'csv' ? 'text/csv' : 'application/x-ndjson' },
+    }),
+  export: (chatbotId, format = 'csv') =>
+    api.get(`/chatbots/${chatbotId}/keywords/export`, { params: { format }, responseType: 'blob' }),
+};
+
+// Message history API (params: limit, cursor, sender_id, matched_keyword, since, until)
+export const messageAPI = {
+  getByBotId: (chatbotId, params = {}) => api.get(`/chatbots/${chatbotId}/messages`, { params }),
+};
+
+// Live feed novih poruka (Server-Sent Events preko fetch-a zbog Authorization header-a)
+// onMessage(poruka), onDropped(broj) - klijent nije stigao da čita, dopuniti preko messageAPI
+// Vraća funkciju za zatvaranje; posle prekida konekcije ponovo se povezuje.
+export const liveAPI = {
+  subscribe: ({ chatbotId, onMessage, onDropped } = {}) => {
+    const controller = new AbortController();
+    const url = new URL(`${api.defaults.baseURL}/live`);
+    if (chatbotId) url.searchParams.set('chatbot_id', chatbotId);
+
+    const connect = async () => {
+      try {
+        const response = await fetch(url, {
+          headers: { Authorization: `Bearer ${localStorage.getItem('token')}` },
+          signal: controller.signal,
+        });
+        if (!response.ok) throw new Error(`Live feed ${response.status}`);
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          const frames = buffer.split('\n\n');
+          buffer = frames.pop();
+          for (const frame of frames) {
+            let event = 'message';
+            let data = '';
+            for (const line of frame.split('\n')) {
+              if (line.startsWith('event: ')) event = line.slice(7);
+              else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (!data) continue;
+            if (event === 'message') onMessage?.(JSON.parse(data));
+            else if (event === 'dropped') onDropped?.(JSON.parse(data).count);
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('❌ Live feed error:', error.message); // DEBUG
+      }
+      if (!controller.signal.aborted) setTimeout(connect, 3000);
+    };
+
+    connect();
+    return () => controller.abort();
+  },
 };
 
 export default api;
\ No newline at end of file